@@ -37,4 +37,5 @@ class RegistroAdmin(admin.ModelAdmin):
 
 @admin.register(Administrativo)
 class AdministrativoAdmin(admin.ModelAdmin):
-    list_display = ('id_adm', 'num_doc_adm', 'id_usu')
+    list_display = ('id_adm', 'num_doc_adm', 'id_usu', 'est_dir_adm')
+    list_filter = ('est_dir_adm',)
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'accounts'
+
+    def ready(self):
+        # conecta las señales que marcan las direcciones pendientes de validar
+        from . import signals  # noqa: F401
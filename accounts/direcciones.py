@@ -0,0 +1,115 @@
+"""Validación en segundo plano de las direcciones escritas por los usuarios.
+
+Los formularios ya no consultan Nominatim: guardan la dirección tal cual (con
+las coordenadas que haya capturado el navegador, salvo las aproximadas de
+una sugerencia del gazetteer local) y las señales de
+`accounts.signals` la marcan como pendiente. Después, un hilo de cada proceso
+(o el comando `validar_direcciones`) la normaliza y geocodifica con prioridad
+de fondo (ver `utils.limitador`) y escribe el resultado:
+
+* encontrada: la dirección normalizada, estado `validada` y, si el navegador
+  no envió coordenadas, las del geocodificador;
+* no encontrada: estado `invalida`, el texto queda como lo escribió el
+  usuario para que lo corrija (o lo revise un administrador);
+* sin respuesta (red, sin turno, circuito abierto): sigue pendiente y se
+  reintenta más tarde.
+"""
+import logging
+import threading
+
+from django.db import connection, transaction
+
+from people.models import Acudiente
+from utils.geo import validate_and_normalize_address
+
+from .models import DIRECCION_INVALIDA, DIRECCION_PENDIENTE, DIRECCION_VALIDADA, Administrativo
+
+logger = logging.getLogger(__name__)
+
+# modelo -> (campo dirección, campo estado, campo latitud, campo longitud); sin coordenadas: None
+OBJETIVOS = {
+    Acudiente: ('dir_acu', 'est_dir_acu', 'lat_acu', 'lon_acu'),
+    Administrativo: ('dir_adm', 'est_dir_adm', 'lat_adm', 'lon_adm'),
+}
+LOTE = 50
+
+
+def _validar(modelo, limite):
+    campo_dir, campo_est, campo_lat, campo_lon = OBJETIVOS[modelo]
+    columnas = ['pk', campo_dir] + ([campo_lat, campo_lon] if campo_lat else [])
+    filas = list(modelo.objects.filter(**{campo_est: DIRECCION_PENDIENTE}).order_by('pk').values_list(*columnas)[:limite])
+    resumen = {DIRECCION_VALIDADA: 0, DIRECCION_INVALIDA: 0, 'reintentar': 0}
+    for pk, texto, *coords in filas:
+        if not (texto or '').strip():
+            modelo.objects.filter(pk=pk, **{campo_est: DIRECCION_PENDIENTE}).update(**{campo_est: None})
+            continue
+        # sin respaldo local: sus coordenadas son las del municipio; mejor esperar a Nominatim
+        res = validate_and_normalize_address(texto, country='CO', respaldo=False)
+        if res.get('error'):
+            # Nominatim no respondió: no tiene sentido seguir con el resto del lote
+            resumen['reintentar'] += 1
+            break
+        if res.get('ok'):
+            cambios = {campo_dir: (res.get('normalized') or texto)[:300], campo_est: DIRECCION_VALIDADA}
+            # las coordenadas del navegador (GPS o sugerencia elegida) son más precisas
+            if campo_lat and None in coords and res.get('lat') is not None:
+                cambios[campo_lat] = round(res['lat'], 6)
+                cambios[campo_lon] = round(res['lon'], 6)
+        else:
+            cambios = {campo_est: DIRECCION_INVALIDA}
+        # update(): sin señales; y si el usuario cambió la dirección mientras tanto, no se pisa
+        modelo.objects.filter(pk=pk, **{campo_dir: texto, campo_est: DIRECCION_PENDIENTE}).update(**cambios)
+        resumen[cambios[campo_est]] += 1
+    return resumen
+
+
+def validar_pendientes(limite=LOTE):
+    """Valida hasta `limite` direcciones pendientes de cada modelo; devuelve los totales por resultado."""
+    total = {DIRECCION_VALIDADA: 0, DIRECCION_INVALIDA: 0, 'reintentar': 0}
+    for modelo in OBJETIVOS:
+        for clave, n in _validar(modelo, limite).items():
+            total[clave] += n
+        if total['reintentar']:
+            break
+    return total
+
+
+# -- hilo del proceso ---------------------------------------------------------
+
+_lock = threading.Lock()
+_hilo = None
+_otra_vez = False
+
+
+def _bucle():
+    global _hilo, _otra_vez
+    try:
+        while True:
+            with _lock:
+                if not _otra_vez:
+                    _hilo = None
+                    return
+                _otra_vez = False
+            try:
+                while True:
+                    res = validar_pendientes()
+                    if res['reintentar'] or not (res[DIRECCION_VALIDADA] or res[DIRECCION_INVALIDA]):
+                        break
+            except Exception:
+                logger.exception('Error validando direcciones pendientes')
+    finally:
+        connection.close()
+
+
+def _arrancar():
+    global _hilo, _otra_vez
+    with _lock:
+        _otra_vez = True
+        if _hilo is None or not _hilo.is_alive():
+            _hilo = threading.Thread(target=_bucle, name='validar-direcciones', daemon=True)
+            _hilo.start()
+
+
+def programar():
+    """Valida en un hilo del proceso las direcciones pendientes, tras el commit en curso."""
+    transaction.on_commit(_arrancar)
@@ -2,7 +2,6 @@ from django import forms
 from .models import Registro
 from django.forms import ClearableFileInput
 import re
-from utils.geo import validate_and_normalize_address
 
 
 class RegistroForm(forms.ModelForm):
@@ -17,6 +16,8 @@ class RegistroForm(forms.ModelForm):
     dir_lat = forms.FloatField(required=False, widget=forms.HiddenInput())
     dir_lon = forms.FloatField(required=False, widget=forms.HiddenInput())
     dir_acc = forms.IntegerField(required=False, widget=forms.HiddenInput())
+    # origen de la sugerencia elegida ('offline': coordenadas aproximadas del gazetteer local)
+    dir_fuente = forms.CharField(max_length=20, required=False, widget=forms.HiddenInput())
 
     class Meta:
         model = Registro
@@ -40,21 +41,10 @@ class RegistroForm(forms.ModelForm):
                 raise forms.ValidationError('La contraseña debe tener al menos 8 caracteres')
             if not re.search(r"[!@#$%^&*()_+\-=[\]{};':\"\\|,.<>/?]+", a):
                 raise forms.ValidationError('La contraseña debe incluir al menos un carácter especial (ej. !@#$%)')
-        # Validación opcional de dirección del acudiente si fue proporcionada
-        dir_acu = cleaned.get('dir_acu')
-        if dir_acu:
-            # Si ya tenemos lat/lon asumimos que provienen de geocodificación directa
-            if cleaned.get('dir_lat') and cleaned.get('dir_lon'):
-                # Normalizar texto vía validator para asegurar consistencia
-                res = validate_and_normalize_address(dir_acu, country='CO')
-                if res.get('ok') and res.get('normalized'):
-                    cleaned['dir_acu'] = res['normalized']
-            else:
-                res = validate_and_normalize_address(dir_acu, country='CO')
-                if res.get('ok') and res.get('normalized'):
-                    cleaned['dir_acu'] = res['normalized']
-                else:
-                    raise forms.ValidationError('No pudimos validar la dirección proporcionada. Verifica y vuelve a intentar.')
+        # La dirección se guarda tal cual (con las coordenadas del navegador, si las hay)
+        # y se valida en segundo plano: ver accounts.direcciones
+        if cleaned.get('dir_acu'):
+            cleaned['dir_acu'] = ' '.join(cleaned['dir_acu'].split())
         return cleaned
 
 
@@ -0,0 +1,125 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import Administrativo, AvanceTarea
+from people.models import Acudiente, Maestro
+from school.catalog import marcar_cambio_catalogo
+from school.models import Institucion
+from utils.geo import normalizar_consulta, validate_and_normalize_address
+
+# nombre -> (modelo, campo dirección, campo latitud, campo longitud, campos que completan la consulta)
+OBJETIVOS = {
+    'acudiente': (Acudiente, 'dir_acu', 'lat_acu', 'lon_acu', ()),
+    'maestro': (Maestro, 'dir_mae', 'lat_mae', 'lon_mae', ()),
+    'administrativo': (Administrativo, 'dir_adm', 'lat_adm', 'lon_adm', ()),
+    'institucion': (Institucion, 'dire_inst', 'lat_inst', 'lon_inst', ('mun_inst', 'dep_inst')),
+}
+
+
+class Command(BaseCommand):
+    help = ('Completa las coordenadas de las direcciones que no las tienen (acudientes, maestros, administrativos '
+            'e instituciones). Recorre las filas por lotes sin cargarlas todas, consulta una sola vez cada '
+            'dirección repetida y guarda su avance: si se interrumpe, la siguiente ejecución sigue donde quedó; '
+            'tras una pasada completa vuelve a empezar desde la primera fila')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--modelo', action='append', choices=list(OBJETIVOS),
+                            help='Solo este modelo (se puede repetir; por defecto todos)')
+        parser.add_argument('--lote', type=int, default=200, help='Filas leídas y escritas por lote')
+        parser.add_argument('--limit', type=int, default=0, help='Máximo de filas por modelo (0 = todas)')
+        parser.add_argument('--desde-cero', action='store_true',
+                            help='Ignorar el avance guardado de una ejecución interrumpida')
+
+    def handle(self, *args, **options):
+        for nombre in options['modelo'] or list(OBJETIVOS):
+            if not self._geocodificar(nombre, max(1, options['lote']), options['limit'], options['desde_cero']):
+                self.stdout.write(self.style.WARNING(
+                    'Nominatim no respondió; la próxima ejecución sigue desde el último lote guardado'
+                ))
+                break
+
+    def _geocodificar(self, nombre, lote, limite, desde_cero):
+        """Procesa las filas sin coordenadas de un modelo; False si hubo que detenerse por un fallo de Nominatim."""
+        modelo, campo_dir, campo_lat, campo_lon, extras = OBJETIVOS[nombre]
+        avance, _ = AvanceTarea.objects.get_or_create(nombre=f'geocodificar_direcciones:{nombre}')
+        if desde_cero:
+            avance.ultimo_pk = 0
+            avance.save(update_fields=['ultimo_pk', 'actualizado_en'])
+
+        qs = (
+            modelo.objects.filter(**{f'{campo_lat}__isnull': True, 'pk__gt': avance.ultimo_pk})
+            .exclude(**{f'{campo_dir}__isnull': True}).exclude(**{campo_dir: ''})
+            .order_by('pk').values_list('pk', campo_dir, *extras)
+        )
+        if limite:
+            qs = qs[:limite]
+        self.stdout.write(f'{nombre}: desde la fila {avance.ultimo_pk}')
+
+        total = {'geocodificadas': 0, 'sin_resultado': 0}
+        filas = []
+        completo = True
+        leidas = 0
+        for fila in qs.iterator(chunk_size=lote):
+            filas.append(fila)
+            leidas += 1
+            if len(filas) >= lote:
+                completo = self._lote(modelo, campo_dir, campo_lat, campo_lon, filas, avance, total)
+                filas = []
+                if not completo:
+                    break
+        if filas and completo:
+            completo = self._lote(modelo, campo_dir, campo_lat, campo_lon, filas, avance, total)
+        if completo and not (limite and leidas >= limite) and avance.ultimo_pk:
+            # pasada completa: la próxima empieza de nuevo, así recoge las filas anteriores al
+            # avance que volvieron a quedar sin coordenadas (p. ej. un maestro que cambió de
+            # dirección, ver accounts.signals) y reintenta las no encontradas (en caché un tiempo)
+            avance.ultimo_pk = 0
+            avance.save(update_fields=['ultimo_pk', 'actualizado_en'])
+
+        if modelo is Institucion and total['geocodificadas']:
+            marcar_cambio_catalogo()
+        self.stdout.write(self.style.SUCCESS(
+            f"{nombre}: {total['geocodificadas']} geocodificadas, {total['sin_resultado']} sin resultado"
+        ))
+        return completo
+
+    def _lote(self, modelo, campo_dir, campo_lat, campo_lon, filas, avance, total):
+        # misma dirección (tras normalizarla) -> sus filas; en orden de la primera fila que la usa
+        consultas = {}
+        for pk, texto, *extras in filas:
+            consulta = normalizar_consulta(', '.join(p for p in (texto, *extras) if p and p.strip()))
+            consultas.setdefault(consulta, []).append((pk, texto))
+
+        coordenadas = {}
+        hasta = filas[-1][0]
+        completo = True
+        for consulta, del_texto in consultas.items():
+            # con caché y limitador (utils.geo); las repetidas entre lotes y ejecuciones salen de la caché
+            res = validate_and_normalize_address(consulta, country='CO', respaldo=False)
+            if res.get('error'):
+                # las filas anteriores a esta ya están resueltas: se reanuda desde ella
+                hasta = del_texto[0][0] - 1
+                completo = False
+                break
+            if res.get('lat') is None or res.get('lon') is None:
+                total['sin_resultado'] += len(del_texto)
+                continue
+            for pk, texto in del_texto:
+                coordenadas[pk] = (texto, round(res['lat'], 6), round(res['lon'], 6))
+
+        if coordenadas:
+            # solo las que siguen sin coordenadas y con la misma dirección (pudieron cambiar mientras tanto)
+            objetos = []
+            for obj in modelo.objects.filter(pk__in=list(coordenadas), **{f'{campo_lat}__isnull': True}).only('pk', campo_dir):
+                texto, lat, lon = coordenadas[obj.pk]
+                if getattr(obj, campo_dir) == texto:
+                    setattr(obj, campo_lat, lat)
+                    setattr(obj, campo_lon, lon)
+                    objetos.append(obj)
+            # bulk_update: una sola escritura por lote, sin señales ni save() por fila
+            modelo.objects.bulk_update(objetos, [campo_lat, campo_lon])
+            total['geocodificadas'] += len(objetos)
+
+        if hasta > avance.ultimo_pk:
+            avance.ultimo_pk = hasta
+            avance.save(update_fields=['ultimo_pk', 'actualizado_en'])
+        return completo
@@ -0,0 +1,42 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from accounts import direcciones
+from accounts.models import DIRECCION_INVALIDA, DIRECCION_PENDIENTE, DIRECCION_VALIDADA
+
+
+class Command(BaseCommand):
+    help = ('Normaliza y geocodifica las direcciones pendientes de acudientes y administrativos '
+            '(las que quedaron sin validar tras un reinicio o un fallo de Nominatim)')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lote', type=int, default=direcciones.LOTE, help='Direcciones por modelo en cada pasada')
+        parser.add_argument('--continuo', type=float, default=0,
+                            help='Seguir ejecutando: segundos de espera cuando no quedan pendientes (0 = una sola vez)')
+        parser.add_argument('--reintentar-invalidas', action='store_true',
+                            help='Volver a marcar como pendientes las direcciones no encontradas antes de empezar')
+
+    def handle(self, *args, **options):
+        if options['reintentar_invalidas']:
+            for modelo, (_, campo_est, _, _) in direcciones.OBJETIVOS.items():
+                n = modelo.objects.filter(**{campo_est: DIRECCION_INVALIDA}).update(**{campo_est: DIRECCION_PENDIENTE})
+                self.stdout.write(f'{modelo.__name__}: {n} direcciones vuelven a pendiente')
+
+        total = {DIRECCION_VALIDADA: 0, DIRECCION_INVALIDA: 0}
+        while True:
+            res = direcciones.validar_pendientes(options['lote'])
+            for clave in total:
+                total[clave] += res[clave]
+            procesadas = res[DIRECCION_VALIDADA] + res[DIRECCION_INVALIDA]
+            if res['reintentar']:
+                self.stdout.write(self.style.WARNING('Nominatim no respondió; las pendientes quedan para la próxima pasada'))
+            if procesadas and not res['reintentar']:
+                continue
+            if not options['continuo']:
+                break
+            time.sleep(options['continuo'])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{total[DIRECCION_VALIDADA]} direcciones validadas, {total[DIRECCION_INVALIDA]} no encontradas"
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_administrativo_dir_adm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CacheGeocodificacion',
+            fields=[
+                ('id_cache', models.BigAutoField(db_column='id_cache', primary_key=True, serialize=False)),
+                ('clave', models.CharField(db_column='clave', max_length=64, unique=True)),
+                ('tipo', models.CharField(db_column='tipo', max_length=10)),
+                ('consulta', models.CharField(db_column='consulta', max_length=300)),
+                ('resultado', models.JSONField(blank=True, db_column='resultado', null=True)),
+                ('vacio', models.BooleanField(db_column='vacio', default=False)),
+                ('expira_en', models.DateTimeField(db_column='expira_en', db_index=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+            ],
+            options={
+                'db_table': 'cache_geocodificacion',
+            },
+        ),
+    ]
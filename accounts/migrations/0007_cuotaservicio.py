@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_cachegeocodificacion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CuotaServicio',
+            fields=[
+                ('nombre', models.CharField(db_column='nombre', max_length=40, primary_key=True, serialize=False)),
+                ('siguiente', models.FloatField(db_column='siguiente', default=0)),
+            ],
+            options={
+                'db_table': 'cuota_servicio',
+            },
+        ),
+    ]
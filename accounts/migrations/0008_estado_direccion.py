@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+def marcar_existentes(apps, schema_editor):
+    # Las direcciones de administrativos ya pasaban por la validación síncrona de los formularios
+    Administrativo = apps.get_model('accounts', 'Administrativo')
+    Administrativo.objects.exclude(dir_adm__isnull=True).exclude(dir_adm='').update(est_dir_adm='validada')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0007_cuotaservicio'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='administrativo',
+            name='est_dir_adm',
+            field=models.CharField(blank=True, choices=[('pendiente', 'Pendiente de validar'), ('validada', 'Validada'), ('invalida', 'No encontrada')], db_column='est_dir_adm', db_index=True, max_length=10, null=True),
+        ),
+        migrations.RunPython(marcar_existentes, migrations.RunPython.noop),
+    ]
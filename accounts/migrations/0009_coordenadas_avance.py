@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0008_estado_direccion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvanceTarea',
+            fields=[
+                ('nombre', models.CharField(db_column='nombre', max_length=80, primary_key=True, serialize=False)),
+                ('ultimo_pk', models.BigIntegerField(db_column='ultimo_pk', default=0)),
+                ('actualizado_en', models.DateTimeField(auto_now=True, db_column='actualizado_en')),
+            ],
+            options={
+                'db_table': 'avance_tarea',
+            },
+        ),
+        migrations.AddField(
+            model_name='administrativo',
+            name='lat_adm',
+            field=models.DecimalField(blank=True, db_column='lat_adm', decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='administrativo',
+            name='lon_adm',
+            field=models.DecimalField(blank=True, db_column='lon_adm', decimal_places=6, max_digits=9, null=True),
+        ),
+    ]
@@ -1,5 +1,15 @@
 from django.db import models
 
+# Estado de validación de una dirección escrita (ver accounts.direcciones)
+DIRECCION_PENDIENTE = 'pendiente'
+DIRECCION_VALIDADA = 'validada'
+DIRECCION_INVALIDA = 'invalida'
+ESTADOS_DIRECCION = (
+    (DIRECCION_PENDIENTE, 'Pendiente de validar'),
+    (DIRECCION_VALIDADA, 'Validada'),
+    (DIRECCION_INVALIDA, 'No encontrada'),
+)
+
 
 class Rol(models.Model):
     id_rol = models.AutoField(primary_key=True, db_column='id_rol')
@@ -32,6 +42,9 @@ class Administrativo(models.Model):
     num_doc_adm = models.CharField(max_length=20, db_column='num_doc_adm')
     tel_adm = models.CharField(max_length=20, null=True, blank=True, db_column='tel_adm')
     dir_adm = models.CharField(max_length=300, null=True, blank=True, db_column='dir_adm')
+    est_dir_adm = models.CharField(max_length=10, choices=ESTADOS_DIRECCION, null=True, blank=True, db_index=True, db_column='est_dir_adm')
+    lat_adm = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lat_adm')
+    lon_adm = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lon_adm')
     tip_carg_adm = models.CharField(max_length=50, null=True, blank=True, db_column='tip_carg_adm')
     cedula_img = models.ImageField(upload_to='administrativos/cedulas/', null=True, blank=True, db_column='cedula_img')
     foto_perfil = models.ImageField(upload_to='administrativos/fotos/', null=True, blank=True, db_column='foto_perfil')
@@ -67,3 +80,58 @@ class PasswordResetRequest(models.Model):
 
     def __str__(self):
         return f"Reset token {self.token[:12]}... for {self.registro.ema_usu}" if self.registro else self.token
+
+
+class CacheGeocodificacion(models.Model):
+    """Respuestas de Nominatim guardadas por clave de consulta (ver `utils.geocache`).
+
+    `resultado` es la respuesta tal cual; `vacio` marca las consultas sin
+    resultado (caché negativa, con un TTL más corto). Las filas vencidas se
+    reemplazan en la siguiente consulta y se purgan de vez en cuando.
+    """
+    id_cache = models.BigAutoField(primary_key=True, db_column='id_cache')
+    clave = models.CharField(max_length=64, unique=True, db_column='clave')
+    tipo = models.CharField(max_length=10, db_column='tipo')
+    consulta = models.CharField(max_length=300, db_column='consulta')
+    resultado = models.JSONField(null=True, blank=True, db_column='resultado')
+    vacio = models.BooleanField(default=False, db_column='vacio')
+    expira_en = models.DateTimeField(db_column='expira_en', db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
+
+    class Meta:
+        db_table = 'cache_geocodificacion'
+
+    def __str__(self):
+        return f"{self.tipo}: {self.consulta}"
+
+
+class CuotaServicio(models.Model):
+    """Turnos de uso de un servicio externo compartidos por todos los procesos (ver `utils.limitador`).
+
+    `siguiente` es el instante (epoch, segundos) a partir del cual queda libre
+    el próximo turno; cada consulta lo adelanta un intervalo.
+    """
+    nombre = models.CharField(max_length=40, primary_key=True, db_column='nombre')
+    siguiente = models.FloatField(default=0, db_column='siguiente')
+
+    class Meta:
+        db_table = 'cuota_servicio'
+
+    def __str__(self):
+        return self.nombre
+
+
+class AvanceTarea(models.Model):
+    """Punto de reanudación de una tarea por lotes (p. ej. `geocodificar_direcciones`).
+
+    `ultimo_pk` es la clave primaria hasta la que la tarea ya procesó todas las filas.
+    """
+    nombre = models.CharField(max_length=80, primary_key=True, db_column='nombre')
+    ultimo_pk = models.BigIntegerField(default=0, db_column='ultimo_pk')
+    actualizado_en = models.DateTimeField(auto_now=True, db_column='actualizado_en')
+
+    class Meta:
+        db_table = 'avance_tarea'
+
+    def __str__(self):
+        return f"{self.nombre}: {self.ultimo_pk}"
@@ -0,0 +1,69 @@
+import logging
+
+from django.db.models.signals import post_save, pre_save
+
+from people.models import Maestro
+
+from . import direcciones
+from .models import DIRECCION_PENDIENTE
+
+logger = logging.getLogger(__name__)
+
+
+def direccion_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Marca como pendiente la dirección nueva o cambiada (la valida accounts.direcciones)."""
+    campo_dir, campo_est, campo_lat, campo_lon = direcciones.OBJETIVOS[sender]
+    if raw or (update_fields is not None and campo_dir not in update_fields):
+        return
+    try:
+        texto = getattr(instance, campo_dir)
+        anterior = None
+        if instance.pk is not None:
+            columnas = [campo_dir] + ([campo_lat, campo_lon] if campo_lat else [])
+            anterior = sender.objects.filter(pk=instance.pk).values_list(*columnas).first()
+            if anterior is not None and anterior[0] == texto:
+                return
+        setattr(instance, campo_est, DIRECCION_PENDIENTE if (texto or '').strip() else None)
+        if campo_lat and anterior is not None:
+            # las coordenadas de la dirección anterior ya no valen (salvo que lleguen nuevas)
+            if (getattr(instance, campo_lat), getattr(instance, campo_lon)) == tuple(anterior[1:]):
+                setattr(instance, campo_lat, None)
+                setattr(instance, campo_lon, None)
+    except Exception:
+        logger.exception('No se pudo marcar la dirección de %s %s', sender.__name__, instance.pk)
+
+
+def direccion_post_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    campo_dir, campo_est, campo_lat, campo_lon = direcciones.OBJETIVOS[sender]
+    if raw or getattr(instance, campo_est) != DIRECCION_PENDIENTE:
+        return
+    if update_fields is not None and campo_dir in update_fields:
+        # save(update_fields=[...]) no escribió lo que se cambió en pre_save
+        campos = [campo_est] + ([campo_lat, campo_lon] if campo_lat else [])
+        sender.objects.filter(pk=instance.pk).update(**{c: getattr(instance, c) for c in campos})
+    direcciones.programar()
+
+
+for _modelo in direcciones.OBJETIVOS:
+    pre_save.connect(direccion_pre_save, sender=_modelo, dispatch_uid=f'direccion_pre_save_{_modelo.__name__}')
+    post_save.connect(direccion_post_save, sender=_modelo, dispatch_uid=f'direccion_post_save_{_modelo.__name__}')
+
+
+def maestro_pre_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Borra las coordenadas de una dirección cambiada; las repone el comando geocodificar_direcciones."""
+    if raw or instance.pk is None or (update_fields is not None and 'dir_mae' not in update_fields):
+        return
+    try:
+        anterior = sender.objects.filter(pk=instance.pk).values_list('dir_mae', 'lat_mae', 'lon_mae').first()
+        if anterior is None or anterior[0] == instance.dir_mae:
+            return
+        if (instance.lat_mae, instance.lon_mae) == tuple(anterior[1:]):
+            instance.lat_mae = None
+            instance.lon_mae = None
+            if update_fields is not None:
+                sender.objects.filter(pk=instance.pk).update(lat_mae=None, lon_mae=None)
+    except Exception:
+        logger.exception('No se pudieron borrar las coordenadas del maestro %s', instance.pk)
+
+
+pre_save.connect(maestro_pre_save, sender=Maestro, dispatch_uid='maestro_pre_save')
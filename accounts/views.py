@@ -6,12 +6,15 @@ from .forms import RegistroForm, LoginForm, PasswordResetRequestForm, PasswordRe
 from .models import Registro, Rol, Administrativo, PasswordResetRequest
 from django.contrib.auth.hashers import make_password, check_password
 from people.models import Acudiente, Estudiante
+from school.matricula_actual import RELACIONES_ACTUALES, matricula_actual
 from django.db.models import Q
 from django.conf import settings
 from django.core.files.storage import default_storage
 import os
+import time
 from django.db.utils import OperationalError
 from django.contrib.auth.decorators import login_required
+from utils import geo
 
 
 def register_view(request):
@@ -30,12 +33,16 @@ def register_view(request):
             dir_acu = form.cleaned_data.get('dir_acu')
             cedula = request.FILES.get('cedula_img')
             foto = request.FILES.get('foto_perfil')
+            lat, lon = form.cleaned_data.get('dir_lat'), form.cleaned_data.get('dir_lon')
+            if form.cleaned_data.get('dir_fuente') == 'offline':
+                # centro del municipio (Nominatim caído): que la validación en segundo plano las calcule
+                lat = lon = None
             Acudiente.objects.create(
                 num_doc_acu=num_doc,
                 tel_acu=tel,
                 dir_acu=dir_acu,
-                lat_acu=form.cleaned_data.get('dir_lat'),
-                lon_acu=form.cleaned_data.get('dir_lon'),
+                lat_acu=lat,
+                lon_acu=lon,
                 acc_acu=form.cleaned_data.get('dir_acc'),
                 id_usu=registro,
                 cedula_img=cedula,
@@ -66,6 +73,9 @@ def register_view(request):
         form = RegistroForm()
     return render(request, 'accounts/register.html', {'form': form})
 
+# Palabras de la consulta que se buscan por separado cuando la completa no da resultados
+MAX_TOKENS_SUGERENCIA = 4
+
 
 def address_suggest(request):
     """Endpoint simple para autocompletar direcciones usando Nominatim.
@@ -74,154 +84,104 @@ def address_suggest(request):
     - q: texto a buscar
     - country: código de país ISO2 (default CO)
     - limit: número de sugerencias (default 5)
+
+    Las consultas pasan por la caché de `utils.geo`: cada variante (con y sin
+    país, por palabra) se consulta a Nominatim una sola vez. Las variantes se
+    buscan con un plazo común y la respuesta no espera más de
+    `settings.SUGERENCIAS_PLAZO_MS` por todas ellas, la primera incluida.
     """
     q = (request.GET.get('q') or '').strip()
+    # Plazo común de todas las búsquedas de esta tecla
+    plazo = getattr(settings, 'SUGERENCIAS_PLAZO_MS', 800) / 1000.0
+    fin = time.time() + plazo
     # Si no hay q pero sí lat/lon, devolver sugerencias "cercanas"
     lat_param = request.GET.get('lat')
     lon_param = request.GET.get('lon')
     # Normalizar query (bajar a minúsculas y quitar espacios duplicados)
-    q_norm = ' '.join(q.lower().split())
+    q_norm = geo.normalizar_consulta(q)
     if not q_norm and lat_param and lon_param:
-        try:
-            import requests
-        except Exception:
-            return JsonResponse({'results': []})
         try:
             latf = float(lat_param)
             lonf = float(lon_param)
         except Exception:
             return JsonResponse({'results': []})
-        # Obtener algunas vías cercanas usando tokens comunes (minimizar llamadas)
+        # Vías cercanas: una búsqueda por tipo de vía, en paralelo y con plazo (ver utils.geo.buscar_varias)
         tokens = ['calle', 'carrera']
         resultados = []
-        headers = {'User-Agent': 'matrischol/1.0 (admin@matrischol.local)'}
-        delta = 0.15
-        left = lonf - delta
-        right = lonf + delta
-        top = latf + delta
-        bottom = latf - delta
-        for tk in tokens:
-            if len(resultados) >= 5:
-                break
-            params_tok = {
-                'q': tk,
-                'format': 'jsonv2',
-                'addressdetails': 1,
-                'limit': 5,
-                'viewbox': f"{left},{top},{right},{bottom}",
-                'bounded': 1,
-                'countrycodes': (request.GET.get('country') or 'CO').strip().lower(),
-            }
+        viewbox = geo.viewbox_alrededor(latf, lonf)
+        country = (request.GET.get('country') or 'CO').strip()
+        listas = geo.buscar_varias([(tk, country) for tk in tokens], limit=5, viewbox=viewbox, fin=fin)
+        for it in geo.combinar(listas, len(tokens) * 5):
+            label = it.get('display_name')
             try:
-                rtk = requests.get('https://nominatim.openstreetmap.org/search', params=params_tok, headers=headers, timeout=4.0)
-                rtk.raise_for_status()
-                data_tok = rtk.json() or []
+                latv = float(it.get('lat')) if it.get('lat') else None
+                lonv = float(it.get('lon')) if it.get('lon') else None
             except Exception:
-                data_tok = []
-            for it in data_tok:
-                if len(resultados) >= 5:
-                    break
-                label = it.get('display_name')
-                try:
-                    latv = float(it.get('lat')) if it.get('lat') else None
-                    lonv = float(it.get('lon')) if it.get('lon') else None
-                except Exception:
-                    latv = None; lonv = None
-                if label and latv is not None and lonv is not None and label not in [r['label'] for r in resultados]:
-                    resultados.append({'label': label, 'lat': latv, 'lon': lonv})
+                latv = None; lonv = None
+            if label and latv is not None and lonv is not None:
+                resultados.append({'label': label, 'lat': latv, 'lon': lonv})
+            if len(resultados) >= 5:
+                break
         return JsonResponse({'results': resultados})
     if not q_norm:
         return JsonResponse({'results': []})
     country = (request.GET.get('country') or 'CO').strip() or 'CO'
-    # Opcional: limitar por lat/lon del usuario (bounding box) para resultados más relevantes
-    # lat/lon ya calculados arriba si q vacío; aquí sólo para búsquedas con texto
-    lat_param = request.GET.get('lat')
-    lon_param = request.GET.get('lon')
     try:
         limit = int(request.GET.get('limit') or '5')
     except Exception:
         limit = 5
     limit = max(1, min(limit, 10))
 
-    try:
-        import requests  # importar dentro para no romper en falta de dependencia
-    except Exception:
-        return JsonResponse({'results': []})
-
-    url = 'https://nominatim.openstreetmap.org/search'
-    params = {
-        'q': q_norm,
-        'format': 'jsonv2',
-        'addressdetails': 1,
-        'limit': limit,
-        'countrycodes': country.lower(),
-        'accept-language': 'es',
-    }
+    # Opcional: limitar por lat/lon del usuario (bounding box) para resultados más relevantes
+    viewbox = None
     if lat_param and lon_param:
         try:
-            latf = float(lat_param)
-            lonf = float(lon_param)
-            delta = 0.15  # ~15km aprox
-            left = lonf - delta
-            right = lonf + delta
-            top = latf + delta
-            bottom = latf - delta
-            params['viewbox'] = f"{left},{top},{right},{bottom}"
-            params['bounded'] = 1
-        except Exception:
-            pass
-    headers = {
-        'User-Agent': 'matrischol/1.0 (admin@matrischol.local)'
-    }
-    def perform_search(local_params):
-        try:
-            r = requests.get(url, params=local_params, headers=headers, timeout=4.5)
-            r.raise_for_status()
-            return r.json() or []
+            viewbox = geo.viewbox_alrededor(float(lat_param), float(lon_param))  # ~15km aprox
         except Exception:
-            return []
-
-    data = perform_search(params)
-    # Fallback 1: si vacío y query >=3 quitar filtro de país
-    if not data and len(q_norm) >= 3:
-        params_no_country = dict(params)
-        params_no_country.pop('countrycodes', None)
-        data = perform_search(params_no_country)
-    # Fallback 2: separar tokens y buscar individualmente (merge)
-    if not data and len(q_norm) >= 3:
-        tokens = [t for t in q_norm.split(' ') if t]
-        merged = []
-        for tk in tokens:
-            p_tok = dict(params)
-            p_tok['q'] = tk
-            chunk = perform_search(p_tok)
-            for it in chunk:
-                if it not in merged:
-                    merged.append(it)
-            if len(merged) >= limit:
-                break
-        data = merged[:limit]
+            viewbox = None
+
+    def perform_search(texto, pais):
+        # None si la consulta falló o el limitador la descartó (ver utils.limitador);
+        # el plazo acota la espera del turno y la de Nominatim
+        return geo.buscar(texto, country=pais, limit=limit, viewbox=viewbox, plazo=fin)
+
+    data = perform_search(q_norm, country)
+    # Los fallbacks solo se intentan si Nominatim respondió vacío: tras un fallo
+    # o sin turno, más consultas solo alargarían la cola.
+    # Se lanzan en orden de prioridad con lo que queda del plazo (ver utils.geo.buscar_varias):
+    # 1) la consulta sin filtro de país; 2) cada palabra por separado (merge).
+    # Con un pedido por segundo a Nominatim solo una alcanza turno: que sea la primera.
+    if data == [] and len(q_norm) >= 3:
+        tokens = list(dict.fromkeys(t for t in q_norm.split(' ') if len(t) >= 3))[:MAX_TOKENS_SUGERENCIA]
+        consultas = [(q_norm, None)] + [(tk, country) for tk in tokens if tk != q_norm]
+
+        def basta(listas):
+            # la consulta completa sin país es la mejor respuesta; si no, suficientes palabras
+            return bool(listas[0]) or len(geo.combinar(listas[1:], limit)) >= limit
+
+        listas = geo.buscar_varias(consultas, limit=limit, viewbox=viewbox, basta=basta, fin=fin, en_orden=True)
+        data = listas[0] or geo.combinar(listas[1:], limit)
 
     results = []
-    for it in data:
+    for it in data or []:
         try:
             label = it.get('display_name')
             lat = float(it.get('lat')) if it.get('lat') else None
             lon = float(it.get('lon')) if it.get('lon') else None
             if not label or lat is None or lon is None:
                 continue
-            results.append({'label': label, 'lat': lat, 'lon': lon})
+            item = {'label': label, 'lat': lat, 'lon': lon}
+            if it.get('fuente'):
+                # 'offline': gazetteer local, coordenadas del municipio (no se guardan, ver register_view)
+                item['fuente'] = it['fuente']
+            results.append(item)
         except Exception:
             continue
     return JsonResponse({'results': results})
 
 
 def address_reverse(request):
-    """Reverse geocoding: lat/lon -> dirección normalizada."""
-    try:
-        import requests
-    except Exception:
-        return JsonResponse({'ok': False, 'address': None})
+    """Reverse geocoding: lat/lon -> dirección normalizada (en caché por tesela, ver `utils.geo.inversa`)."""
     lat = request.GET.get('lat')
     lon = request.GET.get('lon')
     if not lat or not lon:
@@ -231,19 +191,8 @@ def address_reverse(request):
         lonf = float(lon)
     except Exception:
         return JsonResponse({'ok': False, 'address': None})
-    url = 'https://nominatim.openstreetmap.org/reverse'
-    params = {
-        'lat': latf,
-        'lon': lonf,
-        'format': 'jsonv2',
-        'zoom': 20,  # mayor detalle para reverse
-        'accept-language': 'es',
-    }
-    headers = {'User-Agent': 'matrischol/1.0 (admin@matrischol.local)'}
     try:
-        r = requests.get(url, params=params, headers=headers, timeout=4.5)
-        r.raise_for_status()
-        data = r.json() or {}
+        data = geo.inversa(latf, lonf) or {}
         display = data.get('display_name')
         return JsonResponse({'ok': bool(display), 'address': display})
     except Exception:
@@ -579,45 +528,19 @@ def panel_acudiente(request):
         reg = Registro.objects.get(pk=reg_id)
         acu = Acudiente.objects.filter(id_usu=reg).first()
         if acu:
-            estudiantes = Estudiante.objects.filter(id_acu=acu).select_related('id_usu')
+            estudiantes = Estudiante.objects.filter(id_acu=acu).select_related('id_usu', *RELACIONES_ACTUALES)
             for est in estudiantes:
-                # Determine required documento fields from the latest matrícula
-                from school.models import Matricula, Documento
                 missing = []
                 # check base Estudiante fields as before
                 if not est.fch_nac_estu:
                     missing.append('fecha_nacimiento')
                 # El correo es opcional; no marcarlo como documento faltante
 
-                # look for latest matricula and its Documento
-                try:
-                    mat = Matricula.objects.filter(id_est=est).order_by('-fch_reg_mat').first()
-                    doc = None
-                    if mat:
-                        doc = Documento.objects.filter(id_mat=mat).first()
-                    if not doc:
-                        doc = Documento.objects.filter(id_est=est).first()
-                except OperationalError:
-                    # Migration not applied yet (column missing). Fall back to no documento.
-                    mat = None
-                    doc = None
-
-                # required documento fields (visa_extr_doc es opcional)
-                required_doc_fields = [
-                    'reg_civil_doc', 'doc_idn_acu', 'doc_idn_alum', 'cnt_vac_doc',
-                    'adres_doc', 'fot_alum_doc', 'cer_med_disca_doc', 'cer_esc_doc'
-                ]
-                for f in required_doc_fields:
-                    has = False
-                    if doc:
-                        val = getattr(doc, f, None)
-                        if val:
-                            has = True
-                    # fallback: some info may be on Estudiante (foto_perfil)
-                    if f == 'fot_alum_doc' and est.foto_perfil:
-                        has = True
-                    if not has:
-                        missing.append(f)
+                # documentos obligatorios: resumen materializado en el propio estudiante
+                missing.extend(est.doc_falt_est or [])
+
+                # matrícula vigente (para institución y grado), ya cargada con el estudiante
+                mat = matricula_actual(est)
 
                 documents_complete = (len(missing) == 0)
                 # Determinar grado para visualización (curso asignado o grado solicitado)
@@ -633,7 +556,6 @@ def panel_acudiente(request):
                     'est': est,
                     'documents_complete': documents_complete,
                     'missing': missing,
-                    'documento': doc,
                     'matricula': mat,
                     'grado_display': grado_display,
                 })
@@ -644,29 +566,33 @@ def panel_acudiente(request):
         acudiente = Acudiente.objects.filter(id_usu=reg).first()
     except Exception:
         acudiente = None
-    # Instituciones sugeridas (hasta 6 aleatorias) con sus cursos para grados ofrecidos
-    from school.models import Institucion, Curso
+    # Instituciones sugeridas (hasta 6 con cupo) con su resumen de cupos por grado
+    from school import catalog
     try:
-        # Obtener hasta 6 instituciones aleatorias
-        suggested_instituciones = list(Institucion.objects.order_by('?')[:6])
+        # Sorteadas de la bolsa precalculada del catálogo, con preferencia por las cercanas
+        # a la casa del acudiente y las que tienen cupo en los grados de sus estudiantes
+        lat = lon = None
+        if acudiente is not None and acudiente.lat_acu is not None and acudiente.lon_acu is not None:
+            lat, lon = float(acudiente.lat_acu), float(acudiente.lon_acu)
+        grados = []
+        for item in students_list:
+            mat = item['matricula']
+            grado = None
+            if mat is not None:
+                grado = mat.id_cur.num_grd_cur if mat.id_cur_id else mat.grado_solicitado
+            if grado and grado not in grados:
+                grados.append(grado)
+        suggested_instituciones = catalog.sugerencias(6, lat=lat, lon=lon, grados=grados)
         import random
         # Duplicar si hay menos de 6 para completar siempre dos páginas de 3
         if suggested_instituciones and len(suggested_instituciones) < 6:
             base = suggested_instituciones[:]
             while len(suggested_instituciones) < 6:
                 suggested_instituciones.append(random.choice(base))
-        # Prefetch cursos para evitar múltiples queries en template
-        inst_ids = [i.id_inst for i in suggested_instituciones]
         # Calcular número de páginas del carrusel (grupos de 3)
         import math
         carousel_pages = math.ceil(len(suggested_instituciones) / 3) if suggested_instituciones else 0
         carousel_range = range(carousel_pages)
-        cursos_map = {}
-        for c in Curso.objects.filter(id_inst__in=inst_ids):
-            cursos_map.setdefault(c.id_inst_id, []).append(c)
-        # Adjuntar lista de cursos al objeto (atributo dinámico)
-        for i in suggested_instituciones:
-            setattr(i, 'cursos_list', cursos_map.get(i.id_inst, []))
     except Exception:
         suggested_instituciones = []
         carousel_pages = 0
@@ -863,17 +789,17 @@ def estudiante_detail(request, pk):
 
     estudiante = None
     try:
-        estudiante = Estudiante.objects.select_related('id_usu', 'id_acu').get(pk=pk)
+        estudiante = Estudiante.objects.select_related('id_usu', 'id_acu', *RELACIONES_ACTUALES).get(pk=pk)
     except Estudiante.DoesNotExist:
         estudiante = None
 
     # handle uploads for foto_perfil and Documento fields from this detail view
-    from school.models import Matricula, Documento
+    from school.models import Documento
     from school.forms import DocumentoUploadForm
 
     try:
-        # find latest matricula and documento (prefer documento linked to matricula, fallback to documento linked to estudiante)
-        mat = Matricula.objects.filter(id_est=estudiante).order_by('-fch_reg_mat').first() if estudiante else None
+        # matrícula vigente y documento (prefer documento linked to matricula, fallback to documento linked to estudiante)
+        mat = matricula_actual(estudiante) if estudiante else None
         documento = None
         if mat:
             documento = Documento.objects.filter(id_mat=mat).first()
@@ -940,32 +866,12 @@ def estudiante_detail(request, pk):
         messages.error(request, 'No tienes permiso para ver ese estudiante o no existe.')
         return redirect('accounts:panel_acudiente')
 
-    # compute documento completeness for template (visa_extr_doc es opcional)
-    required_doc_fields = [
-        'reg_civil_doc', 'doc_idn_acu', 'doc_idn_alum', 'cnt_vac_doc',
-        'adres_doc', 'fot_alum_doc', 'cer_med_disca_doc', 'cer_esc_doc'
-    ]
-    missing_docs = []
-    for f in required_doc_fields:
-        has = False
-        if documento and getattr(documento, f):
-            has = True
-        if f == 'fot_alum_doc' and estudiante.foto_perfil:
-            has = True
-        if not has:
-            missing_docs.append(f)
+    # completitud de documentos: resumen materializado (ver school.documentos)
+    missing_docs = list(estudiante.doc_falt_est or [])
 
     # determine 'major' documents completeness: at least 5 important docs
     important_fields = ['reg_civil_doc', 'doc_idn_alum', 'fot_alum_doc', 'cnt_vac_doc', 'doc_idn_acu']
-    major_count = 0
-    for f in important_fields:
-        ok = False
-        if documento and getattr(documento, f):
-            ok = True
-        if f == 'fot_alum_doc' and estudiante.foto_perfil:
-            ok = True
-        if ok:
-            major_count += 1
+    major_count = len([f for f in important_fields if f not in missing_docs])
     major_complete = (major_count >= 5)
 
     media_url = getattr(settings, 'MEDIA_URL', '/media/')
@@ -974,19 +880,17 @@ def estudiante_detail(request, pk):
     siblings_info = []
     try:
         if acu:
-            siblings = list(Estudiante.objects.select_related('id_usu').filter(id_acu=acu).exclude(pk=estudiante.pk))
-            # Obtener institución y grado para cada herman@ (última matrícula)
-            from school.models import Matricula
+            siblings = list(Estudiante.objects.select_related('id_usu', *RELACIONES_ACTUALES).filter(id_acu=acu).exclude(pk=estudiante.pk))
+            # Obtener institución y grado para cada herman@ (matrícula vigente, ya cargada)
             for s in siblings:
                 inst_name = None
                 grado_disp = None
                 try:
-                    smat = Matricula.objects.filter(id_est=s).select_related('id_cur__id_inst').order_by('-fch_reg_mat').first()
-                    if smat and getattr(smat, 'id_cur', None):
-                        if getattr(smat.id_cur, 'id_inst', None):
-                            inst_name = smat.id_cur.id_inst.nom_inst
-                        if getattr(smat.id_cur, 'grd_cur', None):
-                            grado_disp = smat.id_cur.grd_cur
+                    smat = s.id_mat_act
+                    if s.id_inst_act:
+                        inst_name = s.id_inst_act.nom_inst
+                    if s.id_cur_act and s.id_cur_act.grd_cur:
+                        grado_disp = s.id_cur_act.grd_cur
                     # si no hay curso asignado, mostrar grado solicitado si existe
                     if not grado_disp and smat and getattr(smat, 'grado_solicitado', None):
                         grado_disp = smat.grado_solicitado
@@ -1006,6 +910,7 @@ def estudiante_detail(request, pk):
         'est': estudiante,
         'documento': documento,
         'matricula': mat,
+        'curso': getattr(mat, 'id_cur', None) if mat else None,
         'missing_docs': missing_docs,
         'media_url': media_url,
         'major_count': major_count,
@@ -1018,7 +923,7 @@ def estudiante_detail(request, pk):
 @role_required('acudiente')
 def documentos_panel(request, pk):
     """Panel para subir y revisar documentos vinculados a la matrícula del estudiante."""
-    from school.models import Matricula, Documento
+    from school.models import Documento
     from school.forms import DocumentoUploadForm
 
     reg_id = request.session.get('registro_id')
@@ -1029,7 +934,7 @@ def documentos_panel(request, pk):
     acu = Acudiente.objects.filter(id_usu=reg).first()
 
     try:
-        estudiante = Estudiante.objects.select_related('id_usu', 'id_acu').get(pk=pk)
+        estudiante = Estudiante.objects.select_related('id_usu', 'id_acu', *RELACIONES_ACTUALES).get(pk=pk)
     except Estudiante.DoesNotExist:
         messages.error(request, 'Estudiante no encontrado')
         return redirect('accounts:panel_acudiente')
@@ -1039,8 +944,8 @@ def documentos_panel(request, pk):
         return redirect('accounts:panel_acudiente')
 
     try:
-        # buscar la matrícula más reciente
-        mat = Matricula.objects.filter(id_est=estudiante).order_by('-fch_reg_mat').first()
+        # matrícula vigente (puntero en el estudiante)
+        mat = matricula_actual(estudiante)
         documento = None
         if mat:
             documento = Documento.objects.filter(id_mat=mat).first()
@@ -1100,20 +1005,8 @@ def documentos_panel(request, pk):
     else:
         form = DocumentoUploadForm()
 
-    # determinar estado (visa_extr_doc es opcional)
-    required = [
-        'reg_civil_doc', 'doc_idn_acu', 'doc_idn_alum', 'cnt_vac_doc',
-        'adres_doc', 'fot_alum_doc', 'cer_med_disca_doc', 'cer_esc_doc'
-    ]
-    missing = []
-    for f in required:
-        ok = False
-        if documento and getattr(documento, f):
-            ok = True
-        if f == 'fot_alum_doc' and estudiante.foto_perfil:
-            ok = True
-        if not ok:
-            missing.append(f)
+    # estado de documentos: resumen materializado (ver school.documentos)
+    missing = list(estudiante.doc_falt_est or [])
 
     documents_complete = (len(missing) == 0)
     media_url = getattr(settings, 'MEDIA_URL', '/media/')
@@ -1213,16 +1106,14 @@ def panel_estudiante(request):
     except Registro.DoesNotExist:
         return redirect('accounts:login')
     try:
-        estudiante = Estudiante.objects.select_related('id_usu', 'id_acu').filter(id_usu=user).first()
+        estudiante = Estudiante.objects.select_related('id_usu', 'id_acu', *RELACIONES_ACTUALES).filter(id_usu=user).first()
     except Exception:
         estudiante = None
-    # attempt to fetch latest matrícula and the linked institución (if exists)
+    # matrícula vigente y la institución vinculada (puntero mantenido en el estudiante)
     matricula = None
     institucion = None
     try:
-        from school.models import Matricula
-        # prefer latest matricula and follow relations to curso -> institucion
-        matricula = Matricula.objects.filter(id_est=estudiante).select_related('id_cur__id_inst').order_by('-fch_reg_mat').first() if estudiante else None
+        matricula = matricula_actual(estudiante) if estudiante else None
         if matricula and getattr(matricula, 'id_cur', None) and getattr(matricula.id_cur, 'id_inst', None):
             institucion = matricula.id_cur.id_inst
     except Exception:
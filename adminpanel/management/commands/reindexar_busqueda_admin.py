@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from adminpanel import search_index
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice unificado de búsqueda del panel de administración (AdminSearchEntry)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tipo', action='append', choices=search_index.TIPOS, help='Solo este tipo (repetible)')
+        parser.add_argument('--lote', type=int, default=2000, help='Filas por INSERT ... ON CONFLICT')
+
+    def handle(self, *args, **options):
+        resumen = search_index.reindexar_todo(tipos=options['tipo'] or search_index.TIPOS, lote=options['lote'])
+        for kind, total in resumen.items():
+            self.stdout.write(f'  {kind}: {total}')
+        self.stdout.write(self.style.SUCCESS(f'Índice actualizado: {sum(resumen.values())} filas'))
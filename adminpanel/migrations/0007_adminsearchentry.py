@@ -0,0 +1,111 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:44
+
+import re
+import unicodedata
+
+from django.db import DatabaseError, migrations, models, transaction
+
+PERSONAS = {
+    'estudiante': ('people', 'Estudiante', 'num_doc_est'),
+    'acudiente': ('people', 'Acudiente', 'num_doc_acu'),
+    'maestro': ('people', 'Maestro', 'num_doc_mae'),
+    'administrativo': ('accounts', 'Administrativo', 'num_doc_adm'),
+}
+
+
+def _palabras(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch))
+    return re.findall(r'\w+', texto.lower())
+
+
+def _entrada(AdminSearchEntry, kind, object_id, registro_id, nombre, documento, email, *extra):
+    nombre = ' '.join((nombre or '').split())
+    return AdminSearchEntry(
+        kind=kind,
+        object_id=object_id,
+        registro_id=registro_id,
+        name=nombre[:200],
+        document=''.join(_palabras(documento))[:40],
+        email=(email or '')[:100],
+        search_text=' ' + ' '.join(_palabras(' '.join(p for p in (nombre, email, documento, *extra) if p))),
+    )
+
+
+def backfill(apps, schema_editor):
+    AdminSearchEntry = apps.get_model('adminpanel', 'AdminSearchEntry')
+    lote = []
+
+    def agregar(entrada):
+        lote.append(entrada)
+        if len(lote) >= 2000:
+            AdminSearchEntry.objects.bulk_create(lote)
+            lote.clear()
+
+    for kind, (app, modelo, campo_doc) in PERSONAS.items():
+        filas = apps.get_model(app, modelo).objects.values_list(
+            'pk', 'id_usu_id', 'id_usu__nom_usu', 'id_usu__ape_usu', 'id_usu__ema_usu', campo_doc
+        )
+        for pk, reg_id, nom, ape, ema, doc in filas.iterator(chunk_size=2000):
+            agregar(_entrada(AdminSearchEntry, kind, pk, reg_id, f"{nom or ''} {ape or ''}", doc, ema))
+    Institucion = apps.get_model('school', 'Institucion')
+    for pk, nom, dane, ema, mun in Institucion.objects.values_list(
+        'pk', 'nom_inst', 'cod_dane_inst', 'ema_inst', 'mun_inst'
+    ).iterator(chunk_size=2000):
+        agregar(_entrada(AdminSearchEntry, 'institucion', pk, None, nom, dane, ema, mun))
+    if lote:
+        AdminSearchEntry.objects.bulk_create(lote)
+
+
+def crear_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor != 'postgresql':
+        return
+    # pg_trgm puede no estar permitido en algunos planes: sin él la búsqueda por nombre recorre la tabla
+    try:
+        with transaction.atomic(using=connection.alias):
+            schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    except DatabaseError:
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS adminsearch_text_trgm_idx ON adminpanel_adminsearchentry '
+        'USING gin (search_text gin_trgm_ops)'
+    )
+
+
+def borrar_indice(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS adminsearch_text_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('adminpanel', '0006_adminnotification_matricula_request'),
+        ('accounts', '0005_alter_administrativo_dir_adm'),
+        ('people', '0008_estudiante_matricula_actual'),
+        ('school', '0021_cambiocupo'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AdminSearchEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('estudiante', 'Estudiante'), ('acudiente', 'Acudiente'), ('maestro', 'Maestro'), ('administrativo', 'Administrativo'), ('institucion', 'Institución')], max_length=20)),
+                ('object_id', models.IntegerField()),
+                ('registro_id', models.IntegerField(blank=True, db_index=True, null=True)),
+                ('name', models.CharField(max_length=200)),
+                ('document', models.CharField(blank=True, default='', max_length=40)),
+                ('email', models.CharField(blank=True, default='', max_length=100)),
+                ('search_text', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['document'], name='adminsearch_document_idx')],
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='adminsearch_kind_object_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
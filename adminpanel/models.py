@@ -147,3 +147,42 @@ class CursoRequest(models.Model):
         return missing
 
 
+
+
+class AdminSearchEntry(models.Model):
+    """Fila del índice unificado de búsqueda del panel de administración.
+
+    Una fila por estudiante, acudiente, maestro, administrativo o institución,
+    con el documento y el texto ya normalizados (ver `adminpanel.search_index`).
+    Las señales de `adminpanel.signals` la mantienen al día.
+    """
+    KIND_CHOICES = [
+        ('estudiante', 'Estudiante'),
+        ('acudiente', 'Acudiente'),
+        ('maestro', 'Maestro'),
+        ('administrativo', 'Administrativo'),
+        ('institucion', 'Institución'),
+    ]
+
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.IntegerField()
+    # registro (usuario) de la persona, para reindexar cuando cambia su nombre o correo
+    registro_id = models.IntegerField(null=True, blank=True, db_index=True)
+    name = models.CharField(max_length=200)
+    # documento sin espacios, puntos ni guiones, en minúsculas (código DANE para instituciones)
+    document = models.CharField(max_length=40, blank=True, default='')
+    email = models.CharField(max_length=100, blank=True, default='')
+    # ' ' + nombre, correo y documento normalizados: ' tok' encuentra palabras que empiezan por tok
+    search_text = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='adminsearch_kind_object_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['document'], name='adminsearch_document_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.name}"
@@ -0,0 +1,174 @@
+"""Índice unificado de búsqueda del panel de administración.
+
+Estudiantes, acudientes, maestros, administrativos e instituciones viven en
+tablas distintas; `AdminSearchEntry` guarda una fila por cada uno con el
+documento y el nombre ya normalizados, así que una búsqueda es una sola
+consulta sobre una sola tabla:
+
+* documento: prefijo como rango (`document >= q AND document < q || U+10FFFF`),
+  que usa el índice B-tree en cualquier base de datos;
+* nombre y correo: cada palabra de la consulta como prefijo de una palabra de
+  `search_text` (`LIKE '% palabra%'`), que en PostgreSQL usa el índice
+  trigram creado en la migración 0007 si pg_trgm está disponible.
+
+El orden es: documento exacto, documento por prefijo, nombre que empieza por
+la consulta y el resto, y dentro de cada grupo por nombre.
+"""
+import re
+
+from django.db.models import Case, Exists, IntegerField, OuterRef, Q, Value, When
+
+from accounts.models import Administrativo
+from people.models import Acudiente, Estudiante, Maestro
+from school.models import Institucion
+from utils.texto import normalizar_texto
+
+from .models import AdminSearchEntry
+
+# tipo -> (modelo, campo de documento)
+PERSONAS = {
+    'estudiante': (Estudiante, 'num_doc_est'),
+    'acudiente': (Acudiente, 'num_doc_acu'),
+    'maestro': (Maestro, 'num_doc_mae'),
+    'administrativo': (Administrativo, 'num_doc_adm'),
+}
+TIPOS = tuple(PERSONAS) + ('institucion',)
+CAMPOS_ACTUALIZABLES = ['registro_id', 'name', 'document', 'email', 'search_text', 'updated_at']
+# después de cualquier carácter que pueda aparecer en un documento normalizado
+_FIN = '\U0010ffff'
+
+
+def palabras(texto):
+    return re.findall(r'\w+', normalizar_texto(texto))
+
+
+def normalizar_documento(doc):
+    """'1.234.567-8' -> '12345678'."""
+    return ''.join(palabras(doc))
+
+
+def _entrada(kind, object_id, registro_id, nombre, documento, email, *extra):
+    nombre = ' '.join((nombre or '').split())
+    return AdminSearchEntry(
+        kind=kind,
+        object_id=object_id,
+        registro_id=registro_id,
+        name=nombre[:200],
+        document=normalizar_documento(documento)[:40],
+        email=(email or '')[:100],
+        search_text=' ' + ' '.join(palabras(' '.join(p for p in (nombre, email, documento, *extra) if p))),
+    )
+
+
+def entradas(kind, ids=None):
+    """AdminSearchEntry (sin guardar) del tipo indicado, de todos o de `ids`."""
+    if kind == 'institucion':
+        qs = Institucion.objects.all()
+        if ids is not None:
+            qs = qs.filter(pk__in=ids)
+        for pk, nom, dane, ema, mun in qs.values_list('pk', 'nom_inst', 'cod_dane_inst', 'ema_inst', 'mun_inst').iterator(chunk_size=2000):
+            yield _entrada(kind, pk, None, nom, dane, ema, mun)
+        return
+    modelo, campo_doc = PERSONAS[kind]
+    qs = modelo.objects.all()
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    filas = qs.values_list('pk', 'id_usu_id', 'id_usu__nom_usu', 'id_usu__ape_usu', 'id_usu__ema_usu', campo_doc)
+    for pk, reg_id, nom, ape, ema, doc in filas.iterator(chunk_size=2000):
+        yield _entrada(kind, pk, reg_id, f"{nom or ''} {ape or ''}", doc, ema)
+
+
+def guardar(lista):
+    """Inserta o actualiza las entradas en bloque (una consulta por lote)."""
+    if lista:
+        AdminSearchEntry.objects.bulk_create(
+            lista, batch_size=1000, update_conflicts=True,
+            unique_fields=['kind', 'object_id'], update_fields=CAMPOS_ACTUALIZABLES,
+        )
+
+
+def indexar(kind, ids):
+    """Reindexa los objetos `ids` del tipo; los que ya no existen salen del índice."""
+    ids = sorted(pk for pk in set(ids) if pk)
+    # por tramos: los altas en bloque (simular_matricula) pasan miles de ids
+    for i in range(0, len(ids), 1000):
+        tramo = ids[i:i + 1000]
+        lista = list(entradas(kind, tramo))
+        guardar(lista)
+        vigentes = {e.object_id for e in lista}
+        borrados = [pk for pk in tramo if pk not in vigentes]
+        if borrados:
+            quitar(kind, borrados)
+
+
+def indexar_registro(registro_id):
+    """Reindexa las personas de un registro (cambió su nombre o correo)."""
+    por_tipo = {}
+    for kind, object_id in AdminSearchEntry.objects.filter(registro_id=registro_id).values_list('kind', 'object_id'):
+        por_tipo.setdefault(kind, []).append(object_id)
+    for kind, ids in por_tipo.items():
+        indexar(kind, ids)
+
+
+def quitar(kind, ids):
+    AdminSearchEntry.objects.filter(kind=kind, object_id__in=list(ids)).delete()
+
+
+def reindexar_todo(tipos=TIPOS, lote=2000):
+    """Reconstruye el índice de los tipos indicados; devuelve {tipo: filas}."""
+    resumen = {}
+    for kind in tipos:
+        total = 0
+        pendientes = []
+        for entrada in entradas(kind):
+            pendientes.append(entrada)
+            if len(pendientes) >= lote:
+                guardar(pendientes)
+                total += len(pendientes)
+                pendientes = []
+        guardar(pendientes)
+        total += len(pendientes)
+        # lo que quedó en el índice sin objeto detrás (borrado sin señales)
+        modelo = Institucion if kind == 'institucion' else PERSONAS[kind][0]
+        existe = Exists(modelo.objects.filter(pk=OuterRef('object_id')))
+        AdminSearchEntry.objects.filter(kind=kind).exclude(existe).delete()
+        resumen[kind] = total
+    return resumen
+
+
+def buscar(q, page=1, per_page=20, kinds=None):
+    """(entradas de la página, hay_más) para la consulta, en una sola consulta SQL.
+
+    Se pide una fila de más para saber si hay otra página sin contar el total.
+    """
+    tokens = palabras(q)
+    if not tokens:
+        return [], False
+    doc = ''.join(tokens)
+    texto = Q()
+    for t in tokens:
+        texto &= Q(search_text__contains=' ' + t)
+    prefijo_doc = Q(document__gte=doc, document__lt=doc + _FIN)
+    if doc.isdigit() and len(doc) >= 3:
+        # solo números: es un documento; el rango usa el índice sin recorrer search_text
+        filtro = prefijo_doc
+    elif len(doc) >= 3:
+        filtro = prefijo_doc | texto
+    else:
+        # un documento de 1-2 caracteres coincide con casi todos: solo cuenta como texto
+        filtro = texto
+
+    qs = AdminSearchEntry.objects.filter(filtro)
+    if kinds:
+        qs = qs.filter(kind__in=kinds)
+    qs = qs.annotate(rank=Case(
+        When(document=doc, then=Value(0)),
+        When(prefijo_doc, then=Value(1)),
+        When(search_text__startswith=' ' + ' '.join(tokens), then=Value(2)),
+        default=Value(3),
+        output_field=IntegerField(),
+    )).order_by('rank', 'name', 'kind', 'object_id')
+
+    inicio = (page - 1) * per_page
+    filas = list(qs[inicio:inicio + per_page + 1])
+    return filas[:per_page], len(filas) > per_page
@@ -1,10 +1,17 @@
 import os
-from django.db.models.signals import post_save
+import logging
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from .models import AdminNotification
+from . import search_index
+from accounts.models import Administrativo, Registro
+from people.models import Acudiente, Estudiante, Maestro
+from school.models import Institucion
 from communications.email_utils import send_email
 from django.conf import settings
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender=AdminNotification)
 def adminnotification_post_save(sender, instance, created, **kwargs):
@@ -82,3 +89,47 @@ def adminnotification_post_save(sender, instance, created, **kwargs):
     except Exception:
         # proteger el flujo principal de excepciones en el signal
         return
+
+
+# ---------------------------------------------------------------------------
+# Índice unificado de búsqueda (adminpanel.search_index)
+# ---------------------------------------------------------------------------
+
+_TIPO_POR_MODELO = {
+    Estudiante: 'estudiante',
+    Acudiente: 'acudiente',
+    Maestro: 'maestro',
+    Administrativo: 'administrativo',
+    Institucion: 'institucion',
+}
+
+
+def _indexado(sender, instance, **kwargs):
+    # un fallo del índice no debe impedir guardar la persona: se corrige con reindexar_busqueda_admin
+    try:
+        search_index.indexar(_TIPO_POR_MODELO[sender], [instance.pk])
+    except Exception:
+        logger.exception('No se pudo indexar %s %s para la búsqueda del panel', sender.__name__, instance.pk)
+
+
+def _desindexado(sender, instance, **kwargs):
+    try:
+        search_index.quitar(_TIPO_POR_MODELO[sender], [instance.pk])
+    except Exception:
+        logger.exception('No se pudo quitar %s %s de la búsqueda del panel', sender.__name__, instance.pk)
+
+
+for _modelo in _TIPO_POR_MODELO:
+    post_save.connect(_indexado, sender=_modelo, dispatch_uid=f'adminsearch_save_{_modelo.__name__}')
+    post_delete.connect(_desindexado, sender=_modelo, dispatch_uid=f'adminsearch_delete_{_modelo.__name__}')
+
+
+@receiver(post_save, sender=Registro)
+def registro_reindexado(sender, instance, created, **kwargs):
+    """El nombre y el correo de las personas salen del registro."""
+    if created:
+        return
+    try:
+        search_index.indexar_registro(instance.pk)
+    except Exception:
+        logger.exception('No se pudo reindexar el registro %s para la búsqueda del panel', instance.pk)
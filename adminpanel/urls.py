@@ -6,6 +6,7 @@ app_name = 'adminpanel'
 urlpatterns = [
     path('', views.dashboard_view, name='dashboard'),
     path('registros/', views.registro_list, name='registro_list'),
+    path('buscar/', views.admin_search, name='admin_search'),
     path('registros/create/', views.registro_create, name='registro_create'),
     path('registros/<int:pk>/edit/', views.registro_edit, name='registro_edit'),
     path('registros/<int:pk>/delete/', views.registro_delete, name='registro_delete'),
@@ -12,28 +12,29 @@ from django.db.utils import OperationalError
 from school.models import Institucion, Curso
 from people.models import Maestro
 from django.db.models import Count
-from django.db import IntegrityError
+from django.db import IntegrityError, transaction
 from accounts.models import Administrativo as AdministrativoModel
-from django.http import HttpResponse
+from django.http import HttpResponse, JsonResponse
 import csv
 
 # import audit model lazily to avoid circular issues
 from .models import AdminActionLog
+from . import search_index
 from .models import InstitucionRequest, AdminNotification
 from .forms import InstitucionRequestForm
 from .models import CursoRequest
 from .forms import CursoRequestForm
-from school.models import MatriculaRequest, Matricula
-from django.utils import timezone
+from school.models import MatriculaRequest
 from school.models import Documento
 from django.conf import settings
-import random
 from school.models import Asignatura, Horario
 from django import forms
 from communications.email_utils import send_institucion_status_email
 from communications.email_utils import send_curso_request_admin, send_curso_status_to_submitter
 from people.models import Acudiente
 
+logger = logging.getLogger(__name__)
+
 
 def log_action(request, action, model_name, object_repr='', details=''):
     try:
@@ -89,6 +90,52 @@ def registro_list(request):
     return render(request, 'adminpanel/registro_list.html', {'registros': registros, 'q': q})
 
 
+_URL_POR_TIPO = {
+    'maestro': 'adminpanel:maestro_edit',
+    'administrativo': 'adminpanel:administrativo_edit',
+    'institucion': 'adminpanel:institucion_edit',
+}
+
+
+def _url_resultado(entrada):
+    # estudiantes y acudientes se editan desde su registro de usuario
+    if entrada.kind in _URL_POR_TIPO:
+        return reverse(_URL_POR_TIPO[entrada.kind], args=[entrada.object_id])
+    if entrada.registro_id:
+        return reverse('adminpanel:registro_edit', args=[entrada.registro_id])
+    return None
+
+
+@admin_required
+def admin_search(request):
+    """Búsqueda unificada por documento o nombre (JSON).
+
+    `q`, `page` (desde 1) y `tipo` (repetible: estudiante, acudiente, maestro,
+    administrativo, institucion). Respuesta: {results: [{tipo, id, nombre,
+    documento, email, url}], page, has_next}; una sola consulta sobre el
+    índice de adminpanel.search_index.
+    """
+    q = request.GET.get('q', '').strip()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except (TypeError, ValueError):
+        page = 1
+    tipos = [t for t in request.GET.getlist('tipo') if t in search_index.TIPOS]
+    entradas, has_next = search_index.buscar(q, page=page, per_page=20, kinds=tipos or None)
+    results = [
+        {
+            'tipo': e.kind,
+            'id': e.object_id,
+            'nombre': e.name,
+            'documento': e.document,
+            'email': e.email,
+            'url': _url_resultado(e),
+        }
+        for e in entradas
+    ]
+    return JsonResponse({'results': results, 'page': page, 'has_next': has_next})
+
+
 @admin_required
 def rol_list(request):
     q = request.GET.get('q', '').strip()
@@ -1198,47 +1245,23 @@ def matricula_request_detail(request, pk):
         if action == 'hold' and req.estado == 'pending':
             messages.info(request, 'La solicitud ya está EN ESPERA.')
             return redirect('adminpanel:matricula_request_detail', pk=pk)
-        # registrar comentario en la solicitud y cambiar estado
-        if comment:
-            req.obs = (req.obs or '') + '\n' + comment
         if action == 'accept':
-            req.estado = 'accepted'
-            # guardar observaciones en la solicitud
-            req.obs = (req.obs or '') + ('\n' + comment if comment else '')
-            req.save()
-            # seleccionar curso disponible automáticamente
-            assigned_course = None
+            # reservar cupo y crear la matrícula en una sola transacción
+            # (el servicio vuelve a leer la solicitud bloqueada y anexa el comentario)
+            from school.seats import accept_request, RequestAlreadyAccepted, RequestNotAcceptable
             try:
-                # intentar por grado solicitado (e.g. '6' -> cursos que empiezan por '6-')
-                if req.grado_solicitado:
-                    pref = str(int(req.grado_solicitado)) + '-'
-                    qs = Curso.objects.filter(id_inst=req.id_inst, grd_cur__startswith=pref, cup_disp_cur__gt=0)
-                    if qs.exists():
-                        assigned_course = random.choice(list(qs))
-                # fallback: cualquier curso con cupo
-                if not assigned_course:
-                    qs2 = Curso.objects.filter(id_inst=req.id_inst, cup_disp_cur__gt=0)
-                    if qs2.exists():
-                        assigned_course = random.choice(list(qs2))
-                # si se asignó, descontar cupo
-                if assigned_course:
-                    assigned_course.cup_disp_cur = max(0, assigned_course.cup_disp_cur - 1)
-                    assigned_course.save()
-            except Exception:
-                assigned_course = None
-
-            # crear matrícula con datos y observaciones
-            try:
-                mat = Matricula.objects.create(
-                    fch_reg_mat=timezone.now().date(),
-                    id_est=req.id_est,
-                    id_cur=assigned_course if assigned_course else None,
-                    grado_solicitado=req.grado_solicitado,
-                    est_mat='activo',
-                    obs_mat=comment or ''
-                )
-            except Exception:
-                mat = None
+                mat, assigned_course = accept_request(req.pk, comment=comment, any_grade_fallback=True, allow_unassigned=True)
+            except RequestAlreadyAccepted:
+                messages.info(request, 'La solicitud ya está ACEPTADA.')
+                return redirect('adminpanel:matricula_request_detail', pk=pk)
+            except RequestNotAcceptable:
+                messages.error(request, f'La solicitud está {req.get_estado_display().upper()}: solo se aceptan solicitudes pendientes o en lista de espera.')
+                return redirect('adminpanel:matricula_request_detail', pk=pk)
+            except OperationalError:
+                logger.exception('No se pudo aceptar la solicitud de matrícula %s', req.pk)
+                messages.error(request, 'La base de datos está ocupada; no se aceptó la solicitud. Inténtalo de nuevo en unos segundos.')
+                return redirect('adminpanel:matricula_request_detail', pk=pk)
+            req.refresh_from_db()
 
             messages.success(request, 'Solicitud aceptada y matrícula creada' + (f' (curso asignado: {assigned_course.grd_cur})' if assigned_course else ' (sin curso asignado - sin cupos)'))
             # notificar al acudiente
@@ -1268,6 +1291,8 @@ def matricula_request_detail(request, pk):
                 pass
             return redirect('adminpanel:notifications')
         elif action == 'reject':
+            if comment:
+                req.obs = (req.obs or '') + '\n' + comment
             req.estado = 'rejected'
             req.save()
             try:
@@ -1295,8 +1320,16 @@ def matricula_request_detail(request, pk):
                 pass
             return redirect('adminpanel:notifications')
         elif action == 'hold':
+            if comment:
+                req.obs = (req.obs or '') + '\n' + comment
             req.estado = 'pending'
-            req.save()
+            try:
+                with transaction.atomic():
+                    req.save()
+            except IntegrityError:
+                # matricula_req_activa_uniq: ya hay otra solicitud activa del estudiante en esta institución
+                messages.error(request, 'El estudiante ya tiene otra solicitud activa en esta institución')
+                return redirect('adminpanel:notifications')
             # Notificar al acudiente que la solicitud quedó en espera
             try:
                 from adminpanel.models import AdminNotification
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Mensaje, Notificacion, Reporte
+from .models import Mensaje, Notificacion, Reporte, CorreoPendiente
 
 
 @admin.register(Mensaje)
@@ -15,3 +15,9 @@ class NotificacionAdmin(admin.ModelAdmin):
 @admin.register(Reporte)
 class ReporteAdmin(admin.ModelAdmin):
     list_display = ('id_rep', 'tit_rep', 'id_usu', 'fch_rep')
+
+
+@admin.register(CorreoPendiente)
+class CorreoPendienteAdmin(admin.ModelAdmin):
+    list_display = ('id_cor', 'asunto', 'destinatario', 'tipo', 'estado', 'intentos', 'siguiente_intento', 'created_at', 'fch_envio')
+    list_filter = ('estado', 'tipo')
@@ -1,7 +1,9 @@
+import datetime
+
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.conf import settings
-from .models import EmailLog
+from .models import EmailLog, CorreoPendiente
 from django.utils import timezone
 
 
@@ -69,6 +71,112 @@ def send_email(subject: str, to_email: str, template_html: str, context: dict, t
     return log
 
 
+def queue_emails(items):
+    """Encola varios correos en una sola inserción para enviarlos luego por lotes.
+    :param items: iterable de dicts con las mismas claves que `send_email`
+        (subject, to_email, template_html, context, template_txt, tipo, user).
+        El contexto debe ser serializable a JSON.
+    :returns: número de correos encolados (se omiten los que no tienen destinatario)
+    """
+    rows = []
+    for item in items:
+        to_email = item.get('to_email')
+        if not to_email:
+            continue
+        rows.append(CorreoPendiente(
+            destinatario=to_email,
+            asunto=item['subject'],
+            template_html=item['template_html'],
+            template_txt=item.get('template_txt'),
+            contexto=item.get('context') or {},
+            tipo=item.get('tipo', 'generic'),
+            id_usu=item.get('user'),
+        ))
+    CorreoPendiente.objects.bulk_create(rows, batch_size=500)
+    return len(rows)
+
+
+# segundos que un proceso tiene los correos que tomó antes de que otro pueda retomarlos
+ENVIO_LEASE_SEGUNDOS = 600
+# espera antes del primer reintento; se duplica en cada fallo
+REINTENTO_BASE_SEGUNDOS = 60
+
+
+def _tomar_lote(limit):
+    """Marca como 'sending' hasta `limit` correos listos y los devuelve; la transacción termina aquí.
+
+    Se saltan las filas que otro proceso está tomando en ese momento; las que
+    quedaron en 'sending' de un proceso que murió se retoman al vencer su lease.
+    """
+    from django.db import transaction
+    from django.db.models import Q
+
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            CorreoPendiente.objects
+            .select_for_update(skip_locked=True)
+            .filter(
+                Q(estado='pending', siguiente_intento__isnull=True)
+                | Q(estado='pending', siguiente_intento__lte=now)
+                | Q(estado='sending', bloqueado_hasta__lt=now)
+            )
+            .order_by('id_cor')
+            .values_list('id_cor', flat=True)[:limit]
+        )
+        if ids:
+            CorreoPendiente.objects.filter(pk__in=ids).update(
+                estado='sending', bloqueado_hasta=now + datetime.timedelta(seconds=ENVIO_LEASE_SEGUNDOS),
+            )
+    return list(CorreoPendiente.objects.filter(pk__in=ids).select_related('id_usu').order_by('id_cor'))
+
+
+def send_queued_emails(limit=100, max_attempts=3):
+    """Envía hasta `limit` correos de la cola y devuelve (enviados, fallidos, tomados).
+
+    Primero se toman los correos (estado 'sending' con un lease) en una
+    transacción corta; el envío ocurre fuera de ella, así que no se retienen
+    bloqueos mientras se habla con el proveedor, y los resultados se guardan
+    con un único `bulk_update`. Un correo que falla vuelve a 'pending' con
+    `siguiente_intento` (espera creciente) hasta `max_attempts`. Si `tomados`
+    es menor que `limit` la cola no tiene más correos listos por ahora.
+    """
+    batch = _tomar_lote(limit)
+    sent = failed = 0
+    for item in batch:
+        log = send_email(
+            subject=item.asunto,
+            to_email=item.destinatario,
+            template_html=item.template_html,
+            context=dict(item.contexto or {}),
+            template_txt=item.template_txt,
+            tipo=item.tipo,
+            user=item.id_usu,
+        )
+        item.intentos += 1
+        item.bloqueado_hasta = None
+        if log.exito:
+            item.estado = 'sent'
+            item.error = None
+            item.fch_envio = timezone.now()
+            item.siguiente_intento = None
+            sent += 1
+        else:
+            item.error = log.error
+            if item.intentos >= max_attempts:
+                item.estado = 'failed'
+                item.siguiente_intento = None
+                failed += 1
+            else:
+                item.estado = 'pending'
+                espera = REINTENTO_BASE_SEGUNDOS * 2 ** (item.intentos - 1)
+                item.siguiente_intento = timezone.now() + datetime.timedelta(seconds=espera)
+    CorreoPendiente.objects.bulk_update(
+        batch, ['estado', 'intentos', 'error', 'fch_envio', 'siguiente_intento', 'bloqueado_hasta'],
+    )
+    return sent, failed, len(batch)
+
+
 def send_password_change_email(registro, ip=None, ua=None):
     """Email específico para cambio de contraseña."""
     context = {
@@ -188,9 +296,16 @@ def send_matricula_status_to_acudiente(acudiente_registro, req, status, comment=
     :param status: 'accepted'|'rejected'|'pending'
     :param assigned_course: Curso object or None
     """
-    from django.conf import settings
     estudiante_nombre = f"{req.id_est.id_usu.nom_usu} {req.id_est.id_usu.ape_usu}" if getattr(req, 'id_est', None) and getattr(req.id_est, 'id_usu', None) else 'el estudiante'
     course_label = getattr(assigned_course, 'grd_cur', None) if assigned_course else None
+    return send_email(**matricula_status_email(acudiente_registro, estudiante_nombre, status, comment, course_label))
+
+
+def matricula_status_email(acudiente_registro, estudiante_nombre, status, comment=None, course_label=None):
+    """Argumentos de `send_email`/`queue_emails` para el aviso de estado de una solicitud de matrícula.
+    Recibe valores planos para poder armarse desde consultas `values()` sin cargar objetos.
+    """
+    from django.conf import settings
     context = {
         'acudiente_nombre': f"{acudiente_registro.nom_usu} {acudiente_registro.ape_usu}",
         'estudiante_nombre': estudiante_nombre,
@@ -205,16 +320,15 @@ def send_matricula_status_to_acudiente(acudiente_registro, req, status, comment=
         'rejected': 'Solicitud de matrícula rechazada',
         'pending': 'Solicitud de matrícula en espera',
     }
-    subject = subject_map.get(status, 'Actualización de su solicitud de matrícula')
-    return send_email(
-        subject=subject,
-        to_email=getattr(acudiente_registro, 'ema_usu', None),
-        template_html='email/matricula_request_status_acudiente.html',
-        template_txt='email/matricula_request_status_acudiente.txt',
-        context=context,
-        tipo='matricula_status',
-        user=acudiente_registro,
-    )
+    return {
+        'subject': subject_map.get(status, 'Actualización de su solicitud de matrícula'),
+        'to_email': getattr(acudiente_registro, 'ema_usu', None),
+        'template_html': 'email/matricula_request_status_acudiente.html',
+        'template_txt': 'email/matricula_request_status_acudiente.txt',
+        'context': context,
+        'tipo': 'matricula_status',
+        'user': acudiente_registro,
+    }
 
 
 def send_matricula_request_received(acudiente_registro, req):
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from communications.email_utils import send_queued_emails
+
+
+class Command(BaseCommand):
+    help = 'Envía por lotes los correos encolados en CorreoPendiente'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=100, help='Correos por lote')
+        parser.add_argument('--max-attempts', type=int, default=3, help='Intentos antes de marcar un correo como fallido')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed, tomados = send_queued_emails(limit=options['limit'], max_attempts=options['max_attempts'])
+            total_sent += sent
+            total_failed += failed
+            if tomados < options['limit']:
+                break
+        self.stdout.write(self.style.SUCCESS(f'Correos enviados: {total_sent}, fallidos: {total_failed}'))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_administrativo_dir_adm'),
+        ('communications', '0002_emaillog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CorreoPendiente',
+            fields=[
+                ('id_cor', models.AutoField(db_column='id_cor', primary_key=True, serialize=False)),
+                ('destinatario', models.EmailField(db_column='destinatario', max_length=254)),
+                ('asunto', models.CharField(db_column='asunto', max_length=150)),
+                ('template_html', models.CharField(db_column='template_html', max_length=150)),
+                ('template_txt', models.CharField(blank=True, db_column='template_txt', max_length=150, null=True)),
+                ('contexto', models.JSONField(blank=True, db_column='contexto', default=dict)),
+                ('tipo', models.CharField(db_column='tipo', default='generic', max_length=50)),
+                ('estado', models.CharField(choices=[('pending', 'Pendiente'), ('sent', 'Enviado'), ('failed', 'Fallido')], db_column='estado', default='pending', max_length=10)),
+                ('intentos', models.PositiveSmallIntegerField(db_column='intentos', default=0)),
+                ('error', models.TextField(blank=True, db_column='error', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+                ('fch_envio', models.DateTimeField(blank=True, db_column='fch_envio', null=True)),
+                ('id_usu', models.ForeignKey(blank=True, db_column='id_usu', null=True, on_delete=django.db.models.deletion.SET_NULL, to='accounts.registro')),
+            ],
+            options={
+                'db_table': 'correo_pendiente',
+                'indexes': [models.Index(fields=['estado', 'id_cor'], name='correo_pend_estado_idx')],
+            },
+        ),
+    ]
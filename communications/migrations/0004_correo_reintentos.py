@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('communications', '0003_correopendiente'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='correopendiente',
+            name='bloqueado_hasta',
+            field=models.DateTimeField(blank=True, db_column='bloqueado_hasta', null=True),
+        ),
+        migrations.AddField(
+            model_name='correopendiente',
+            name='siguiente_intento',
+            field=models.DateTimeField(blank=True, db_column='siguiente_intento', null=True),
+        ),
+        migrations.AlterField(
+            model_name='correopendiente',
+            name='estado',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('sending', 'Enviando'), ('sent', 'Enviado'), ('failed', 'Fallido')], db_column='estado', default='pending', max_length=10),
+        ),
+    ]
@@ -62,3 +62,45 @@ class EmailLog(models.Model):
 
     def __str__(self):
         return f"Email {self.asunto} -> {self.destinatario}"[:60]
+
+
+class CorreoPendiente(models.Model):
+    """Cola de correos por enviar.
+
+    Los procesos que generan muchos avisos a la vez (p. ej. la expiración de
+    solicitudes) encolan aquí en una sola inserción y `send_queued_emails`
+    los despacha por lotes, registrando cada envío en `EmailLog`.
+    """
+    ESTADO_CHOICES = [
+        ('pending', 'Pendiente'),
+        ('sending', 'Enviando'),
+        ('sent', 'Enviado'),
+        ('failed', 'Fallido'),
+    ]
+
+    id_cor = models.AutoField(primary_key=True, db_column='id_cor')
+    destinatario = models.EmailField(db_column='destinatario')
+    asunto = models.CharField(max_length=150, db_column='asunto')
+    template_html = models.CharField(max_length=150, db_column='template_html')
+    template_txt = models.CharField(max_length=150, null=True, blank=True, db_column='template_txt')
+    contexto = models.JSONField(default=dict, blank=True, db_column='contexto')
+    tipo = models.CharField(max_length=50, default='generic', db_column='tipo')
+    id_usu = models.ForeignKey('accounts.Registro', null=True, blank=True, db_column='id_usu', on_delete=models.SET_NULL)
+    estado = models.CharField(max_length=10, choices=ESTADO_CHOICES, default='pending', db_column='estado')
+    intentos = models.PositiveSmallIntegerField(default=0, db_column='intentos')
+    error = models.TextField(null=True, blank=True, db_column='error')
+    created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
+    fch_envio = models.DateTimeField(null=True, blank=True, db_column='fch_envio')
+    # tras un fallo no se reintenta antes de este instante
+    siguiente_intento = models.DateTimeField(null=True, blank=True, db_column='siguiente_intento')
+    # 'sending': el proceso que lo tomó lo tiene hasta aquí; después otro puede volver a tomarlo
+    bloqueado_hasta = models.DateTimeField(null=True, blank=True, db_column='bloqueado_hasta')
+
+    class Meta:
+        db_table = 'correo_pendiente'
+        indexes = [
+            models.Index(fields=['estado', 'id_cor'], name='correo_pend_estado_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.asunto} -> {self.destinatario}"[:60]
@@ -6,13 +6,16 @@ class NoCacheForAuthPagesMiddleware(MiddlewareMixin):
 
     This middleware sets headers to avoid cached pages allowing access after logout.
     It applies these headers to any request under '/accounts/' and to responses
-    that contain 'registro_id' in the session.
+    that contain 'registro_id' in the session, unless the view already chose its
+    own Cache-Control (e.g. the ETag-revalidated institution search).
     """
 
     def process_response(self, request, response):
         try:
             path = request.path or ''
             # apply to accounts paths or when a session key for our auth exists
+            if response.has_header('Cache-Control'):
+                return response
             if path.startswith('/accounts/') or request.session.get('registro_id'):
                 response['Cache-Control'] = 'no-cache, no-store, must-revalidate, max-age=0'
                 response['Pragma'] = 'no-cache'
@@ -101,6 +101,12 @@ DATABASE_URL = os.environ.get('DATABASE_URL')
 if DATABASE_URL:
     DATABASES['default'] = dj_database_url.parse(DATABASE_URL, conn_max_age=300)
 
+if DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3':
+    # SQLite: `timeout` es cuánto espera (s) una escritura a que se libere el bloqueo antes de
+    # fallar con "database is locked". La aceptación de solicitudes toma el bloqueo al empezar
+    # su transacción (ver school.seats.accept_request); el resto de bloques no lo necesitan.
+    DATABASES['default'].setdefault('OPTIONS', {}).update({'timeout': 20})
+
 # 
 
 # Password validation (kept default)
@@ -142,6 +148,39 @@ CLOUDINARY_STORAGE = {
     'CLOUDINARY_URL': os.getenv('CLOUDINARY_URL'),
 }
 
+# =====================
+# Admisión por lotes: política por defecto de la acción del admin (fifo | lottery | siblings)
+MATRICULA_ADMISSION_POLICY = os.getenv('MATRICULA_ADMISSION_POLICY', 'fifo')
+
+# =====================
+# Catálogo de instituciones en memoria (school.catalog): facetas, cercanía y sugerencias sin consultar la BD;
+# el texto de la búsqueda se resuelve siempre con el índice FTS5/tsvector (school.search).
+# CATALOGO_TTL: segundos entre comprobaciones de la versión del catálogo en cada proceso.
+# CATALOGO_CUPOS_TTL: segundos entre relecturas del resumen de cupos de la foto (qué instituciones tienen cupo).
+# CATALOGO_SUGERENCIAS_TTL: segundos entre reconstrucciones de la bolsa de sugerencias.
+CATALOGO_EN_MEMORIA = os.getenv('CATALOGO_EN_MEMORIA', 'True') == 'True'
+CATALOGO_TTL = float(os.getenv('CATALOGO_TTL', '5'))
+CATALOGO_CUPOS_TTL = float(os.getenv('CATALOGO_CUPOS_TTL', '30'))
+CATALOGO_SUGERENCIAS_TTL = float(os.getenv('CATALOGO_SUGERENCIAS_TTL', '60'))
+# Segundos entre sondeos de los cambios de cupos desde el panel del acudiente (school.views.availability_changes).
+CAMBIOS_SONDEO_SEGUNDOS = float(os.getenv('CAMBIOS_SONDEO_SEGUNDOS', '10'))
+# Caché de geocodificación (utils.geocache): días que vale una respuesta de Nominatim y horas que vale una sin resultado.
+GEOCODIFICACION_CACHE_DIAS = float(os.getenv('GEOCODIFICACION_CACHE_DIAS', '30'))
+GEOCODIFICACION_CACHE_VACIO_HORAS = float(os.getenv('GEOCODIFICACION_CACHE_VACIO_HORAS', '24'))
+# Consultas por segundo a Nominatim entre todos los procesos (utils.limitador); su política permite 1.
+NOMINATIM_POR_SEGUNDO = float(os.getenv('NOMINATIM_POR_SEGUNDO', '1'))
+# Geocodificador principal (utils.geocodificadores): 'nominatim', 'offline' (gazetteer local, sin red) o 'falso' (desarrollo y simulación de carga, sin red).
+GEOCODIFICADOR = os.getenv('GEOCODIFICADOR', 'nominatim')
+# Fallos seguidos de Nominatim que abren el circuito y segundos que pasa abierto (mientras tanto responde el gazetteer local).
+GEOCODIFICACION_CIRCUITO_FALLOS = int(os.getenv('GEOCODIFICACION_CIRCUITO_FALLOS', '5'))
+GEOCODIFICACION_CIRCUITO_SEGUNDOS = float(os.getenv('GEOCODIFICACION_CIRCUITO_SEGUNDOS', '30'))
+# CSV con el DIVIPOLA completo (cod_mun,nombre,lat,lon) para el gazetteer local; vacío = solo el núcleo incluido.
+GEOCODIFICACION_DIVIPOLA_CSV = os.getenv('GEOCODIFICACION_DIVIPOLA_CSV', '')
+# Autocompletado de direcciones: milisegundos que se espera, en total, a las búsquedas de cada tecla
+# e hilos por proceso que las ejecutan (utils.geo.buscar_varias).
+SUGERENCIAS_PLAZO_MS = int(os.getenv('SUGERENCIAS_PLAZO_MS', '800'))
+GEOCODIFICACION_HILOS = int(os.getenv('GEOCODIFICACION_HILOS', '4'))
+
 # =====================
 # SITE_URL para enlaces en correos y frontend
 SITE_URL = os.getenv('SITE_URL', 'http://127.0.0.1:8000')
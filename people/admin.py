@@ -4,7 +4,9 @@ from .models import Acudiente, Estudiante
 
 @admin.register(Acudiente)
 class AcudienteAdmin(admin.ModelAdmin):
-    list_display = ('id_acu', 'num_doc_acu', 'id_usu')
+    list_display = ('id_acu', 'num_doc_acu', 'id_usu', 'est_dir_acu')
+    # direcciones que la validación en segundo plano no encontró (accounts.direcciones)
+    list_filter = ('est_dir_acu',)
 
 
 @admin.register(Estudiante)
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0006_alter_acudiente_dir_acu_alter_maestro_dir_mae'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estudiante',
+            name='doc_comp_est',
+            field=models.BooleanField(db_column='doc_comp_est', default=False),
+        ),
+        migrations.AddField(
+            model_name='estudiante',
+            name='doc_falt_est',
+            field=models.JSONField(blank=True, db_column='doc_falt_est', default=list),
+        ),
+    ]
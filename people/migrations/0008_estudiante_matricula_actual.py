@@ -0,0 +1,43 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:11
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_matricula_actual(apps, schema_editor):
+    Estudiante = apps.get_model('people', 'Estudiante')
+    Matricula = apps.get_model('school', 'Matricula')
+    ultima = Matricula.objects.filter(id_est=OuterRef('pk')).order_by('-fch_reg_mat', '-id_mat')
+    Estudiante.objects.update(
+        id_mat_act=Subquery(ultima.values('id_mat')[:1]),
+        id_cur_act=Subquery(ultima.values('id_cur')[:1]),
+        id_inst_act=Subquery(ultima.values('id_cur__id_inst')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0007_estudiante_doc_comp_est_estudiante_doc_falt_est'),
+        ('school', '0015_claveidempotencia_matricula_req_activa_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='estudiante',
+            name='id_cur_act',
+            field=models.ForeignKey(blank=True, db_column='id_cur_act', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='school.curso'),
+        ),
+        migrations.AddField(
+            model_name='estudiante',
+            name='id_inst_act',
+            field=models.ForeignKey(blank=True, db_column='id_inst_act', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='school.institucion'),
+        ),
+        migrations.AddField(
+            model_name='estudiante',
+            name='id_mat_act',
+            field=models.ForeignKey(blank=True, db_column='id_mat_act', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='school.matricula'),
+        ),
+        migrations.RunPython(backfill_matricula_actual, migrations.RunPython.noop),
+    ]
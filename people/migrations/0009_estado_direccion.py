@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:54
+
+from django.db import migrations, models
+
+
+def marcar_existentes(apps, schema_editor):
+    # Con coordenadas la dirección ya se geocodificó; sin ellas queda para accounts.direcciones
+    Acudiente = apps.get_model('people', 'Acudiente')
+    con_direccion = Acudiente.objects.exclude(dir_acu__isnull=True).exclude(dir_acu='')
+    con_direccion.filter(lat_acu__isnull=False, lon_acu__isnull=False).update(est_dir_acu='validada')
+    con_direccion.filter(est_dir_acu__isnull=True).update(est_dir_acu='pendiente')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0008_estudiante_matricula_actual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='acudiente',
+            name='est_dir_acu',
+            field=models.CharField(blank=True, choices=[('pendiente', 'Pendiente de validar'), ('validada', 'Validada'), ('invalida', 'No encontrada')], db_column='est_dir_acu', db_index=True, max_length=10, null=True),
+        ),
+        migrations.RunPython(marcar_existentes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0009_estado_direccion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='maestro',
+            name='lat_mae',
+            field=models.DecimalField(blank=True, db_column='lat_mae', decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='maestro',
+            name='lon_mae',
+            field=models.DecimalField(blank=True, db_column='lon_mae', decimal_places=6, max_digits=9, null=True),
+        ),
+    ]
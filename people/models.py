@@ -1,5 +1,7 @@
 from django.db import models
 
+from accounts.models import ESTADOS_DIRECCION
+
 
 class Acudiente(models.Model):
     id_acu = models.AutoField(primary_key=True, db_column='id_acu')
@@ -9,6 +11,7 @@ class Acudiente(models.Model):
     lat_acu = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lat_acu')
     lon_acu = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lon_acu')
     acc_acu = models.IntegerField(null=True, blank=True, db_column='acc_acu', help_text='Precisión (m) de la geolocalización capturada')
+    est_dir_acu = models.CharField(max_length=10, choices=ESTADOS_DIRECCION, null=True, blank=True, db_index=True, db_column='est_dir_acu')
     id_usu = models.ForeignKey('accounts.Registro', db_column='id_usu', on_delete=models.CASCADE)
     cedula_img = models.ImageField(upload_to='acudientes/cedulas/', null=True, blank=True, db_column='cedula_img')
     foto_perfil = models.ImageField(upload_to='acudientes/fotos/', null=True, blank=True, db_column='foto_perfil')
@@ -29,6 +32,14 @@ class Estudiante(models.Model):
     id_usu = models.ForeignKey('accounts.Registro', db_column='id_usu', on_delete=models.CASCADE)
     id_acu = models.ForeignKey(Acudiente, db_column='id_acu', on_delete=models.CASCADE)
     foto_perfil = models.ImageField(upload_to='estudiantes/fotos/', null=True, blank=True, db_column='foto_perfil')
+    # resumen de documentos obligatorios, mantenido por school.documentos.sincronizar_documentos
+    doc_comp_est = models.BooleanField(default=False, db_column='doc_comp_est')
+    doc_falt_est = models.JSONField(default=list, blank=True, db_column='doc_falt_est')
+    # matrícula vigente (la más reciente) con su curso e institución, mantenida por
+    # school.matricula_actual al crear, editar o borrar matrículas
+    id_mat_act = models.ForeignKey('school.Matricula', db_column='id_mat_act', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    id_cur_act = models.ForeignKey('school.Curso', db_column='id_cur_act', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    id_inst_act = models.ForeignKey('school.Institucion', db_column='id_inst_act', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
 
     class Meta:
         db_table = 'estudiante'
@@ -42,6 +53,9 @@ class Maestro(models.Model):
     num_doc_mae = models.CharField(max_length=20, db_column='num_doc_mae')
     tel_mae = models.CharField(max_length=20, null=True, blank=True, db_column='tel_mae')
     dir_mae = models.CharField(max_length=300, null=True, blank=True, db_column='dir_mae')
+    # coordenadas de dir_mae (ver comando geocodificar_direcciones)
+    lat_mae = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lat_mae')
+    lon_mae = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lon_mae')
     especialidad = models.CharField(max_length=100, null=True, blank=True, db_column='especialidad')
     id_usu = models.ForeignKey('accounts.Registro', db_column='id_usu', on_delete=models.CASCADE)
     id_inst = models.ForeignKey('school.Institucion', db_column='id_inst', on_delete=models.CASCADE, null=True, blank=True)
@@ -1,15 +1,29 @@
 from django.contrib import admin
 from .models import Institucion, Curso, Matricula, Documento
 from .models import MatriculaRequest
-from django.utils import timezone
+from django.conf import settings
 from django.core.mail import send_mail
-import random
-from .models import Matricula as MatriculaModel
+from .seats import accept_request, NoSeatAvailable, RequestAlreadyAccepted
+from .admission import run_batch_admission
+from . import waitlist
 
 
 @admin.register(Institucion)
 class InstitucionAdmin(admin.ModelAdmin):
     list_display = ('id_inst', 'nom_inst', 'id_adm')
+    actions = ['batch_admission']
+
+    def batch_admission(self, request, queryset):
+        # política configurable vía settings.MATRICULA_ADMISSION_POLICY (fifo | lottery | siblings)
+        policy = getattr(settings, 'MATRICULA_ADMISSION_POLICY', 'fifo')
+        for inst in queryset:
+            summary = run_batch_admission(inst.pk, policy=policy)
+            self.message_user(
+                request,
+                f"{inst.nom_inst}: {summary['accepted']} aceptadas, {summary['waitlisted']} en lista de espera, "
+                f"{summary['duplicates']} duplicadas rechazadas de {summary['pending']} pendientes (política {summary['policy']}, semilla {summary['seed']})",
+            )
+    batch_admission.short_description = 'Admitir por lotes las solicitudes pendientes'
 
 
 @admin.register(Curso)
@@ -35,59 +49,51 @@ class MatriculaRequestAdmin(admin.ModelAdmin):
 
     def accept_requests(self, request, queryset):
         updated = 0
+        waitlisted = 0
         for req in queryset.select_related('id_inst', 'id_est', 'id_acu'):
             if req.estado != 'pending':
                 continue
-            # if a specific course was provided, use it; otherwise pick a random course matching grado_solicitado
-            curso = None
-            if req.id_cur:
-                curso = req.id_cur
-            else:
-                grado = req.grado_solicitado
-                if grado:
-                    candidates = list(Curso.objects.filter(id_inst=req.id_inst).filter(cup_disp_cur__gt=0))
-                    # filter by numeric grade matching
-                    candidates = [c for c in candidates if (str(grado) == ''.join(filter(str.isdigit, c.grd_cur)))]
-                    if candidates:
-                        curso = random.choice(candidates)
-            if not curso:
+            # reservar cupo (curso pedido o uno aleatorio del grado solicitado) y crear la matrícula
+            # en una sola transacción; el descuento de cupo se hace en la base de datos
+            try:
+                mat, curso = accept_request(req.pk)
+            except RequestAlreadyAccepted:
+                continue
+            except NoSeatAvailable:
+                # sin cupo: a la lista de espera del grado (se promueve sola cuando se libere un cupo)
+                try:
+                    waitlist.enqueue(req)
+                    waitlisted += 1
+                except ValueError:
+                    req.estado = 'rejected'
+                    req.obs = 'No hay cupos disponibles para el grado solicitado'
+                    req.save()
+                continue
+            except Exception:
                 req.estado = 'rejected'
-                req.obs = 'No hay cupos disponibles para el grado solicitado'
+                req.obs = 'Error al crear la matrícula'
                 req.save()
                 continue
-
-            # crear matrícula
+            updated += 1
+            # notificar al acudiente
             try:
-                mat = MatriculaModel.objects.create(fch_reg_mat=timezone.now().date(), id_cur=curso, id_est=req.id_est, est_mat='activo')
-                # decrementar cupo
-                curso.cup_disp_cur = max(0, curso.cup_disp_cur - 1)
-                curso.save()
-                req.id_cur = curso
-                req.estado = 'accepted'
-                req.save()
-                updated += 1
-                # notificar al acudiente
-                try:
-                    if req.id_acu and req.id_acu.id_usu:
-                        acudiente_reg = req.id_acu.id_usu
+                if req.id_acu and req.id_acu.id_usu:
+                    acudiente_reg = req.id_acu.id_usu
+                    req.refresh_from_db()
+                    try:
+                        from communications.email_utils import send_matricula_status_to_acudiente
+                        send_matricula_status_to_acudiente(acudiente_reg, req, 'accepted', comment='', assigned_course=curso)
+                    except Exception:
+                        # fallback to send_mail
                         try:
-                            from communications.email_utils import send_matricula_status_to_acudiente
-                            send_matricula_status_to_acudiente(acudiente_reg, req, 'accepted', comment='', assigned_course=curso)
+                            if getattr(acudiente_reg, 'ema_usu', None):
+                                send_mail('Solicitud de matrícula aceptada', f'Tu solicitud ha sido aceptada. Curso asignado: {curso.grd_cur}.', 'no-reply@example.com', [acudiente_reg.ema_usu])
                         except Exception:
-                            # fallback to send_mail
-                            try:
-                                if getattr(acudiente_reg, 'ema_usu', None):
-                                    send_mail('Solicitud de matrícula aceptada', f'Tu solicitud ha sido aceptada. Curso asignado: {curso.grd_cur}.', 'no-reply@example.com', [acudiente_reg.ema_usu])
-                            except Exception:
-                                pass
-                except Exception:
-                    pass
+                            pass
             except Exception:
-                req.estado = 'rejected'
-                req.obs = 'Error al crear la matrícula'
-                req.save()
+                pass
 
-        self.message_user(request, f'Aceptadas {updated} solicitud(es)')
+        self.message_user(request, f'Aceptadas {updated} solicitud(es); {waitlisted} en lista de espera')
     accept_requests.short_description = 'Aceptar solicitudes seleccionadas (asigna curso aleatorio)'
 
     def reject_requests(self, request, queryset):
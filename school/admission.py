@@ -0,0 +1,280 @@
+"""Admisión por lotes de solicitudes de matrícula pendientes.
+
+En lugar de aceptar solicitud por solicitud (una petición POST, varias
+consultas de cursos y un UPDATE de cupo cada una), se cargan una sola vez los
+cursos de la institución y las solicitudes pendientes, se asignan los cupos en
+memoria y se escriben los resultados con inserciones/actualizaciones masivas.
+
+Las políticas de prioridad son funciones registradas en `POLICIES` que reciben
+las solicitudes y devuelven el orden en que se atenderán.
+"""
+import heapq
+import random
+
+from django.db import transaction
+from django.utils import timezone
+
+from .disponibilidad import refrescar_cursos
+from .matricula_actual import refrescar_matricula_actual
+from .models import Curso, Matricula, MatriculaRequest
+
+BATCH_OBS = 'Aceptada en admisión por lotes'
+NO_SEAT_OBS = 'No hay cupos disponibles para el grado solicitado'
+DUPLICATE_OBS = 'Solicitud duplicada: el estudiante tiene otra solicitud en el mismo lote'
+
+
+# ---------------------------------------------------------------------------
+# Políticas de prioridad
+# ---------------------------------------------------------------------------
+
+def _policy_fifo(reqs, inst_id, rng):
+    """Orden de llegada."""
+    return sorted(reqs, key=lambda r: (r.created_at, r.pk))
+
+
+def _policy_lottery(reqs, inst_id, rng):
+    """Sorteo reproducible a partir de la semilla del lote."""
+    ordered = sorted(reqs, key=lambda r: r.pk)
+    rng.shuffle(ordered)
+    return ordered
+
+
+def _policy_siblings(reqs, inst_id, rng):
+    """Primero estudiantes con hermanos ya matriculados en la institución; luego orden de llegada."""
+    acudientes = set(
+        Matricula.objects
+        .filter(id_cur__id_inst=inst_id)
+        .values_list('id_est__id_acu', flat=True)
+        .distinct()
+    )
+    return sorted(reqs, key=lambda r: (r.id_acu_id not in acudientes, r.created_at, r.pk))
+
+
+POLICIES = {
+    'fifo': _policy_fifo,
+    'lottery': _policy_lottery,
+    'siblings': _policy_siblings,
+}
+
+
+# ---------------------------------------------------------------------------
+# Asignación
+# ---------------------------------------------------------------------------
+
+def split_duplicates(reqs):
+    """Separa las solicitudes repetidas del mismo estudiante; se queda con la primera en el orden dado.
+
+    Devuelve (únicas, duplicadas).
+    """
+    seen_students = set()
+    unique, duplicates = [], []
+    for req in reqs:
+        if req.id_est_id in seen_students:
+            duplicates.append(req)
+        else:
+            seen_students.add(req.id_est_id)
+            unique.append(req)
+    return unique, duplicates
+
+
+def assign_seats(reqs, cursos):
+    """Asigna cupos en memoria, repartiendo la carga entre secciones.
+
+    `reqs` ya viene ordenado por la política. Para cada grado se mantiene un
+    heap con la sección que tiene más cupos libres, de modo que 6-01, 6-02, …
+    se llenan de forma pareja. Si la solicitud trae un curso explícito se
+    respeta mientras tenga cupo.
+
+    Modifica `cup_disp_cur` de los cursos recibidos y devuelve una lista de
+    tuplas (solicitud, curso o None).
+    """
+    by_id = {c.pk: c for c in cursos}
+    heaps = {}
+    for c in cursos:
+        grado = c.num_grd_cur
+        if grado is None:
+            continue
+        heaps.setdefault(grado, []).append((-c.cup_disp_cur, c.pk))
+    for heap in heaps.values():
+        heapq.heapify(heap)
+
+    result = []
+    seen_students = set()
+    for req in reqs:
+        if req.id_est_id in seen_students:
+            # solicitud duplicada del mismo estudiante en el lote: no se asigna dos veces
+            # (run_batch_admission las separa antes con split_duplicates y las rechaza)
+            continue
+        seen_students.add(req.id_est_id)
+
+        curso = None
+        explicit = by_id.get(req.id_cur_id) if req.id_cur_id else None
+        if explicit is not None and explicit.cup_disp_cur > 0:
+            curso = explicit
+        else:
+            grado = req.grado_solicitado
+            if grado is None and explicit is not None:
+                grado = explicit.num_grd_cur
+            heap = heaps.get(grado)
+            # descartar entradas obsoletas (el curso pudo cambiar por una asignación explícita)
+            while heap:
+                neg_free, pk = heap[0]
+                if -neg_free != by_id[pk].cup_disp_cur:
+                    heapq.heapreplace(heap, (-by_id[pk].cup_disp_cur, pk))
+                    continue
+                if by_id[pk].cup_disp_cur > 0:
+                    curso = by_id[pk]
+                break
+
+        if curso is not None:
+            curso.cup_disp_cur -= 1
+            heap = heaps.get(curso.num_grd_cur)
+            if heap is not None:
+                heapq.heappush(heap, (-curso.cup_disp_cur, curso.pk))
+        result.append((req, curso))
+    return result
+
+
+def run_batch_admission(inst_id, grado=None, policy='fifo', seed=None, reject_unassigned=False, dry_run=False):
+    """Ejecuta una admisión por lotes para una institución (opcionalmente un grado).
+
+    Todo ocurre en una transacción: se bloquean los cursos de la institución y
+    las solicitudes pendientes, se asignan los cupos y se escriben los
+    resultados con `bulk_create`/`bulk_update`. Las aceptaciones individuales
+    concurrentes (ver `school.seats`) esperan a que termine el lote.
+
+    :param policy: clave de `POLICIES` ('fifo', 'lottery', 'siblings').
+    :param seed: semilla del sorteo; si no se indica se genera y se devuelve.
+    :param reject_unassigned: rechazar las solicitudes sin cupo en lugar de pasarlas a lista de espera.
+    :param dry_run: calcular la asignación y revertir la transacción.
+    :returns: dict con el resumen del lote.
+    """
+    if policy not in POLICIES:
+        raise ValueError(f'Política desconocida: {policy}. Opciones: {", ".join(sorted(POLICIES))}')
+    if seed is None:
+        seed = random.SystemRandom().randrange(1, 2 ** 31)
+    rng = random.Random(seed)
+
+    summary = {
+        'inst_id': inst_id,
+        'grado': grado,
+        'policy': policy,
+        'seed': seed,
+        'pending': 0,
+        'accepted': 0,
+        'waitlisted': 0,
+        'rejected': 0,
+        'duplicates': 0,
+        'by_course': {},
+        'dry_run': dry_run,
+    }
+
+    with transaction.atomic():
+        cursos = list(Curso.objects.select_for_update().filter(id_inst=inst_id).order_by('pk'))
+        reqs_qs = (
+            MatriculaRequest.objects
+            .select_for_update(of=('self',))
+            .filter(id_inst=inst_id, estado='pending')
+            .select_related('id_acu')
+        )
+        if grado is not None:
+            reqs_qs = reqs_qs.filter(grado_solicitado=grado)
+        reqs = list(reqs_qs)
+        summary['pending'] = len(reqs)
+        if not reqs:
+            return summary
+
+        original_free = {c.pk: c.cup_disp_cur for c in cursos}
+        ordered, duplicates = split_duplicates(POLICIES[policy](reqs, inst_id, rng))
+        assignments = assign_seats(ordered, cursos)
+        apply_assignments(assignments, cursos, original_free, summary, reject_unassigned=reject_unassigned,
+                          duplicates=duplicates)
+
+        if dry_run:
+            transaction.set_rollback(True)
+    return summary
+
+
+def apply_assignments(assignments, cursos, original_free, summary, reject_unassigned=False, obs=BATCH_OBS,
+                      duplicates=()):
+    """Escribe en bloque el resultado de `assign_seats`.
+
+    Crea las matrículas, actualiza solicitudes, cupos y disponibilidad y notifica a los
+    acudientes. Las solicitudes sin cupo se rechazan (`reject_unassigned`) o
+    pasan a la lista de espera de su grado. Las `duplicates` (ver
+    `split_duplicates`) se rechazan sin notificar: el acudiente recibe el
+    resultado de la otra solicitud del estudiante. Debe llamarse dentro de la
+    transacción que bloqueó los cursos.
+    """
+    from .waitlist import enqueue_many
+
+    today = timezone.now().date()
+    matriculas = []
+    to_update = []
+    to_waitlist = []
+    for req, curso in assignments:
+        if curso is not None:
+            matriculas.append(Matricula(
+                fch_reg_mat=today,
+                id_est_id=req.id_est_id,
+                id_cur=curso,
+                grado_solicitado=req.grado_solicitado,
+                est_mat='activo',
+                obs_mat=obs,
+                cupo_tomado=True,
+            ))
+            req.id_cur = curso
+            req.estado = 'accepted'
+            req.obs = ((req.obs or '') + '\n' + obs).strip()
+            to_update.append(req)
+            summary['accepted'] += 1
+            summary['by_course'][curso.grd_cur] = summary['by_course'].get(curso.grd_cur, 0) + 1
+        elif reject_unassigned:
+            req.estado = 'rejected'
+            req.obs = NO_SEAT_OBS
+            to_update.append(req)
+            summary['rejected'] += 1
+        else:
+            to_waitlist.append(req)
+            summary['waitlisted'] += 1
+    for req in duplicates:
+        req.estado = 'rejected'
+        req.obs = DUPLICATE_OBS
+        summary['duplicates'] += 1
+
+    Matricula.objects.bulk_create(matriculas, batch_size=500)
+    # bulk_create no dispara señales: actualizar la matrícula vigente en bloque
+    refrescar_matricula_actual([m.id_est_id for m in matriculas])
+    MatriculaRequest.objects.bulk_update(to_update + list(duplicates), ['estado', 'id_cur', 'obs'], batch_size=500)
+    changed = [c for c in cursos if c.cup_disp_cur != original_free[c.pk]]
+    Curso.objects.bulk_update(changed, ['cup_disp_cur'], batch_size=500)
+    # bulk_update tampoco dispara señales: recalcular la disponibilidad de los grados tocados
+    refrescar_cursos([c.pk for c in changed])
+    enqueue_many(to_waitlist)
+    _notify_acudientes(to_update)
+
+
+def _notify_acudientes(reqs):
+    """Crea las notificaciones de panel para los acudientes en una sola inserción."""
+    from adminpanel.models import AdminNotification
+
+    notes = []
+    for req in reqs:
+        acudiente_reg_id = getattr(req.id_acu, 'id_usu_id', None)
+        if not acudiente_reg_id:
+            continue
+        if req.estado == 'accepted':
+            notes.append(AdminNotification(
+                user_id=acudiente_reg_id,
+                title='Solicitud de matrícula aceptada',
+                message=f'Su solicitud de matrícula fue aprobada. Curso asignado: {req.id_cur.grd_cur}.',
+                matricula_request=req,
+            ))
+        else:
+            notes.append(AdminNotification(
+                user_id=acudiente_reg_id,
+                title='Solicitud de matrícula rechazada',
+                message=f'Su solicitud de matrícula fue rechazada. {req.obs or ""}'.strip(),
+                matricula_request=req,
+            ))
+    AdminNotification.objects.bulk_create(notes, batch_size=500)
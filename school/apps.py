@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class SchoolConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'school'
+
+    def ready(self):
+        # conectar los handlers de lista de espera y cupos
+        from . import signals  # noqa: F401
@@ -0,0 +1,127 @@
+"""Índice de prefijos para autocompletar nombres de institución.
+
+Cada palabra normalizada del nombre (sin tildes, en minúsculas) se guarda en
+una lista ordenada junto con la institución a la que pertenece; un prefijo
+se resuelve con dos `bisect` y varias palabras, intersecando sus tramos. Para
+los prefijos de hasta tres letras, que coinciden con miles de nombres, se
+precalculan los mejores candidatos.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+
+from utils.texto import normalizar_texto
+
+from .search import tokens_busqueda
+
+# después de cualquier carácter que pueda aparecer en una palabra normalizada
+_FIN = '\U0010ffff'
+PREFIJO_CORTO = 3
+POPULARES = 64
+LIMITE_DIRECTO = 2000
+
+
+class IndicePrefijos:
+    """Lista ordenada inmutable de (palabra, clave) sobre pares (clave, nombre)."""
+
+    __slots__ = ('palabras', 'rangos', 'claves', 'nombres', 'rango', 'populares')
+
+    def __init__(self, pares):
+        nombres = {}
+        for clave, nombre in pares:
+            normalizado = normalizar_texto(nombre)
+            nombres[clave] = (normalizado, nombre, tuple(normalizado.split()))
+        # orden de desempate precalculado: nombres más cortos primero, luego alfabético
+        orden = sorted(nombres, key=lambda c: (len(nombres[c][0]), nombres[c][0], c))
+        rango = {c: i for i, c in enumerate(orden)}
+
+        entradas = sorted(
+            (palabra, rango[clave], clave)
+            for clave, (_, _, palabras) in nombres.items()
+            for palabra in set(palabras)
+        )
+        self.palabras = [p for p, _, _ in entradas]
+        self.rangos = [r for _, r, _ in entradas]
+        self.claves = [c for _, _, c in entradas]
+        self.nombres = nombres
+        self.rango = rango
+
+        populares = {}
+        for clave in orden:
+            vistos = set()
+            for palabra in nombres[clave][2]:
+                for largo in range(1, min(PREFIJO_CORTO, len(palabra)) + 1):
+                    prefijo = palabra[:largo]
+                    if prefijo in vistos:
+                        continue
+                    vistos.add(prefijo)
+                    lista = populares.setdefault(prefijo, [])
+                    if len(lista) < POPULARES:
+                        lista.append(clave)
+        self.populares = {p: tuple(lista) for p, lista in populares.items()}
+
+    def _rango_de(self, prefijo):
+        i = bisect_left(self.palabras, prefijo)
+        return i, bisect_right(self.palabras, prefijo + _FIN, lo=i)
+
+    def _primeros(self, i, j):
+        """Hasta POPULARES claves distintas de [i, j), en orden de rango.
+
+        Dentro de cada palabra las entradas ya están ordenadas por rango, así que
+        basta mezclar los tramos de cada palabra y parar al llenar la lista.
+        """
+        palabras, rangos, claves = self.palabras, self.rangos, self.claves
+        tramos = []
+        k = i
+        while k < j:
+            fin = bisect_right(palabras, palabras[k], lo=k, hi=j)
+            tramos.append(zip(rangos[k:fin], claves[k:fin]))
+            k = fin
+        encontrados = []
+        for _, clave in heapq.merge(*tramos):
+            if clave not in encontrados:
+                encontrados.append(clave)
+                if len(encontrados) == POPULARES:
+                    break
+        return encontrados
+
+    def completar(self, q, n=8):
+        """Hasta `n` pares (clave, nombre) cuyo nombre tiene una palabra por cada palabra de `q`.
+
+        Cada palabra de la consulta se toma como prefijo. Primero los nombres que
+        empiezan por la consulta completa, luego los más cortos y en orden alfabético.
+        """
+        tokens = tokens_busqueda(q)
+        if not tokens or n <= 0:
+            return []
+        rangos = [self._rango_de(t) for t in tokens]
+        # la palabra con menos coincidencias guía la búsqueda (y la intersección)
+        g = min(range(len(tokens)), key=lambda k: rangos[k][1] - rangos[k][0])
+        i, j = rangos[g]
+        guia = tokens[g]
+        otras = tokens[:g] + tokens[g + 1:]
+        nombres = self.nombres
+
+        def cumple(clave):
+            palabras = nombres[clave][2]
+            return all(any(p.startswith(t) for p in palabras) for t in otras)
+
+        candidatos = None
+        if j - i > LIMITE_DIRECTO:
+            if guia in self.populares:
+                candidatos = [c for c in self.populares[guia] if cumple(c)]
+                # con pocas palabras extra la lista precalculada casi siempre alcanza
+                if len(candidatos) < n and len(self.populares[guia]) == POPULARES:
+                    candidatos = None
+            elif not otras:
+                # una sola palabra: los primeros del tramo ya son los mejores
+                candidatos = self._primeros(i, j)
+        if candidatos is None:
+            candidatos = set(self.claves[i:j])
+            for k, (a, b) in enumerate(rangos):
+                if k != g:
+                    candidatos.intersection_update(self.claves[a:b])
+
+        texto = normalizar_texto(q)
+        rango = self.rango
+        mejores = heapq.nsmallest(n, candidatos, key=lambda c: (not nombres[c][0].startswith(texto), rango[c]))
+        return [(c, nombres[c][1]) for c in mejores]
@@ -0,0 +1,53 @@
+"""Registro de cambios de cupos para los paneles abiertos.
+
+Cada panel del acudiente pregunta cada `settings.CAMBIOS_SONDEO_SEGUNDOS`
+segundos por los cambios de las instituciones que tiene en pantalla desde el
+último `id_cam` que recibió (ver `school.views.availability_changes`). La
+respuesta sale enseguida, con una consulta por rango de la llave primaria: no
+hay conexiones abiertas que retengan un hilo del servidor mientras esperan.
+
+Los ids de `CambioCupo` se asignan al confirmar, pero dos transacciones que
+confirman casi a la vez pueden hacerse visibles en otro orden; un panel que
+ya avanzó su cursor no ve la fila que apareció tarde, y su chip queda con el
+valor anterior hasta el siguiente cambio de ese grado o la siguiente búsqueda
+(que trae los cupos vigentes).
+"""
+import time
+from datetime import timedelta
+
+from django.utils import timezone
+
+from .models import CambioCupo
+
+MAX_CAMBIOS = 500
+RETENCION = timedelta(hours=1)
+PURGA_CADA = 600.0
+
+_CAMPOS = ('id_cam', 'id_inst', 'grado', 'cupos_total', 'cupos_libres', 'secciones_con_cupo')
+_estado = {'purgado': 0.0}
+
+
+def _como_dict(fila):
+    return dict(zip(_CAMPOS, fila))
+
+
+def ultimo_id():
+    """Id del cambio más reciente (0 si no hay): punto de partida de un panel nuevo."""
+    return CambioCupo.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+
+def cambios_desde(id_cam, inst_ids, hasta=None, limite=MAX_CAMBIOS):
+    """Cambios de `inst_ids` con id mayor que `id_cam` (y hasta `hasta`), del más viejo al más nuevo."""
+    qs = CambioCupo.objects.filter(pk__gt=id_cam, id_inst__in=inst_ids)
+    if hasta is not None:
+        qs = qs.filter(pk__lte=hasta)
+    return [_como_dict(f) for f in qs.order_by('pk').values_list(*_CAMPOS)[:limite]]
+
+
+def purgar():
+    """Borra los cambios de más de `RETENCION`; como mucho una vez cada `PURGA_CADA` s por proceso."""
+    ahora = time.monotonic()
+    if ahora - _estado['purgado'] < PURGA_CADA:
+        return
+    _estado['purgado'] = ahora
+    CambioCupo.objects.filter(created_at__lt=timezone.now() - RETENCION).delete()
@@ -0,0 +1,368 @@
+"""Catálogo de instituciones, cursos y cupos.
+
+Los cambios de las instituciones o de los grados que ofrecen (aparece o
+desaparece un grado con cursos) llaman a `marcar_cambio_catalogo`, que
+incrementa `VersionCatalogo` al confirmarse la transacción. Leer la versión
+es una consulta por clave primaria. Los cupos no cuentan: cambian con cada
+matrícula y dejarían la versión (y los ETag) sin servir; lo que se muestra de
+ellos se lee al responder (`con_cupos_vivos`).
+
+Con `settings.CATALOGO_EN_MEMORIA` cada proceso guarda además una foto
+inmutable del catálogo (instituciones con su resumen de cupos por grado, sin
+la lista de cursos) y solo vuelve a leer la versión cada
+`settings.CATALOGO_TTL` segundos; si cambió, reconstruye la foto en la
+siguiente lectura. Su resumen de cupos, que solo decide qué instituciones
+tienen cupo (facetas, cercanía, sugerencias), se vuelve a leer con una
+consulta cada `settings.CATALOGO_CUPOS_TTL` segundos. Las facetas, la cercanía, el autocompletado y las
+sugerencias del panel del acudiente se responden desde esa foto sin consultar
+la base de datos. La coincidencia por texto pasa siempre por el índice de
+texto completo (ver school.search), que devuelve solo los ids: las filas
+salen de la foto.
+"""
+import math
+import threading
+import time
+from collections import namedtuple
+from types import MappingProxyType
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .autocompletar import IndicePrefijos
+from .cercania import IndiceCercania, distancia_km
+from .facetas import IndiceFacetas
+from .models import DisponibilidadCupos, Institucion, VersionCatalogo
+from .search import buscar_instituciones
+from .sugerencias import PoolSugerencias
+
+CATALOGO = 'catalogo'
+
+InstitucionCat = namedtuple(
+    'InstitucionCat',
+    'id_inst nom_inst tip_inst dire_inst tel_inst ema_inst mun_inst dep_inst img search_doc lat lon grados',
+)
+GradoCat = namedtuple('GradoCat', 'grado cupos_total cupos_libres secciones secciones_con_cupo')
+
+
+# ---------------------------------------------------------------------------
+# Versión
+# ---------------------------------------------------------------------------
+
+def _incrementar():
+    now = timezone.now()
+    actualizadas = VersionCatalogo.objects.filter(pk=CATALOGO).update(version=F('version') + 1, updated_at=now)
+    if not actualizadas:
+        VersionCatalogo.objects.get_or_create(nombre=CATALOGO, defaults={'version': 1, 'updated_at': now})
+    # este proceso no espera al TTL para ver su propio cambio
+    _estado['version'] = None
+
+
+def marcar_cambio_catalogo():
+    """Incrementa la versión cuando se confirme la transacción actual (o ya, si no hay)."""
+    # fuera de la transacción: la fila de versión no queda bloqueada mientras dura el cambio
+    transaction.on_commit(_incrementar)
+
+
+def version_catalogo():
+    """(versión, fecha del último cambio); (0, None) si aún no existe la fila."""
+    fila = VersionCatalogo.objects.filter(pk=CATALOGO).values_list('version', 'updated_at').first()
+    return fila or (0, None)
+
+
+# ---------------------------------------------------------------------------
+# Foto en memoria
+# ---------------------------------------------------------------------------
+
+class Catalogo:
+    """Foto inmutable del catálogo en una versión dada."""
+
+    __slots__ = (
+        'version', 'updated_at', 'instituciones', 'por_id', 'cupos_en',
+        'firma_cercania', 'indice_cercania', 'firma_prefijos', 'indice_prefijos', 'facetas',
+    )
+
+    def __init__(self, version, updated_at, instituciones, anterior=None):
+        self.version = version
+        self.updated_at = updated_at
+        # time.monotonic() de la lectura del resumen de cupos
+        self.cupos_en = time.monotonic()
+        self.instituciones = tuple(instituciones)
+        self.por_id = MappingProxyType({inst.id_inst: inst for inst in self.instituciones})
+        puntos = tuple(
+            (inst.id_inst, inst.lat, inst.lon) for inst in self.instituciones if inst.lat is not None and inst.lon is not None
+        )
+        # al releer los cupos las coordenadas no cambian: se reutiliza el KD-tree
+        self.firma_cercania = hash(puntos)
+        if anterior is not None and anterior.firma_cercania == self.firma_cercania:
+            self.indice_cercania = anterior.indice_cercania
+        else:
+            self.indice_cercania = IndiceCercania(puntos)
+        # autocompletar: nombres de las instituciones que ofrecen cursos
+        nombres = tuple((inst.id_inst, inst.nom_inst) for inst in self.instituciones if inst.grados)
+        self.firma_prefijos = hash(nombres)
+        if anterior is not None and anterior.firma_prefijos == self.firma_prefijos:
+            self.indice_prefijos = anterior.indice_prefijos
+        else:
+            self.indice_prefijos = IndicePrefijos(nombres)
+        # los grados con cupo cambian con cada matrícula: las facetas se recalculan siempre (O(n))
+        self.facetas = IndiceFacetas(self.instituciones)
+
+    def autocompletar(self, q, n=8):
+        """Hasta `n` pares (id_inst, nom_inst) cuyo nombre coincide por prefijo con `q`."""
+        return self.indice_prefijos.completar(q, n=n)
+
+    def cercanas(self, lat, lon, k=10, radio_km=None, grado=None):
+        """Lista de (distancia_km, InstitucionCat) con cupos libres (en `grado`, si se indica)."""
+        por_id = self.por_id
+        encontradas = self.indice_cercania.cercanos(
+            lat, lon, k=k, radio_km=radio_km,
+            filtro=lambda pk: tiene_cupo(por_id[pk], grado),
+        )
+        return [(km, por_id[pk]) for km, pk in encontradas]
+
+
+def tiene_cupo(inst, grado=None):
+    """True si la institución tiene cupos libres en `grado` (o en cualquier grado)."""
+    return any(g.cupos_libres > 0 and (grado is None or g.grado == grado) for g in inst.grados)
+
+
+def cargar_grados(ids=None):
+    """{id_inst: (GradoCat, ...)} de todas las instituciones o de las de `ids`, en una consulta."""
+    grados_qs = DisponibilidadCupos.objects.all()
+    if ids is not None:
+        grados_qs = grados_qs.filter(id_inst_id__in=ids)
+    grados = {}
+    for inst_id, *fila in (
+        grados_qs.order_by('id_inst_id', 'grado')
+        .values_list('id_inst_id', 'grado', 'cupos_total', 'cupos_libres', 'secciones', 'secciones_con_cupo')
+    ):
+        grados.setdefault(inst_id, []).append(GradoCat(*fila))
+    return {inst_id: tuple(filas) for inst_id, filas in grados.items()}
+
+
+def con_cupos_vivos(instituciones):
+    """Las mismas InstitucionCat con el resumen de cupos leído ahora (una consulta)."""
+    if not instituciones:
+        return []
+    grados = cargar_grados([inst.id_inst for inst in instituciones])
+    return [inst._replace(grados=grados.get(inst.id_inst, ())) for inst in instituciones]
+
+
+def cargar_instituciones(ids=None, qs=None):
+    """InstitucionCat (todas, las de `ids` en ese orden o las de `qs`) con su resumen de cupos."""
+    if qs is not None:
+        ids = list(qs.values_list('pk', flat=True))
+    qs = Institucion.objects.all()
+    if ids is not None:
+        qs = qs.filter(pk__in=ids)
+    grados = cargar_grados(ids)
+
+    storage = Institucion._meta.get_field('img_inst').storage
+    instituciones = {}
+    for id_inst, nom, tip, dire, tel, ema, mun, dep, img, doc, lat, lon in qs.values_list(
+        'id_inst', 'nom_inst', 'tip_inst', 'dire_inst', 'tel_inst', 'ema_inst', 'mun_inst', 'dep_inst', 'img_inst', 'search_doc',
+        'lat_inst', 'lon_inst',
+    ):
+        instituciones[id_inst] = InstitucionCat(
+            id_inst, nom, tip, dire, tel, ema, mun, dep,
+            storage.url(img) if img else None,
+            doc,
+            float(lat) if lat is not None else None,
+            float(lon) if lon is not None else None,
+            grados.get(id_inst, ()),
+        )
+    orden = ids if ids is not None else sorted(instituciones)
+    return [instituciones[pk] for pk in orden if pk in instituciones]
+
+
+_estado = {'catalogo': None, 'verificado': 0.0, 'version': None}
+_lock = threading.Lock()
+
+
+def _version_vigente():
+    """Versión de la BD, consultada como mucho una vez por TTL en este proceso."""
+    ahora = time.monotonic()
+    if _estado['version'] is None or ahora - _estado['verificado'] >= settings.CATALOGO_TTL:
+        _estado['version'] = version_catalogo()
+        _estado['verificado'] = ahora
+    return _estado['version']
+
+
+def _cupos_vencidos(actual):
+    return time.monotonic() - actual.cupos_en >= getattr(settings, 'CATALOGO_CUPOS_TTL', 30)
+
+
+def catalogo():
+    """Foto vigente del catálogo para este proceso, o None si está desactivado."""
+    if not getattr(settings, 'CATALOGO_EN_MEMORIA', False):
+        return None
+    version, updated_at = _version_vigente()
+    actual = _estado['catalogo']
+    if actual is not None and actual.version == version and not _cupos_vencidos(actual):
+        return actual
+    with _lock:
+        actual = _estado['catalogo']
+        if actual is None or actual.version != version:
+            # la versión se lee antes de cargar: un cambio durante la carga fuerza otra reconstrucción
+            actual = Catalogo(version, updated_at, cargar_instituciones(), anterior=actual)
+            _estado['catalogo'] = actual
+        elif _cupos_vencidos(actual):
+            # solo pudieron cambiar los cupos: una consulta del resumen, índices reutilizados
+            grados = cargar_grados()
+            actual = Catalogo(
+                version, updated_at,
+                [inst._replace(grados=grados.get(inst.id_inst, ())) for inst in actual.instituciones],
+                anterior=actual,
+            )
+            _estado['catalogo'] = actual
+    return actual
+
+
+def version_para_cache():
+    """(versión, fecha) de los datos de las instituciones, desde la foto si está activa.
+
+    No cubre los cupos: el ETag de la búsqueda agrega los de la página (ver school.views).
+    """
+    actual = catalogo()
+    if actual is not None:
+        return actual.version, actual.updated_at
+    return version_catalogo()
+
+
+def _por_ids(actual, ids):
+    """InstitucionCat de `ids`, en ese orden, desde la foto o desde la BD (cupos al día)."""
+    if actual is not None:
+        # una institución creada hace menos de un TTL aún no está en la foto: se omite
+        return [actual.por_id[pk] for pk in ids if pk in actual.por_id]
+    return cargar_instituciones(ids)
+
+
+def _vivas(actual, instituciones):
+    """Las de la foto, con los cupos leídos ahora; las cargadas de la BD ya los traen."""
+    return con_cupos_vivos(instituciones) if actual is not None else instituciones
+
+
+def buscar(q, limit=30):
+    """Instituciones (InstitucionCat) para la consulta, por relevancia según el índice en BD."""
+    actual = catalogo()
+    return _vivas(actual, _por_ids(actual, buscar_instituciones(q, limit=limit)))
+
+
+def buscar_facetado(q, filtros, limit=30):
+    """(instituciones, conteos) para la búsqueda con filtros por faceta.
+
+    `filtros` es {faceta: [valores]} (ver school.facetas). Con `q` se filtran
+    y cuentan solo las que coinciden con el texto (según el índice en BD), en
+    orden de relevancia; sin `q`, todas las que tienen cursos, por nombre. Los
+    conteos salen de las facetas ya calculadas en la foto (con sus cupos,
+    de hasta `CATALOGO_CUPOS_TTL` s); sin ella se calculan en cada llamada.
+    """
+    actual = catalogo()
+    if actual is not None:
+        facetas = actual.facetas
+    else:
+        facetas = IndiceFacetas(cargar_instituciones(qs=Institucion.objects.filter(disponibilidad__isnull=False).distinct()))
+    # todas las coincidencias, no solo una página: los conteos cubren el resultado completo
+    coincidencias = _por_ids(actual, buscar_instituciones(q, limit=max(1, len(facetas.universo)))) if q else None
+    if coincidencias is not None:
+        base = [inst.id_inst for inst in coincidencias]
+        ids = facetas.filtrar(filtros, base)
+        insts = [inst for inst in coincidencias if inst.id_inst in ids][:limit]
+    else:
+        base = None
+        ids = facetas.filtrar(filtros)
+        if actual is not None:
+            insts = sorted((actual.por_id[pk] for pk in ids), key=lambda i: (i.nom_inst, i.id_inst))[:limit]
+        else:
+            insts = cargar_instituciones(list(
+                Institucion.objects.filter(pk__in=ids).order_by('nom_inst', 'pk').values_list('pk', flat=True)[:limit]
+            ))
+    return _vivas(actual, insts), facetas.conteos(filtros, base)
+
+
+def autocompletar(q, n=8):
+    """Pares (id_inst, nom_inst) para el autocompletado, desde la foto o desde el índice en BD."""
+    actual = catalogo()
+    if actual is not None:
+        return actual.autocompletar(q, n=n)
+    ids = buscar_instituciones(q, limit=n)
+    nombres = dict(Institucion.objects.filter(pk__in=ids).values_list('pk', 'nom_inst'))
+    return [(pk, nombres[pk]) for pk in ids if pk in nombres]
+
+
+def cercanas(lat, lon, k=10, radio_km=None, grado=None):
+    """Lista de (distancia_km, InstitucionCat) con cupo, de la más cercana a la más lejana.
+
+    Sin catálogo en memoria se consulta el recuadro que contiene el círculo
+    (índice institucion_latlon_idx) y se ordena en Python; sin radio se usan 50 km.
+    """
+    actual = catalogo()
+    if actual is not None:
+        pares = actual.cercanas(lat, lon, k=k, radio_km=radio_km, grado=grado)
+        vivas = con_cupos_vivos([inst for _, inst in pares])
+        # la foto decide con cupos de hasta un TTL: se descartan las que ya se llenaron
+        return [(km, inst) for (km, _), inst in zip(pares, vivas) if tiene_cupo(inst, grado)]
+    radio = radio_km if radio_km is not None else 50.0
+    dlat = radio / 111.0
+    dlon = radio / max(1.0, 111.0 * math.cos(math.radians(lat)))
+    candidatas = cargar_instituciones(qs=Institucion.objects.filter(
+        lat_inst__range=(lat - dlat, lat + dlat),
+        lon_inst__range=(lon - dlon, lon + dlon),
+        disponibilidad__cupos_libres__gt=0,
+    ).distinct())
+    encontradas = []
+    for inst in candidatas:
+        if not tiene_cupo(inst, grado):
+            continue
+        km = distancia_km(lat, lon, inst.lat, inst.lon)
+        if km <= radio:
+            encontradas.append((km, inst.id_inst, inst))
+    encontradas.sort()
+    return [(km, inst) for km, _, inst in encontradas[:k]]
+
+
+_pool = {'pool': None, 'creado': 0.0}
+_lock_pool = threading.Lock()
+
+
+def pool_sugerencias():
+    """Bolsa de sugerencias de este proceso (ver school.sugerencias).
+
+    Se reconstruye como mucho cada `settings.CATALOGO_SUGERENCIAS_TTL`
+    segundos, desde la foto del catálogo o, sin ella, con una consulta de las
+    instituciones con cupo.
+    """
+    ahora = time.monotonic()
+    pool = _pool['pool']
+    if pool is not None and ahora - _pool['creado'] < settings.CATALOGO_SUGERENCIAS_TTL:
+        return pool
+    with _lock_pool:
+        if _pool['pool'] is pool:
+            actual = catalogo()
+            if actual is not None:
+                instituciones = actual.instituciones
+            else:
+                instituciones = cargar_instituciones(
+                    qs=Institucion.objects.filter(disponibilidad__cupos_libres__gt=0).distinct()
+                )
+            _pool['pool'] = PoolSugerencias(instituciones)
+            _pool['creado'] = time.monotonic()
+        return _pool['pool']
+
+
+def sugerencias(n=6, lat=None, lon=None, grados=()):
+    """Hasta `n` instituciones con cupo para el carrusel del panel del acudiente.
+
+    Se sortean de la bolsa precalculada con preferencia por las cercanas a
+    (`lat`, `lon`) y las que tienen cupo en `grados`; el costo no depende del
+    número de instituciones.
+    """
+    elegidas = pool_sugerencias().muestra(n, lat=lat, lon=lon, grados=grados)
+    actual = catalogo()
+    if actual is not None:
+        # la bolsa puede tener hasta un TTL de antigüedad: datos de la foto vigente, cupos al día
+        elegidas = [actual.por_id[i.id_inst] for i in elegidas if i.id_inst in actual.por_id]
+        elegidas = [inst for inst in con_cupos_vivos(elegidas) if tiene_cupo(inst)]
+    return elegidas
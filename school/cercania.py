@@ -0,0 +1,98 @@
+"""Índice espacial en memoria para buscar instituciones cercanas.
+
+Cada punto (lat, lon) se guarda como vector unitario en 3D; la distancia
+euclídea entre vectores (la cuerda) crece igual que la distancia sobre la
+superficie, así que un KD-tree de 3 dimensiones responde "los k más cercanos
+dentro de R km" sin casos especiales en el antimeridiano ni en los polos.
+"""
+import heapq
+import math
+
+RADIO_TIERRA_KM = 6371.0088
+
+
+def _vector(lat, lon):
+    la = math.radians(lat)
+    lo = math.radians(lon)
+    c = math.cos(la)
+    return (c * math.cos(lo), c * math.sin(lo), math.sin(la))
+
+
+def _cuerda2(km):
+    """Cuadrado de la cuerda equivalente a `km` sobre la superficie."""
+    angulo = min(km / RADIO_TIERRA_KM, math.pi)
+    return (2.0 * math.sin(angulo / 2.0)) ** 2
+
+
+def _km(cuerda2):
+    return 2.0 * RADIO_TIERRA_KM * math.asin(min(1.0, math.sqrt(cuerda2) / 2.0))
+
+
+def distancia_km(lat1, lon1, lat2, lon2):
+    """Distancia sobre la superficie (haversine) en kilómetros."""
+    a = _vector(lat1, lon1)
+    b = _vector(lat2, lon2)
+    return _km((a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 + (a[2] - b[2]) ** 2)
+
+
+class IndiceCercania:
+    """KD-tree inmutable sobre pares (clave, lat, lon).
+
+    Los nodos son tuplas (x, y, z, clave, eje, izquierda, derecha); construirlo
+    es O(n log² n) y cada consulta visita solo las ramas que pueden mejorar el
+    k-ésimo resultado o caer dentro del radio.
+    """
+
+    __slots__ = ('raiz', 'tamano')
+
+    def __init__(self, puntos):
+        nodos = [(*_vector(lat, lon), clave) for clave, lat, lon in puntos]
+        self.tamano = len(nodos)
+        self.raiz = self._construir(nodos, 0)
+
+    def _construir(self, nodos, profundidad):
+        if not nodos:
+            return None
+        eje = profundidad % 3
+        nodos.sort(key=lambda n: n[eje])
+        medio = len(nodos) // 2
+        x, y, z, clave = nodos[medio]
+        return (
+            x, y, z, clave, eje,
+            self._construir(nodos[:medio], profundidad + 1),
+            self._construir(nodos[medio + 1:], profundidad + 1),
+        )
+
+    def cercanos(self, lat, lon, k=10, radio_km=None, filtro=None):
+        """Lista de (distancia_km, clave) de los `k` puntos más cercanos.
+
+        :param radio_km: descartar los que estén más lejos.
+        :param filtro: función clave -> bool; solo cuentan los puntos que la cumplan.
+        """
+        if k <= 0 or self.raiz is None:
+            return []
+        q = _vector(lat, lon)
+        limite = _cuerda2(radio_km) if radio_km is not None else float('inf')
+        # max-heap de tamaño k con (-distancia², clave)
+        mejores = []
+
+        def visitar(nodo):
+            x, y, z, clave, eje, izq, der = nodo
+            d2 = (q[0] - x) ** 2 + (q[1] - y) ** 2 + (q[2] - z) ** 2
+            peor = -mejores[0][0] if len(mejores) == k else limite
+            if d2 <= peor and (filtro is None or filtro(clave)):
+                if len(mejores) == k:
+                    heapq.heapreplace(mejores, (-d2, clave))
+                else:
+                    heapq.heappush(mejores, (-d2, clave))
+            diff = q[eje] - (x, y, z)[eje]
+            cerca, lejos = (izq, der) if diff < 0 else (der, izq)
+            if cerca is not None:
+                visitar(cerca)
+            if lejos is not None:
+                peor = -mejores[0][0] if len(mejores) == k else limite
+                if diff * diff <= peor:
+                    visitar(lejos)
+
+        visitar(self.raiz)
+        return sorted((_km(-d2), clave) for d2, clave in mejores)
@@ -0,0 +1,165 @@
+"""Matriz de disponibilidad de cupos por institución y grado.
+
+`refrescar_disponibilidad` recalcula las filas de `DisponibilidadCupos`
+afectadas a partir de los cursos y matrículas. Se llama desde las señales de
+`Curso`/`Matricula` y tras las escrituras en bloque de la admisión, siempre
+dentro de la transacción que hizo el cambio: el resumen se confirma (o se
+revierte) junto con él. La fila del grado se bloquea antes de agregar para
+que dos transacciones concurrentes no dejen un resumen viejo; eso serializa
+las aceptaciones de un mismo grado (en cualquiera de sus secciones) hasta
+que cada una confirma. Las de grados o instituciones distintas no se
+esperan.
+
+Si el resumen quedó mal (escrituras que no pasan por las señales, SQL
+directo), `python manage.py reconstruir_disponibilidad` lo recalcula entero.
+Cada grado cuyos cupos cambian queda además en `CambioCupo` al confirmarse
+la transacción, para los cupos en vivo del panel (ver `school.cambios`). La
+versión del catálogo solo cambia si aparece o desaparece un grado: los cupos
+se leen del resumen al responder (ver `school.catalog`).
+"""
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from .catalog import marcar_cambio_catalogo
+from .models import CambioCupo, Curso, DisponibilidadCupos, Matricula
+
+
+def refrescar_disponibilidad(inst_id, grados=None):
+    """Recalcula la disponibilidad de la institución para `grados` (todos si es None)."""
+    if not inst_id:
+        return
+    with transaction.atomic():
+        if grados is None:
+            grados = set(DisponibilidadCupos.objects.filter(id_inst_id=inst_id).values_list('grado', flat=True))
+            grados |= set(Curso.objects.filter(id_inst_id=inst_id).values_list('num_grd_cur', flat=True))
+        grados = {g for g in grados if g is not None}
+        if not grados:
+            return
+
+        # solo se crean filas para grados con cursos (durante un borrado en
+        # cascada de la institución ya no queda ninguno)
+        con_cursos = set(
+            Curso.objects.filter(id_inst_id=inst_id, num_grd_cur__in=grados).values_list('num_grd_cur', flat=True)
+        )
+        nuevos = con_cursos - set(
+            DisponibilidadCupos.objects.filter(id_inst_id=inst_id, grado__in=con_cursos).values_list('grado', flat=True)
+        ) if con_cursos else set()
+        DisponibilidadCupos.objects.bulk_create(
+            [DisponibilidadCupos(id_inst_id=inst_id, grado=g) for g in con_cursos],
+            ignore_conflicts=True,
+        )
+        filas = {
+            f.grado: f
+            for f in DisponibilidadCupos.objects.select_for_update().filter(id_inst_id=inst_id, grado__in=grados)
+        }
+        if not filas:
+            return
+        cursos = {
+            r['num_grd_cur']: r
+            for r in Curso.objects.filter(id_inst_id=inst_id, num_grd_cur__in=grados)
+            .values('num_grd_cur')
+            .annotate(
+                secciones=Count('pk'),
+                secciones_con_cupo=Count('pk', filter=Q(cup_disp_cur__gt=0)),
+                cupos_libres=Sum('cup_disp_cur', filter=Q(cup_disp_cur__gt=0)),
+            )
+        }
+        ocupados = dict(
+            Matricula.objects.filter(id_cur__id_inst_id=inst_id, id_cur__num_grd_cur__in=grados, cupo_tomado=True)
+            .values_list('id_cur__num_grd_cur')
+            .annotate(n=Count('pk'))
+        )
+
+        now = timezone.now()
+        vacias = []
+        cambiadas = []
+        registro = []
+        for grado, fila in filas.items():
+            antes = (fila.cupos_libres, fila.cupos_total, fila.secciones_con_cupo)
+            agg = cursos.get(grado)
+            if agg is None:
+                vacias.append(fila.pk)
+                if antes != (0, 0, 0):
+                    registro.append(CambioCupo(id_inst=inst_id, grado=grado, created_at=now))
+                continue
+            fila.secciones = agg['secciones']
+            fila.secciones_con_cupo = agg['secciones_con_cupo']
+            fila.cupos_libres = agg['cupos_libres'] or 0
+            fila.cupos_total = fila.cupos_libres + ocupados.get(grado, 0)
+            fila.updated_at = now
+            cambiadas.append(fila)
+            if (fila.cupos_libres, fila.cupos_total, fila.secciones_con_cupo) != antes:
+                registro.append(CambioCupo(
+                    id_inst=inst_id, grado=grado, cupos_libres=fila.cupos_libres,
+                    cupos_total=fila.cupos_total, secciones_con_cupo=fila.secciones_con_cupo, created_at=now,
+                ))
+        DisponibilidadCupos.objects.bulk_update(
+            cambiadas, ['secciones', 'secciones_con_cupo', 'cupos_libres', 'cupos_total', 'updated_at']
+        )
+        if vacias:
+            DisponibilidadCupos.objects.filter(pk__in=vacias).delete()
+        if registro:
+            # al confirmar: los ids del registro quedan en el orden en que los cambios se hicieron visibles
+            transaction.on_commit(lambda: CambioCupo.objects.bulk_create(registro))
+        if nuevos or vacias:
+            # la institución empieza o deja de ofrecer un grado (búsqueda, facetas, autocompletado)
+            marcar_cambio_catalogo()
+
+
+def reconstruir_disponibilidad(inst_ids=None):
+    """Recalcula todos los grados de las instituciones indicadas (todas si es None); devuelve cuántas."""
+    if inst_ids is None:
+        inst_ids = set(Curso.objects.exclude(id_inst__isnull=True).values_list('id_inst_id', flat=True))
+        inst_ids |= set(DisponibilidadCupos.objects.values_list('id_inst_id', flat=True))
+    inst_ids = sorted(inst_ids)
+    for inst_id in inst_ids:
+        refrescar_disponibilidad(inst_id)
+    return len(inst_ids)
+
+
+def refrescar_cursos(curso_ids):
+    """Recalcula los (institución, grado) a los que pertenecen los cursos indicados."""
+    por_inst = {}
+    for inst_id, grado in (
+        Curso.objects.filter(pk__in=[c for c in curso_ids if c])
+        .values_list('id_inst_id', 'num_grd_cur')
+        .distinct()
+    ):
+        por_inst.setdefault(inst_id, set()).add(grado)
+    for inst_id, grados in por_inst.items():
+        refrescar_disponibilidad(inst_id, grados)
+
+
+def _como_dict(fila):
+    return {
+        'grado': fila['grado'],
+        'cupos_total': fila['cupos_total'],
+        'cupos_libres': fila['cupos_libres'],
+        'secciones': fila['secciones'],
+        'secciones_con_cupo': fila['secciones_con_cupo'],
+    }
+
+
+def disponibilidad_por_institucion(inst_ids):
+    """{inst_id: [ {grado, cupos_total, cupos_libres, secciones, secciones_con_cupo}, ... ]} en una consulta."""
+    resultado = {}
+    filas = (
+        DisponibilidadCupos.objects
+        .filter(id_inst_id__in=list(inst_ids))
+        .order_by('id_inst_id', 'grado')
+        .values('id_inst_id', 'grado', 'cupos_total', 'cupos_libres', 'secciones', 'secciones_con_cupo')
+    )
+    for fila in filas:
+        resultado.setdefault(fila['id_inst_id'], []).append(_como_dict(fila))
+    return resultado
+
+
+def cupos_libres(inst_id, grado):
+    """Cupos libres del grado en la institución, o None si no tiene cursos de ese grado."""
+    return (
+        DisponibilidadCupos.objects
+        .filter(id_inst_id=inst_id, grado=grado)
+        .values_list('cupos_libres', flat=True)
+        .first()
+    )
@@ -0,0 +1,74 @@
+"""Checklist materializado de documentos obligatorios por estudiante.
+
+En vez de revisar los ocho campos de `Documento` (y cargar matrículas y
+documentos) en cada panel, el estado se recalcula una vez al guardar un
+documento o la foto del estudiante: una fila de `ChecklistDocumento` por tipo
+y un resumen en `Estudiante.doc_comp_est` / `Estudiante.doc_falt_est`, que
+las vistas leen junto con el propio estudiante.
+"""
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ChecklistDocumento, Documento, DOCUMENTOS_REQUERIDOS
+
+
+def sincronizar_documentos(est_id):
+    """Recalcula el checklist del estudiante y devuelve la lista de faltantes.
+
+    Un tipo cuenta como entregado si cualquiera de los documentos del
+    estudiante (ligados a él o a alguna de sus matrículas) lo tiene; la foto de
+    perfil cubre `fot_alum_doc`. Devuelve None si el estudiante no existe.
+    """
+    from people.models import Estudiante
+
+    est = Estudiante.objects.filter(pk=est_id).values('foto_perfil').first()
+    if est is None:
+        return None
+
+    entregados = {}
+    docs = (
+        Documento.objects
+        .filter(Q(id_est_id=est_id) | Q(id_mat__id_est_id=est_id))
+        .order_by('-id_doc')
+        .values('id_doc', *DOCUMENTOS_REQUERIDOS)
+    )
+    for d in docs:
+        for tipo in DOCUMENTOS_REQUERIDOS:
+            if d[tipo] and tipo not in entregados:
+                entregados[tipo] = d['id_doc']
+    if est['foto_perfil'] and 'fot_alum_doc' not in entregados:
+        entregados['fot_alum_doc'] = None
+
+    now = timezone.now()
+    existing = {c.tipo: c for c in ChecklistDocumento.objects.filter(id_est_id=est_id)}
+    to_create = []
+    to_update = []
+    for tipo in DOCUMENTOS_REQUERIDOS:
+        estado = 'entregado' if tipo in entregados else 'faltante'
+        id_doc = entregados.get(tipo)
+        row = existing.get(tipo)
+        if row is None:
+            to_create.append(ChecklistDocumento(id_est_id=est_id, tipo=tipo, estado=estado, id_doc_id=id_doc))
+        elif row.estado != estado or row.id_doc_id != id_doc:
+            row.estado = estado
+            row.id_doc_id = id_doc
+            row.updated_at = now
+            to_update.append(row)
+    ChecklistDocumento.objects.bulk_create(to_create)
+    ChecklistDocumento.objects.bulk_update(to_update, ['estado', 'id_doc', 'updated_at'])
+
+    faltantes = [t for t in DOCUMENTOS_REQUERIDOS if t not in entregados]
+    Estudiante.objects.filter(pk=est_id).update(doc_comp_est=not faltantes, doc_falt_est=faltantes)
+    return faltantes
+
+
+def documentos_faltantes(est, dir_acu=None):
+    """Faltantes según el resumen guardado en el estudiante (sin consultas extra).
+
+    Para solicitar matrícula la dirección escrita del acudiente (`dir_acu`)
+    también cubre `adres_doc`.
+    """
+    faltantes = list(est.doc_falt_est or [])
+    if dir_acu and 'adres_doc' in faltantes:
+        faltantes.remove('adres_doc')
+    return faltantes
@@ -0,0 +1,80 @@
+"""Facetas del catálogo: departamento, municipio, tipo y grados con cupo.
+
+Para cada valor de cada faceta se guarda el conjunto de instituciones que lo
+tienen (solo las que ofrecen cursos) y su total. Filtrar es intersecar
+conjuntos y los conteos siguen la regla habitual de las facetas: varios
+valores de una misma faceta se combinan con O, facetas distintas con Y, y los
+conteos de una faceta se calculan con los filtros de las demás (así se ve
+cuántas habría al sumar otro valor). Sin filtros se devuelven los totales ya
+calculados.
+"""
+FACETAS = ('dep', 'mun', 'tip', 'grado')
+
+
+def valores_faceta(inst):
+    """{faceta: valores} de una InstitucionCat; `grado` son los grados con cupos libres."""
+    return {
+        'dep': (inst.dep_inst,) if inst.dep_inst else (),
+        'mun': (inst.mun_inst,) if inst.mun_inst else (),
+        'tip': (inst.tip_inst,) if inst.tip_inst else (),
+        'grado': tuple(g.grado for g in inst.grados if g.cupos_libres > 0),
+    }
+
+
+class IndiceFacetas:
+    """Conjuntos inmutables {faceta: {valor: frozenset(id_inst)}} con sus totales."""
+
+    __slots__ = ('universo', 'conjuntos', 'totales')
+
+    def __init__(self, instituciones):
+        conjuntos = {f: {} for f in FACETAS}
+        universo = []
+        for inst in instituciones:
+            if not inst.grados:
+                continue
+            universo.append(inst.id_inst)
+            for faceta, valores in valores_faceta(inst).items():
+                for valor in valores:
+                    conjuntos[faceta].setdefault(valor, []).append(inst.id_inst)
+        self.universo = frozenset(universo)
+        self.conjuntos = {f: {v: frozenset(ids) for v, ids in por_valor.items()} for f, por_valor in conjuntos.items()}
+        self.totales = {f: _ordenar({v: len(ids) for v, ids in por_valor.items()}) for f, por_valor in self.conjuntos.items()}
+
+    def _por_faceta(self, faceta, valores):
+        por_valor = self.conjuntos[faceta]
+        return frozenset().union(*(por_valor.get(v, ()) for v in valores))
+
+    def filtrar(self, filtros, base=None):
+        """Ids que cumplen `filtros` ({faceta: [valores]}) dentro de `base` (o de todas)."""
+        ids = self.universo if base is None else self.universo.intersection(base)
+        for faceta, valores in filtros.items():
+            if valores:
+                ids = ids & self._por_faceta(faceta, valores)
+        return ids
+
+    def conteos(self, filtros, base=None):
+        """{faceta: [(valor, n)]} de mayor a menor; cada faceta ignora su propio filtro."""
+        activos = {f: self._por_faceta(f, v) for f, v in filtros.items() if v}
+        if base is None and not activos:
+            return self.totales
+        inicio = self.universo if base is None else self.universo.intersection(base)
+        resultado = {}
+        for faceta in FACETAS:
+            otros = [ids for f, ids in activos.items() if f != faceta]
+            if base is None and not otros:
+                resultado[faceta] = self.totales[faceta]
+                continue
+            ids = inicio
+            for conjunto in otros:
+                ids = ids & conjunto
+            resultado[faceta] = _ordenar({
+                v: n for v, n in ((v, len(c & ids)) for v, c in self.conjuntos[faceta].items()) if n
+            })
+        return resultado
+
+
+def _ordenar(conteos):
+    # los grados en su orden natural; el resto de más a menos instituciones
+    if conteos and all(isinstance(v, int) for v in conteos):
+        return sorted(conteos.items())
+    return sorted(conteos.items(), key=lambda p: (-p[1], str(p[0])))
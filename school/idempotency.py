@@ -0,0 +1,76 @@
+"""Claves de idempotencia para endpoints POST que responden JSON.
+
+El cliente envía una cabecera `Idempotency-Key` (un UUID por intento lógico,
+reutilizado en los reintentos). La primera petición reserva la clave
+insertando una fila en `ClaveIdempotencia` y, al terminar, guarda la
+respuesta; las repeticiones con la misma clave reciben esa respuesta sin
+volver a ejecutar la vista. Si la primera aún no terminó se responde 409.
+"""
+import json
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.http import JsonResponse
+
+from .models import ClaveIdempotencia
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 64
+
+
+def _ambito(request):
+    reg_id = request.session.get('registro_id')
+    if reg_id:
+        return f'reg:{reg_id}'
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return None
+
+
+def idempotent(view_func):
+    """Decorador: hace idempotente una vista POST que devuelve `JsonResponse`.
+
+    Sin cabecera (o sin usuario identificado) la vista se ejecuta normalmente.
+    Solo se guardan respuestas JSON con estado < 500; ante un error de
+    servidor la clave se libera para que el cliente pueda reintentar.
+    """
+    @wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        clave = (request.headers.get(HEADER) or '').strip()
+        ambito = _ambito(request)
+        if not clave or not ambito:
+            return view_func(request, *args, **kwargs)
+        if len(clave) > MAX_KEY_LENGTH:
+            return JsonResponse({'status': 'error', 'error': f'{HEADER} demasiado larga'}, status=400)
+
+        try:
+            with transaction.atomic():
+                entry = ClaveIdempotencia.objects.create(clave=clave, ambito=ambito, ruta=request.path)
+        except IntegrityError:
+            prev = ClaveIdempotencia.objects.filter(clave=clave, ambito=ambito, ruta=request.path).first()
+            if prev is None or prev.estado_http is None:
+                return JsonResponse({'status': 'error', 'error': 'La solicitud ya se está procesando'}, status=409)
+            response = JsonResponse(prev.respuesta, status=prev.estado_http, safe=False)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = view_func(request, *args, **kwargs)
+        except Exception:
+            entry.delete()
+            raise
+
+        if isinstance(response, JsonResponse) and response.status_code < 500:
+            entry.estado_http = response.status_code
+            entry.respuesta = json.loads(response.content)
+            entry.save(update_fields=['estado_http', 'respuesta'])
+        else:
+            entry.delete()
+        return response
+    return wrapper
+
+
+def purge_keys(before):
+    """Borra las claves creadas antes de `before`. Devuelve cuántas se borraron."""
+    deleted, _ = ClaveIdempotencia.objects.filter(created_at__lt=before).delete()
+    return deleted
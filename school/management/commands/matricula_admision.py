@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from school.admission import POLICIES, run_batch_admission
+from school.models import Institucion, MatriculaRequest
+
+
+class Command(BaseCommand):
+    help = 'Admite por lotes las solicitudes de matrícula pendientes de una institución (o de todas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--inst', type=int, help='ID de la institución')
+        parser.add_argument('--all', action='store_true', help='Procesar todas las instituciones con solicitudes pendientes')
+        parser.add_argument('--grado', type=int, help='Limitar a un grado solicitado')
+        parser.add_argument('--policy', default='fifo', choices=sorted(POLICIES), help='Política de prioridad (default: fifo)')
+        parser.add_argument('--seed', type=int, help='Semilla del sorteo (política lottery)')
+        parser.add_argument('--reject-unassigned', action='store_true', help='Rechazar las solicitudes que queden sin cupo en lugar de pasarlas a lista de espera')
+        parser.add_argument('--dry-run', action='store_true', help='Calcular la asignación sin guardar cambios')
+
+    def handle(self, *args, **options):
+        if options['inst']:
+            if not Institucion.objects.filter(pk=options['inst']).exists():
+                raise CommandError(f"Institución {options['inst']} no encontrada")
+            inst_ids = [options['inst']]
+        elif options['all']:
+            inst_ids = list(
+                MatriculaRequest.objects.filter(estado='pending')
+                .values_list('id_inst', flat=True).distinct().order_by('id_inst')
+            )
+        else:
+            raise CommandError('Indica --inst <id> o --all')
+
+        for inst_id in inst_ids:
+            summary = run_batch_admission(
+                inst_id,
+                grado=options['grado'],
+                policy=options['policy'],
+                seed=options['seed'],
+                reject_unassigned=options['reject_unassigned'],
+                dry_run=options['dry_run'],
+            )
+            prefix = '[dry-run] ' if summary['dry_run'] else ''
+            self.stdout.write(self.style.SUCCESS(
+                f"{prefix}Institución {inst_id}: {summary['pending']} pendientes, {summary['accepted']} aceptadas, "
+                f"{summary['waitlisted']} en lista de espera, {summary['rejected']} rechazadas, "
+                f"{summary['duplicates']} duplicadas rechazadas (política={summary['policy']}, semilla={summary['seed']})"
+            ))
+            for grd, count in sorted(summary['by_course'].items()):
+                self.stdout.write(f'  {grd}: {count}')
@@ -1,24 +1,112 @@
+import datetime
+import time
+
 from django.core.management.base import BaseCommand
-from school.models import MatriculaRequest
+from django.db import close_old_connections, transaction
 from django.utils import timezone
-from django.core.mail import send_mail
+
+from school.idempotency import purge_keys
+from school.models import MatriculaRequest
+from communications.email_utils import matricula_status_email, queue_emails, send_queued_emails
+
+EXPIRED_OBS = 'Expirada automáticamente tras 24h sin respuesta'
+
 
 class Command(BaseCommand):
     help = 'Expira solicitudes de matrícula pendientes tras 24 horas'
 
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Quedarse en ejecución y despertar en la próxima expiración')
+        parser.add_argument('--max-sleep', type=int, default=300, help='Máximo de segundos entre pasadas en modo --loop')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Solicitudes expiradas por UPDATE')
+        parser.add_argument('--send-limit', type=int, default=100, help='Correos enviados por lote')
+        parser.add_argument('--idempotency-ttl', type=int, default=24, help='Horas que se conservan las claves de idempotencia')
+
     def handle(self, *args, **options):
+        if not options['loop']:
+            count = self.expire_all(options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Procesadas {count} solicitudes expirada(s)'))
+            self.flush_emails(options['send_limit'])
+            self.purge_idempotency(options['idempotency_ttl'])
+            return
+
+        self.stdout.write(f"Modo continuo (máx. {options['max_sleep']}s entre pasadas). Ctrl+C para salir.")
+        try:
+            while True:
+                close_old_connections()
+                count = self.expire_all(options['batch_size'])
+                if count:
+                    self.stdout.write(self.style.SUCCESS(f'{timezone.now():%Y-%m-%d %H:%M:%S} expiradas {count} solicitud(es)'))
+                self.flush_emails(options['send_limit'])
+                self.purge_idempotency(options['idempotency_ttl'])
+                wait = self.seconds_to_next(options['max_sleep'])
+                close_old_connections()
+                time.sleep(wait)
+        except KeyboardInterrupt:
+            self.stdout.write('Detenido')
+
+    def expire_all(self, batch_size):
+        total = 0
         now = timezone.now()
-        expired = MatriculaRequest.objects.filter(estado='pending', expires_at__lt=now)
-        count = 0
-        for req in expired:
-            req.estado = 'rejected'
-            req.obs = 'Expirada automáticamente tras 24h sin respuesta'
-            req.save()
-            count += 1
-            # TODO: notificar al acudiente por email/in-app
-            try:
-                if req.id_acu and req.id_acu.id_usu and req.id_acu.id_usu.ema_usu:
-                    send_mail('Solicitud de matrícula rechazada', 'Tu solicitud fue rechazada automáticamente por no recibir respuesta en 24h.', 'no-reply@example.com', [req.id_acu.id_usu.ema_usu])
-            except Exception:
-                pass
-        self.stdout.write(self.style.SUCCESS(f'Procesadas {count} solicitudes expirada(s)'))
+        while True:
+            done = self.expire_batch(now, batch_size)
+            total += done
+            if done < batch_size:
+                return total
+
+    def expire_batch(self, now, batch_size):
+        """Expira hasta `batch_size` solicitudes con un único UPDATE y encola los avisos.
+
+        Las filas se bloquean antes del UPDATE para que una aceptación
+        concurrente no quede sobrescrita y para saber a quién avisar.
+        """
+        with transaction.atomic():
+            reqs = list(
+                MatriculaRequest.objects
+                .select_for_update(of=('self',))
+                .filter(estado='pending', expires_at__lt=now)
+                .select_related('id_acu__id_usu', 'id_est__id_usu')
+                .order_by('expires_at')[:batch_size]
+            )
+            if not reqs:
+                return 0
+            MatriculaRequest.objects.filter(pk__in=[r.pk for r in reqs]).update(estado='rejected', obs=EXPIRED_OBS)
+
+            emails = []
+            for req in reqs:
+                acu_reg = getattr(req.id_acu, 'id_usu', None)
+                if not acu_reg or not acu_reg.ema_usu:
+                    continue
+                est_reg = getattr(req.id_est, 'id_usu', None)
+                estudiante_nombre = f"{est_reg.nom_usu} {est_reg.ape_usu}" if est_reg else 'el estudiante'
+                emails.append(matricula_status_email(acu_reg, estudiante_nombre, 'rejected', EXPIRED_OBS))
+            queue_emails(emails)
+        return len(reqs)
+
+    def flush_emails(self, limit):
+        while True:
+            sent, failed, tomados = send_queued_emails(limit=limit)
+            if sent or failed:
+                self.stdout.write(f'Correos enviados: {sent}, fallidos: {failed}')
+            # lote incompleto: no quedan correos listos (los que fallaron esperan su reintento)
+            if tomados < limit:
+                return
+
+    def purge_idempotency(self, ttl_hours):
+        deleted = purge_keys(timezone.now() - datetime.timedelta(hours=ttl_hours))
+        if deleted:
+            self.stdout.write(f'Claves de idempotencia purgadas: {deleted}')
+
+    def seconds_to_next(self, max_sleep):
+        """Segundos hasta la próxima expiración pendiente (índice estado + expires_at)."""
+        next_at = (
+            MatriculaRequest.objects
+            .filter(estado='pending', expires_at__isnull=False)
+            .order_by('expires_at')
+            .values_list('expires_at', flat=True)
+            .first()
+        )
+        if next_at is None:
+            return max_sleep
+        delta = (next_at - timezone.now()).total_seconds()
+        return min(max_sleep, max(1, delta + 1))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from school.disponibilidad import reconstruir_disponibilidad
+
+
+class Command(BaseCommand):
+    help = ('Recalcula el resumen de cupos por institución y grado (disponibilidad_cupos) desde los cursos y '
+            'matrículas; repara filas viejas tras escrituras que no pasan por las señales')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--institucion', type=int, action='append',
+                            help='Solo esta institución (id_inst; se puede repetir; por defecto todas)')
+
+    def handle(self, *args, **options):
+        # cada institución en su propia transacción (ver school.disponibilidad)
+        total = reconstruir_disponibilidad(options['institucion'])
+        self.stdout.write(self.style.SUCCESS(f'Disponibilidad recalculada para {total} institución(es)'))
@@ -0,0 +1,431 @@
+"""Simulación de carga del día de matrículas contra un servidor local.
+
+Crea (opcionalmente) datos sintéticos marcados con el dominio `@carga.local`,
+lanza acudientes virtuales que inician sesión, buscan instituciones, envían
+solicitudes y consultan su panel, mientras administrativos virtuales aceptan
+solicitudes desde `matricula_request_detail`. Al final informa rendimiento,
+percentiles de latencia, tasas de error y las invariantes de cupos.
+
+Uso típico (con `python manage.py runserver` o gunicorn en otra terminal y la
+misma base de datos):
+
+    python manage.py simular_matricula --seed --acudientes 2000 --concurrencia 64
+    python manage.py simular_matricula --cleanup
+"""
+import http.cookiejar
+import random
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+
+from accounts.models import Administrativo, Registro, Rol
+from adminpanel import search_index
+from people.models import Acudiente, Estudiante
+from school.disponibilidad import refrescar_disponibilidad
+from school.models import Curso, DisponibilidadCupos, DOCUMENTOS_REQUERIDOS, Documento, Institucion, Matricula, MatriculaRequest
+
+DOMINIO = 'carga.local'
+PREFIJO_INST = 'Carga '
+
+
+class _SinRedirecciones(urllib.request.HTTPRedirectHandler):
+    """Medir cada vista por separado: las redirecciones se devuelven tal cual."""
+
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+
+class Estadisticas:
+    """Latencias y estados por tipo de petición (seguro entre hilos)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencias = {}
+        self.estados = {}
+        self.errores = {}
+
+    def registrar(self, etiqueta, segundos, estado, ok):
+        with self._lock:
+            self.latencias.setdefault(etiqueta, []).append(segundos)
+            por_estado = self.estados.setdefault(etiqueta, {})
+            por_estado[estado] = por_estado.get(estado, 0) + 1
+            if not ok:
+                self.errores[etiqueta] = self.errores.get(etiqueta, 0) + 1
+
+
+class Sesion:
+    """Cliente HTTP con cookies y CSRF, equivalente a un navegador por usuario."""
+
+    def __init__(self, base_url, stats, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.stats = stats
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies),
+            _SinRedirecciones(),
+        )
+
+    def csrf(self):
+        for c in self.cookies:
+            if c.name == 'csrftoken':
+                return c.value
+        return ''
+
+    def pedir(self, etiqueta, path, data=None, headers=None, ok_estados=(200,)):
+        url = self.base_url + path
+        body = None
+        hdrs = {'User-Agent': 'simular_matricula'}
+        if data is not None:
+            token = self.csrf()
+            data = dict(data, csrfmiddlewaretoken=token)
+            body = urllib.parse.urlencode(data).encode()
+            hdrs['X-CSRFToken'] = token
+            hdrs['Referer'] = self.base_url + '/'
+        hdrs.update(headers or {})
+        req = urllib.request.Request(url, data=body, headers=hdrs, method='POST' if body is not None else 'GET')
+        inicio = time.perf_counter()
+        try:
+            with self.opener.open(req, timeout=self.timeout) as resp:
+                estado, contenido = resp.status, resp.read()
+        except urllib.error.HTTPError as e:
+            estado, contenido = e.code, e.read()
+        except Exception:
+            estado, contenido = 'exc', b''
+        segundos = time.perf_counter() - inicio
+        self.stats.registrar(etiqueta, segundos, estado, estado in ok_estados)
+        return estado, contenido
+
+    def login(self, identificador, password):
+        self.pedir('login_form', '/accounts/login/')
+        estado, _ = self.pedir('login', '/accounts/login/', {'email': identificador, 'password': password}, ok_estados=(302,))
+        return estado == 302
+
+
+def _percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    k = min(len(ordenados) - 1, max(0, int(round(p / 100.0 * (len(ordenados) - 1)))))
+    return ordenados[k]
+
+
+class Command(BaseCommand):
+    help = 'Simula la carga del día de matrículas (acudientes y administrativos concurrentes) contra un servidor local'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8000', help='URL del servidor bajo prueba')
+        parser.add_argument('--seed', action='store_true', help='Crear datos sintéticos antes de simular')
+        parser.add_argument('--cleanup', action='store_true', help='Borrar los datos sintéticos y salir')
+        parser.add_argument('--acudientes', type=int, default=500)
+        parser.add_argument('--estudiantes-por-acudiente', type=int, default=1)
+        parser.add_argument('--instituciones', type=int, default=10)
+        parser.add_argument('--grados', default='6,7,8,9,10,11', help='Grados ofrecidos, separados por coma')
+        parser.add_argument('--secciones', type=int, default=2)
+        parser.add_argument('--cupos', type=int, default=10, help='Cupos por curso al sembrar')
+        parser.add_argument('--password', default='carga123')
+        parser.add_argument('--concurrencia', type=int, default=32, help='Acudientes simultáneos')
+        parser.add_argument('--administrativos', type=int, default=0, help='Administrativos virtuales (0 = uno por institución)')
+        parser.add_argument('--consultas-panel', type=int, default=3, help='Veces que cada acudiente consulta su panel')
+        parser.add_argument('--pausa', type=float, default=0.2, help='Segundos de "pensar" entre acciones (aleatorio 0..pausa)')
+        parser.add_argument('--reintentos', type=float, default=0.1, help='Probabilidad de reenviar una solicitud con la misma Idempotency-Key')
+        parser.add_argument('--timeout', type=float, default=30.0)
+        parser.add_argument('--semilla', type=int, default=None, help='Semilla del generador aleatorio')
+        parser.add_argument('--max-error-rate', type=float, default=1.0,
+                            help='Porcentaje máximo de errores por tipo de petición; si alguno lo supera el comando falla')
+
+    def handle(self, *args, **options):
+        if options['cleanup']:
+            self.limpiar()
+            return
+        rng = random.Random(options['semilla'])
+        if options['seed']:
+            self.sembrar(options)
+
+        acudientes = list(
+            Acudiente.objects.filter(id_usu__ema_usu__endswith='@' + DOMINIO)
+            .values_list('pk', 'id_usu__ema_usu')
+        )
+        if not acudientes:
+            raise CommandError('No hay datos sintéticos; ejecuta con --seed')
+        estudiantes = {}
+        for est_id, acu_id in Estudiante.objects.filter(id_acu__in=[a[0] for a in acudientes]).values_list('pk', 'id_acu'):
+            estudiantes.setdefault(acu_id, []).append(est_id)
+        instituciones = list(Institucion.objects.filter(nom_inst__startswith=PREFIJO_INST).values_list('pk', 'nom_inst'))
+        grados = {}
+        for inst_id, grado in Curso.objects.filter(id_inst__in=[i[0] for i in instituciones]).values_list('id_inst', 'num_grd_cur').distinct():
+            grados.setdefault(inst_id, set()).add(grado)
+        admins = list(
+            Administrativo.objects.filter(id_usu__ema_usu__endswith='@' + DOMINIO)
+            .values_list('id_usu__ema_usu', 'institucion__pk')
+        )
+        if options['administrativos']:
+            admins = admins[:options['administrativos']]
+        inicial = self.ocupacion(instituciones)
+        connection.close()
+
+        stats = Estadisticas()
+        fin_acudientes = threading.Event()
+        self.stdout.write(
+            f"Simulando {len(acudientes)} acudientes ({options['concurrencia']} simultáneos) y "
+            f"{len(admins)} administrativos contra {options['base_url']}"
+        )
+        inicio = time.perf_counter()
+        admin_threads = [
+            threading.Thread(target=self.administrativo, args=(email, inst_id, options, stats, fin_acudientes), daemon=True)
+            for email, inst_id in admins
+        ]
+        for t in admin_threads:
+            t.start()
+        with ThreadPoolExecutor(max_workers=options['concurrencia']) as pool:
+            for acu_id, email in acudientes:
+                pool.submit(
+                    self.acudiente, email, estudiantes.get(acu_id, []), instituciones, grados, options, stats,
+                    random.Random(rng.random()),
+                )
+        fin_acudientes.set()
+        for t in admin_threads:
+            t.join()
+        duracion = time.perf_counter() - inicio
+
+        self.informe(stats, duracion)
+        violaciones = self.invariantes(instituciones, inicial)
+        for v in violaciones:
+            self.stdout.write(self.style.ERROR(f'INVARIANTE VIOLADA: {v}'))
+        if not violaciones:
+            self.stdout.write(self.style.SUCCESS('Invariantes de cupos OK'))
+        excesos = self.errores_excesivos(stats, options['max_error_rate'])
+        for e in excesos:
+            self.stdout.write(self.style.ERROR(f'TASA DE ERROR: {e}'))
+        if violaciones or excesos:
+            raise CommandError(
+                f'{len(violaciones)} invariante(s) de cupos violada(s), '
+                f'{len(excesos)} tipo(s) de petición sobre {options["max_error_rate"]}% de errores'
+            )
+
+    # ------------------------------------------------------------------
+    # Actores
+    # ------------------------------------------------------------------
+
+    def acudiente(self, email, est_ids, instituciones, grados, options, stats, rng):
+        try:
+            s = Sesion(options['base_url'], stats, options['timeout'])
+            if not s.login(email, options['password']):
+                return
+            pausa = options['pausa']
+            inst_id, nom_inst = rng.choice(instituciones)
+            termino = nom_inst.split()[-1]
+            time.sleep(rng.random() * pausa)
+            s.pedir('search', '/school/search/?' + urllib.parse.urlencode({'q': termino}))
+            for est_id in est_ids:
+                time.sleep(rng.random() * pausa)
+                grado = rng.choice(sorted(grados.get(inst_id) or [6]))
+                data = {'inst_id': inst_id, 'grado': grado, 'est_id': est_id}
+                headers = {'Idempotency-Key': uuid.uuid4().hex}
+                s.pedir('create', '/school/request/create/', data, headers)
+                if rng.random() < options['reintentos']:
+                    s.pedir('create_retry', '/school/request/create/', data, headers)
+            for _ in range(options['consultas_panel']):
+                time.sleep(rng.random() * pausa)
+                s.pedir('panel', '/accounts/panel/acudiente/')
+        finally:
+            connection.close()
+
+    def administrativo(self, email, inst_id, options, stats, fin_acudientes):
+        """Acepta solicitudes pendientes de su institución hasta que no queden."""
+        try:
+            s = Sesion(options['base_url'], stats, options['timeout'])
+            if not s.login(email, options['password']):
+                return
+            while True:
+                # la cola de trabajo se lee de la base de datos (no cuenta en las métricas)
+                pendientes = list(
+                    MatriculaRequest.objects.filter(id_inst_id=inst_id, estado='pending')
+                    .order_by('?').values_list('pk', flat=True)[:5]
+                )
+                if not pendientes:
+                    if fin_acudientes.is_set():
+                        return
+                    time.sleep(0.2)
+                    continue
+                for pk in pendientes:
+                    s.pedir('admin_detail', f'/adminpanel/solicitudes/matriculas/{pk}/')
+                    s.pedir('accept', f'/adminpanel/solicitudes/matriculas/{pk}/', {'action': 'accept', 'comment': 'carga'}, ok_estados=(302,))
+        finally:
+            connection.close()
+
+    # ------------------------------------------------------------------
+    # Informe e invariantes
+    # ------------------------------------------------------------------
+
+    def informe(self, stats, duracion):
+        total = sum(len(v) for v in stats.latencias.values())
+        self.stdout.write(f'\nDuración: {duracion:.1f}s  peticiones: {total}  rendimiento: {total / duracion if duracion else 0:.1f} req/s\n')
+        self.stdout.write(f"{'petición':<14}{'n':>7}{'err%':>7}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}  estados")
+        for etiqueta in sorted(stats.latencias):
+            lat = stats.latencias[etiqueta]
+            err = stats.errores.get(etiqueta, 0) * 100.0 / len(lat)
+            self.stdout.write(
+                f'{etiqueta:<14}{len(lat):>7}{err:>7.1f}'
+                f'{_percentil(lat, 50) * 1000:>9.0f}{_percentil(lat, 90) * 1000:>9.0f}'
+                f'{_percentil(lat, 99) * 1000:>9.0f}{max(lat) * 1000:>9.0f}  {stats.estados[etiqueta]}'
+            )
+        todas = [x for v in stats.latencias.values() for x in v]
+        if todas:
+            self.stdout.write(f'media global: {statistics.mean(todas) * 1000:.0f} ms\n')
+
+    def errores_excesivos(self, stats, maximo):
+        """Tipos de petición cuya tasa de error supera `maximo` (%); sin peticiones también es un fallo."""
+        if not any(stats.latencias.values()):
+            return ['no se completó ninguna petición']
+        excesos = []
+        for etiqueta in sorted(stats.latencias):
+            n = len(stats.latencias[etiqueta])
+            err = stats.errores.get(etiqueta, 0) * 100.0 / n if n else 0.0
+            if err > maximo:
+                excesos.append(f'{etiqueta}: {err:.1f}% de {n} peticiones')
+        return excesos
+
+    def ocupacion(self, instituciones):
+        """Por curso: (cupos disponibles, matrículas que ocupan cupo) en este momento."""
+        inst_ids = [i[0] for i in instituciones]
+        matriculas = dict(
+            Matricula.objects.filter(id_cur__id_inst__in=inst_ids, cupo_tomado=True)
+            .values_list('id_cur').annotate(n=Count('pk'))
+        )
+        return {
+            pk: (cupos, matriculas.get(pk, 0))
+            for pk, cupos in Curso.objects.filter(id_inst__in=inst_ids).values_list('pk', 'cup_disp_cur')
+        }
+
+    def invariantes(self, instituciones, inicial):
+        """Comprueba que no se sobrevendieron cupos ni se duplicaron matrículas o solicitudes.
+
+        Cada cupo descontado durante la simulación debe corresponder a exactamente
+        una matrícula nueva en ese curso, y ningún curso puede quedar en negativo.
+        """
+        violaciones = []
+        inst_ids = [i[0] for i in instituciones]
+        final = self.ocupacion(instituciones)
+        nombres = dict(Curso.objects.filter(id_inst__in=inst_ids).values_list('pk', 'grd_cur'))
+        for pk, (cupos, matriculas) in final.items():
+            cupos_ini, matriculas_ini = inicial.get(pk, (cupos, 0))
+            if cupos < 0:
+                violaciones.append(f'curso {nombres[pk]} ({pk}) con cup_disp_cur={cupos}')
+            if cupos_ini - cupos != matriculas - matriculas_ini:
+                violaciones.append(
+                    f'curso {nombres[pk]} ({pk}): se descontaron {cupos_ini - cupos} cupos '
+                    f'pero se crearon {matriculas - matriculas_ini} matrículas'
+                )
+        dobles = (
+            Matricula.objects.filter(id_est__id_acu__id_usu__ema_usu__endswith='@' + DOMINIO)
+            .values('id_est').annotate(n=Count('pk')).filter(n__gt=1).count()
+        )
+        if dobles:
+            violaciones.append(f'{dobles} estudiante(s) sintético(s) con más de una matrícula')
+        activas = (
+            MatriculaRequest.objects.filter(id_inst__in=inst_ids, estado__in=['pending', 'waitlisted'])
+            .values('id_est', 'id_inst').annotate(n=Count('pk')).filter(n__gt=1).count()
+        )
+        if activas:
+            violaciones.append(f'{activas} estudiante(s) con solicitudes activas duplicadas')
+        # el resumen por grado debe coincidir con los cursos tras la carga
+        libres = {}
+        for inst_id, grado, cupos in Curso.objects.filter(id_inst__in=inst_ids).values_list('id_inst_id', 'num_grd_cur', 'cup_disp_cur'):
+            libres[(inst_id, grado)] = libres.get((inst_id, grado), 0) + max(cupos, 0)
+        for inst_id, grado, cupos in DisponibilidadCupos.objects.filter(id_inst__in=inst_ids).values_list('id_inst_id', 'grado', 'cupos_libres'):
+            if libres.get((inst_id, grado)) != cupos:
+                violaciones.append(
+                    f'disponibilidad {inst_id}/{grado}: {cupos} cupos libres en el resumen '
+                    f'y {libres.get((inst_id, grado), 0)} en los cursos'
+                )
+        return violaciones
+
+    # ------------------------------------------------------------------
+    # Datos sintéticos
+    # ------------------------------------------------------------------
+
+    def sembrar(self, options):
+        """Crea instituciones, cursos, administrativos, acudientes y estudiantes con documentos completos."""
+        # un solo hash para todos: derivar miles de contraseñas tomaría minutos
+        hashed = make_password(options['password'])
+        grados = [int(g) for g in options['grados'].split(',') if g.strip()]
+        rol_acu, _ = Rol.objects.get_or_create(nom_rol='acudiente')
+        rol_adm, _ = Rol.objects.get_or_create(nom_rol='administrativo')
+        rol_est, _ = Rol.objects.get_or_create(nom_rol='estudiante')
+        lote = uuid.uuid4().hex[:6]
+
+        with transaction.atomic():
+            regs_adm = Registro.objects.bulk_create([
+                Registro(nom_usu='Admin', ape_usu=f'Carga {i}', ema_usu=f'adm-{lote}-{i}@{DOMINIO}', con_usu=hashed, id_rol=rol_adm)
+                for i in range(options['instituciones'])
+            ])
+            adms = Administrativo.objects.bulk_create([
+                Administrativo(num_doc_adm=f'c{lote}a{i}', id_usu=r) for i, r in enumerate(regs_adm)
+            ])
+            insts = [
+                Institucion(nom_inst=f'{PREFIJO_INST}{lote} Colegio{i}', mun_inst='Medellín', dep_inst='Antioquia', tip_inst='Pública', id_adm=a)
+                for i, a in enumerate(adms)
+            ]
+            # bulk_create no pasa por save(): el texto de búsqueda se calcula aquí
+            for inst in insts:
+                inst.actualizar_search_doc()
+            insts = Institucion.objects.bulk_create(insts)
+            cursos = []
+            for inst in insts:
+                for g in grados:
+                    for sec in range(1, options['secciones'] + 1):
+                        cursos.append(Curso(
+                            grd_cur=f'{g}-{sec:02d}', num_grd_cur=g, num_sec_cur=sec,
+                            id_inst=inst, cup_disp_cur=options['cupos'], cap_cur=options['cupos'],
+                        ))
+            Curso.objects.bulk_create(cursos, batch_size=1000)
+            # bulk_create no dispara señales: crear el resumen de cupos de cada institución
+            for inst in insts:
+                refrescar_disponibilidad(inst.pk, grados)
+
+            regs_acu = Registro.objects.bulk_create([
+                Registro(nom_usu='Acudiente', ape_usu=f'Carga {i}', ema_usu=f'acu-{lote}-{i}@{DOMINIO}', con_usu=hashed, id_rol=rol_acu)
+                for i in range(options['acudientes'])
+            ], batch_size=1000)
+            acus = Acudiente.objects.bulk_create([
+                Acudiente(num_doc_acu=f'c{lote}u{i}', dir_acu=f'Calle {i} # 1-1', id_usu=r) for i, r in enumerate(regs_acu)
+            ], batch_size=1000)
+            n_est = options['estudiantes_por_acudiente']
+            regs_est = Registro.objects.bulk_create([
+                Registro(nom_usu='Estudiante', ape_usu=f'Carga {i}-{j}', ema_usu=f'est-{lote}-{i}-{j}@{DOMINIO}', con_usu=hashed, id_rol=rol_est)
+                for i in range(len(acus)) for j in range(n_est)
+            ], batch_size=1000)
+            ests = Estudiante.objects.bulk_create([
+                # bulk_create no dispara señales: el resumen de documentos se escribe directamente
+                Estudiante(num_doc_est=f'c{lote}e{k}', id_usu=r, id_acu=acus[k // n_est], doc_comp_est=True, doc_falt_est=[])
+                for k, r in enumerate(regs_est)
+            ], batch_size=1000)
+            Documento.objects.bulk_create([
+                Documento(id_est=e, **{campo: 'carga' for campo in DOCUMENTOS_REQUERIDOS}) for e in ests
+            ], batch_size=1000)
+            # ni el índice de búsqueda del panel de administración
+            search_index.indexar('administrativo', [a.pk for a in adms])
+            search_index.indexar('institucion', [i.pk for i in insts])
+            search_index.indexar('acudiente', [a.pk for a in acus])
+            search_index.indexar('estudiante', [e.pk for e in ests])
+        self.stdout.write(self.style.SUCCESS(
+            f'Sembrado lote {lote}: {len(insts)} instituciones, {len(cursos)} cursos, '
+            f'{len(acus)} acudientes, {len(ests)} estudiantes'
+        ))
+
+    def limpiar(self):
+        with transaction.atomic():
+            Institucion.objects.filter(nom_inst__startswith=PREFIJO_INST, id_adm__id_usu__ema_usu__endswith='@' + DOMINIO).delete()
+            borrados, _ = Registro.objects.filter(ema_usu__endswith='@' + DOMINIO).delete()
+        self.stdout.write(self.style.SUCCESS(f'Datos sintéticos eliminados ({borrados} filas)'))
@@ -0,0 +1,45 @@
+"""Puntero a la matrícula vigente de cada estudiante.
+
+`Estudiante.id_mat_act`, `id_cur_act` e `id_inst_act` guardan la matrícula más
+reciente (por fecha de registro y luego por id) con su curso e institución,
+para que las vistas resuelvan "dónde está matriculado" con un join en lugar de
+un `order_by('-fch_reg_mat').first()` por estudiante.
+"""
+from django.db.models import OuterRef, Subquery
+
+from .models import Matricula
+
+# select_related para cargar el puntero junto con el estudiante
+RELACIONES_ACTUALES = ('id_mat_act', 'id_cur_act', 'id_inst_act')
+
+
+def refrescar_matricula_actual(est_ids):
+    """Recalcula el puntero para los estudiantes indicados con un único UPDATE."""
+    from people.models import Estudiante
+
+    est_ids = [pk for pk in set(est_ids) if pk]
+    if not est_ids:
+        return 0
+    ultima = Matricula.objects.filter(id_est=OuterRef('pk')).order_by('-fch_reg_mat', '-id_mat')
+    return Estudiante.objects.filter(pk__in=est_ids).update(
+        id_mat_act=Subquery(ultima.values('id_mat')[:1]),
+        id_cur_act=Subquery(ultima.values('id_cur')[:1]),
+        id_inst_act=Subquery(ultima.values('id_cur__id_inst')[:1]),
+    )
+
+
+def matricula_actual(est):
+    """Matrícula vigente del estudiante con curso e institución ya cargados.
+
+    Si el estudiante se cargó con `select_related(*RELACIONES_ACTUALES)` no hace
+    consultas: la matrícula reutiliza el curso y la institución del puntero.
+    """
+    mat = est.id_mat_act
+    if mat is None:
+        return None
+    curso = est.id_cur_act
+    if curso is not None and mat.id_cur_id == curso.pk:
+        if est.id_inst_act_id and curso.id_inst_id == est.id_inst_act_id:
+            curso.id_inst = est.id_inst_act
+        mat.id_cur = curso
+    return mat
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0011_institucion_img_inst'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='matricularequest',
+            name='estado',
+            field=models.CharField(choices=[('pending', 'Pendiente'), ('accepted', 'Aceptada'), ('rejected', 'Rechazada'), ('needs_docs', 'Faltan documentos'), ('waitlisted', 'En lista de espera')], db_column='estado', default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='ListaEspera',
+            fields=[
+                ('id_esp', models.AutoField(db_column='id_esp', primary_key=True, serialize=False)),
+                ('grado', models.IntegerField(db_column='grado')),
+                ('posicion', models.IntegerField(db_column='posicion')),
+                ('estado', models.CharField(choices=[('waiting', 'En espera'), ('promoted', 'Promovida'), ('closed', 'Cerrada')], db_column='estado', default='waiting', max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+                ('id_inst', models.ForeignKey(db_column='id_inst', on_delete=django.db.models.deletion.CASCADE, to='school.institucion')),
+                ('id_req', models.OneToOneField(db_column='id_req', on_delete=django.db.models.deletion.CASCADE, related_name='lista_espera', to='school.matricularequest')),
+            ],
+            options={
+                'db_table': 'lista_espera',
+                'indexes': [models.Index(fields=['id_inst', 'grado', 'estado', 'posicion'], name='lista_espera_cola_idx')],
+                'constraints': [models.UniqueConstraint(fields=('id_inst', 'grado', 'posicion'), name='lista_espera_turno_uniq')],
+            },
+        ),
+    ]
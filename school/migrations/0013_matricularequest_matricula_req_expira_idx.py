@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0006_alter_acudiente_dir_acu_alter_maestro_dir_mae'),
+        ('school', '0012_listaespera'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='matricularequest',
+            index=models.Index(fields=['estado', 'expires_at'], name='matricula_req_expira_idx'),
+        ),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:07
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+REQUERIDOS = [
+    'reg_civil_doc', 'doc_idn_acu', 'doc_idn_alum', 'cnt_vac_doc',
+    'adres_doc', 'fot_alum_doc', 'cer_med_disca_doc', 'cer_esc_doc',
+]
+
+
+def backfill_checklist(apps, schema_editor):
+    Estudiante = apps.get_model('people', 'Estudiante')
+    Documento = apps.get_model('school', 'Documento')
+    ChecklistDocumento = apps.get_model('school', 'ChecklistDocumento')
+
+    # documentos por estudiante (ligados directamente o a través de su matrícula), más recientes primero
+    entregados = {}
+    docs = Documento.objects.order_by('-id_doc').values('id_doc', 'id_est_id', 'id_mat__id_est_id', *REQUERIDOS)
+    for d in docs.iterator(chunk_size=2000):
+        for est_id in {d['id_est_id'], d['id_mat__id_est_id']} - {None}:
+            found = entregados.setdefault(est_id, {})
+            for tipo in REQUERIDOS:
+                if d[tipo] and tipo not in found:
+                    found[tipo] = d['id_doc']
+
+    rows = []
+    to_update = []
+    for est in Estudiante.objects.only('id_est', 'foto_perfil').iterator(chunk_size=2000):
+        found = entregados.get(est.id_est, {})
+        if est.foto_perfil and 'fot_alum_doc' not in found:
+            found['fot_alum_doc'] = None
+        for tipo in REQUERIDOS:
+            rows.append(ChecklistDocumento(
+                id_est_id=est.id_est,
+                tipo=tipo,
+                estado='entregado' if tipo in found else 'faltante',
+                id_doc_id=found.get(tipo),
+            ))
+        est.doc_falt_est = [t for t in REQUERIDOS if t not in found]
+        est.doc_comp_est = not est.doc_falt_est
+        to_update.append(est)
+    ChecklistDocumento.objects.bulk_create(rows, batch_size=1000)
+    Estudiante.objects.bulk_update(to_update, ['doc_comp_est', 'doc_falt_est'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0007_estudiante_doc_comp_est_estudiante_doc_falt_est'),
+        ('school', '0013_matricularequest_matricula_req_expira_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChecklistDocumento',
+            fields=[
+                ('id_chk', models.AutoField(db_column='id_chk', primary_key=True, serialize=False)),
+                ('tipo', models.CharField(choices=[('reg_civil_doc', 'reg_civil_doc'), ('doc_idn_acu', 'doc_idn_acu'), ('doc_idn_alum', 'doc_idn_alum'), ('cnt_vac_doc', 'cnt_vac_doc'), ('adres_doc', 'adres_doc'), ('fot_alum_doc', 'fot_alum_doc'), ('cer_med_disca_doc', 'cer_med_disca_doc'), ('cer_esc_doc', 'cer_esc_doc')], db_column='tipo', max_length=30)),
+                ('estado', models.CharField(choices=[('faltante', 'Faltante'), ('entregado', 'Entregado')], db_column='estado', default='faltante', max_length=20)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_column='updated_at')),
+                ('id_doc', models.ForeignKey(blank=True, db_column='id_doc', null=True, on_delete=django.db.models.deletion.SET_NULL, to='school.documento')),
+                ('id_est', models.ForeignKey(db_column='id_est', on_delete=django.db.models.deletion.CASCADE, related_name='checklist_documentos', to='people.estudiante')),
+            ],
+            options={
+                'db_table': 'checklist_documento',
+                'constraints': [models.UniqueConstraint(fields=('id_est', 'tipo'), name='checklist_doc_est_tipo_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_checklist, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:09
+
+from django.db import migrations, models
+
+
+def reject_duplicate_active_requests(apps, schema_editor):
+    """Deja una sola solicitud activa por (estudiante, institución): la más antigua."""
+    MatriculaRequest = apps.get_model('school', 'MatriculaRequest')
+    ListaEspera = apps.get_model('school', 'ListaEspera')
+    seen = set()
+    duplicates = []
+    active = (
+        MatriculaRequest.objects
+        .filter(estado__in=['pending', 'waitlisted'])
+        .order_by('id_req')
+        .values_list('id_req', 'id_est_id', 'id_inst_id')
+    )
+    for id_req, est_id, inst_id in active.iterator(chunk_size=2000):
+        if (est_id, inst_id) in seen:
+            duplicates.append(id_req)
+        else:
+            seen.add((est_id, inst_id))
+    for i in range(0, len(duplicates), 500):
+        chunk = duplicates[i:i + 500]
+        MatriculaRequest.objects.filter(pk__in=chunk).update(estado='rejected', obs='Solicitud duplicada')
+        ListaEspera.objects.filter(id_req_id__in=chunk, estado='waiting').update(estado='closed')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('people', '0007_estudiante_doc_comp_est_estudiante_doc_falt_est'),
+        ('school', '0014_checklistdocumento'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClaveIdempotencia',
+            fields=[
+                ('id_cla', models.AutoField(db_column='id_cla', primary_key=True, serialize=False)),
+                ('clave', models.CharField(db_column='clave', max_length=64)),
+                ('ambito', models.CharField(db_column='ambito', max_length=64)),
+                ('ruta', models.CharField(db_column='ruta', max_length=200)),
+                ('estado_http', models.PositiveSmallIntegerField(blank=True, db_column='estado_http', null=True)),
+                ('respuesta', models.JSONField(blank=True, db_column='respuesta', null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_column='created_at')),
+            ],
+            options={
+                'db_table': 'clave_idempotencia',
+            },
+        ),
+        migrations.RunPython(reject_duplicate_active_requests, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='matricularequest',
+            constraint=models.UniqueConstraint(condition=models.Q(('estado__in', ['pending', 'waitlisted'])), fields=('id_est', 'id_inst'), name='matricula_req_activa_uniq'),
+        ),
+        migrations.AddIndex(
+            model_name='claveidempotencia',
+            index=models.Index(fields=['created_at'], name='clave_idempotencia_fecha_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='claveidempotencia',
+            constraint=models.UniqueConstraint(fields=('ambito', 'ruta', 'clave'), name='clave_idempotencia_uniq'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:12
+
+from django.db import migrations, models
+
+
+def _partes(grd_cur):
+    texto = (grd_cur or '').strip()
+    grado = ''
+    i = 0
+    while i < len(texto) and texto[i].isdigit():
+        grado += texto[i]
+        i += 1
+    if not grado:
+        return None, None
+    seccion = ''.join(ch for ch in texto[i:] if ch.isdigit())
+    return int(grado), (int(seccion) if seccion else None)
+
+
+def backfill_grado_seccion(apps, schema_editor):
+    Curso = apps.get_model('school', 'Curso')
+    cursos = []
+    for curso in Curso.objects.only('id_cur', 'grd_cur').iterator(chunk_size=2000):
+        curso.num_grd_cur, curso.num_sec_cur = _partes(curso.grd_cur)
+        cursos.append(curso)
+    Curso.objects.bulk_update(cursos, ['num_grd_cur', 'num_sec_cur'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0015_claveidempotencia_matricula_req_activa_uniq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='curso',
+            name='num_grd_cur',
+            field=models.IntegerField(blank=True, db_column='num_grd_cur', null=True),
+        ),
+        migrations.AddField(
+            model_name='curso',
+            name='num_sec_cur',
+            field=models.IntegerField(blank=True, db_column='num_sec_cur', null=True),
+        ),
+        migrations.RunPython(backfill_grado_seccion, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='curso',
+            index=models.Index(fields=['id_inst', 'num_grd_cur', 'cup_disp_cur'], name='curso_inst_grado_cupo_idx'),
+        ),
+    ]
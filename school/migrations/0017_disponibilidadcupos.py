@@ -0,0 +1,67 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def backfill_disponibilidad(apps, schema_editor):
+    Curso = apps.get_model('school', 'Curso')
+    Matricula = apps.get_model('school', 'Matricula')
+    DisponibilidadCupos = apps.get_model('school', 'DisponibilidadCupos')
+
+    ocupados = {
+        (r['id_cur__id_inst_id'], r['id_cur__num_grd_cur']): r['n']
+        for r in Matricula.objects.filter(id_cur__isnull=False, id_cur__num_grd_cur__isnull=False)
+        .values('id_cur__id_inst_id', 'id_cur__num_grd_cur')
+        .annotate(n=Count('pk'))
+    }
+    filas = []
+    agregados = (
+        Curso.objects.filter(id_inst__isnull=False, num_grd_cur__isnull=False)
+        .values('id_inst_id', 'num_grd_cur')
+        .annotate(
+            secciones=Count('pk'),
+            secciones_con_cupo=Count('pk', filter=Q(cup_disp_cur__gt=0)),
+            cupos_libres=Sum('cup_disp_cur', filter=Q(cup_disp_cur__gt=0)),
+        )
+    )
+    for r in agregados:
+        libres = r['cupos_libres'] or 0
+        filas.append(DisponibilidadCupos(
+            id_inst_id=r['id_inst_id'],
+            grado=r['num_grd_cur'],
+            secciones=r['secciones'],
+            secciones_con_cupo=r['secciones_con_cupo'],
+            cupos_libres=libres,
+            cupos_total=libres + ocupados.get((r['id_inst_id'], r['num_grd_cur']), 0),
+        ))
+    DisponibilidadCupos.objects.bulk_create(filas, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0016_curso_grado_seccion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DisponibilidadCupos',
+            fields=[
+                ('id_disp', models.AutoField(db_column='id_disp', primary_key=True, serialize=False)),
+                ('grado', models.IntegerField(db_column='grado')),
+                ('cupos_total', models.IntegerField(db_column='cupos_total', default=0)),
+                ('cupos_libres', models.IntegerField(db_column='cupos_libres', default=0)),
+                ('secciones', models.IntegerField(db_column='secciones', default=0)),
+                ('secciones_con_cupo', models.IntegerField(db_column='secciones_con_cupo', default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True, db_column='updated_at')),
+                ('id_inst', models.ForeignKey(db_column='id_inst', on_delete=django.db.models.deletion.CASCADE, related_name='disponibilidad', to='school.institucion')),
+            ],
+            options={
+                'db_table': 'disponibilidad_cupos',
+                'constraints': [models.UniqueConstraint(fields=('id_inst', 'grado'), name='disponibilidad_inst_grado_uniq')],
+            },
+        ),
+        migrations.RunPython(backfill_disponibilidad, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,103 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:20
+
+import unicodedata
+
+from django.db import DatabaseError, migrations, models, transaction
+
+SQLITE_COLUMNAS = ('nom_inst', 'mun_inst', 'dep_inst', 'dire_inst', 'cod_dane_inst', 'tel_inst', 'ema_inst')
+
+
+def _normalizar(texto):
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch))
+    return ' '.join(texto.lower().split())
+
+
+def backfill_search_doc(apps, schema_editor):
+    Institucion = apps.get_model('school', 'Institucion')
+    insts = []
+    for inst in Institucion.objects.iterator(chunk_size=2000):
+        partes = [inst.nom_inst, inst.mun_inst, inst.dep_inst, inst.dire_inst, inst.cod_dane_inst, inst.tel_inst, inst.ema_inst]
+        inst.search_doc = _normalizar(' '.join(p for p in partes if p))
+        insts.append(inst)
+    Institucion.objects.bulk_update(insts, ['search_doc'], batch_size=1000)
+
+
+def crear_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        # pg_trgm puede no estar permitido en algunos planes: sin él queda solo el índice de texto completo
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        except DatabaseError:
+            pass
+        schema_editor.execute(
+            "CREATE INDEX IF NOT EXISTS institucion_search_tsv_idx ON institucion "
+            "USING gin (to_tsvector('simple', search_doc))"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            trgm = cursor.fetchone() is not None
+        if trgm:
+            schema_editor.execute(
+                'CREATE INDEX IF NOT EXISTS institucion_search_trgm_idx ON institucion '
+                'USING gin (search_doc gin_trgm_ops)'
+            )
+    elif connection.vendor == 'sqlite':
+        try:
+            with transaction.atomic(using=connection.alias):
+                schema_editor.execute(
+                    'CREATE VIRTUAL TABLE institucion_fts USING fts5('
+                    + ', '.join(SQLITE_COLUMNAS)
+                    + ", content='institucion', content_rowid='id_inst', "
+                    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+                )
+        except DatabaseError:
+            # SQLite compilado sin FTS5: school.search usa el texto normalizado
+            return
+        cols = ', '.join(SQLITE_COLUMNAS)
+        nuevos = ', '.join(f'new.{c}' for c in SQLITE_COLUMNAS)
+        viejos = ', '.join(f'old.{c}' for c in SQLITE_COLUMNAS)
+        schema_editor.execute(
+            'CREATE TRIGGER institucion_fts_ai AFTER INSERT ON institucion BEGIN '
+            f'INSERT INTO institucion_fts(rowid, {cols}) VALUES (new.id_inst, {nuevos}); END'
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER institucion_fts_ad AFTER DELETE ON institucion BEGIN '
+            f"INSERT INTO institucion_fts(institucion_fts, rowid, {cols}) VALUES ('delete', old.id_inst, {viejos}); END"
+        )
+        schema_editor.execute(
+            'CREATE TRIGGER institucion_fts_au AFTER UPDATE ON institucion BEGIN '
+            f"INSERT INTO institucion_fts(institucion_fts, rowid, {cols}) VALUES ('delete', old.id_inst, {viejos}); "
+            f'INSERT INTO institucion_fts(rowid, {cols}) VALUES (new.id_inst, {nuevos}); END'
+        )
+        schema_editor.execute("INSERT INTO institucion_fts(institucion_fts) VALUES ('rebuild')")
+
+
+def borrar_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS institucion_search_trgm_idx')
+        schema_editor.execute('DROP INDEX IF EXISTS institucion_search_tsv_idx')
+    elif connection.vendor == 'sqlite':
+        for trigger in ('institucion_fts_ai', 'institucion_fts_ad', 'institucion_fts_au'):
+            schema_editor.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+        schema_editor.execute('DROP TABLE IF EXISTS institucion_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0017_disponibilidadcupos'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institucion',
+            name='search_doc',
+            field=models.TextField(blank=True, db_column='search_doc', default=''),
+        ),
+        migrations.RunPython(backfill_search_doc, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, borrar_indice),
+    ]
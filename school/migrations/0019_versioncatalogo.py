@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:23
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def crear_version(apps, schema_editor):
+    VersionCatalogo = apps.get_model('school', 'VersionCatalogo')
+    VersionCatalogo.objects.get_or_create(nombre='catalogo', defaults={'version': 1, 'updated_at': timezone.now()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0018_institucion_search_doc'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VersionCatalogo',
+            fields=[
+                ('nombre', models.CharField(db_column='nombre', max_length=30, primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField(db_column='version', default=0)),
+                ('updated_at', models.DateTimeField(db_column='updated_at')),
+            ],
+            options={
+                'db_table': 'version_catalogo',
+            },
+        ),
+        migrations.RunPython(crear_version, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0005_alter_administrativo_dir_adm'),
+        ('school', '0019_versioncatalogo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='institucion',
+            name='lat_inst',
+            field=models.DecimalField(blank=True, db_column='lat_inst', decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddField(
+            model_name='institucion',
+            name='lon_inst',
+            field=models.DecimalField(blank=True, db_column='lon_inst', decimal_places=6, max_digits=9, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='institucion',
+            index=models.Index(fields=['lat_inst', 'lon_inst'], name='institucion_latlon_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.8 on 2026-10-18 07:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0020_institucion_coordenadas'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CambioCupo',
+            fields=[
+                ('id_cam', models.BigAutoField(db_column='id_cam', primary_key=True, serialize=False)),
+                ('id_inst', models.IntegerField(db_column='id_inst')),
+                ('grado', models.IntegerField(db_column='grado')),
+                ('cupos_total', models.IntegerField(db_column='cupos_total', default=0)),
+                ('cupos_libres', models.IntegerField(db_column='cupos_libres', default=0)),
+                ('secciones_con_cupo', models.IntegerField(db_column='secciones_con_cupo', default=0)),
+                ('created_at', models.DateTimeField(db_column='created_at', db_index=True, default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'cambio_cupo',
+            },
+        ),
+    ]
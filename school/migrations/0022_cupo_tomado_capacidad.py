@@ -0,0 +1,39 @@
+# Generated by Django 5.2.8 on 2026-10-18 08:22
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def marcar_existentes(apps, schema_editor):
+    """Las matrículas vigentes con curso tomaron su cupo; la capacidad es lo libre más lo ocupado."""
+    Matricula = apps.get_model('school', 'Matricula')
+    Curso = apps.get_model('school', 'Curso')
+    Matricula.objects.filter(id_cur__isnull=False).exclude(est_mat='cancelado').update(cupo_tomado=True)
+    ocupados = dict(
+        Matricula.objects.filter(cupo_tomado=True).values_list('id_cur').annotate(n=Count('pk'))
+    )
+    cursos = list(Curso.objects.only('pk', 'cup_disp_cur'))
+    for curso in cursos:
+        curso.cap_cur = max(curso.cup_disp_cur, 0) + ocupados.get(curso.pk, 0)
+    Curso.objects.bulk_update(cursos, ['cap_cur'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('school', '0021_cambiocupo'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='curso',
+            name='cap_cur',
+            field=models.IntegerField(blank=True, db_column='cap_cur', null=True),
+        ),
+        migrations.AddField(
+            model_name='matricula',
+            name='cupo_tomado',
+            field=models.BooleanField(db_column='cupo_tomado', default=False),
+        ),
+        migrations.RunPython(marcar_existentes, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,28 @@
 from django.db import models
 from django.conf import settings
+from django.utils import timezone
 from django.conf.urls.static import static
 
+from utils.texto import normalizar_texto
+
+
+def partes_de_curso(grd_cur):
+    """Grado y sección numéricos a partir del nombre del curso.
+
+    '6-02' -> (6, 2), '10-01' -> (10, 1), '11' -> (11, None); sin grado -> (None, None).
+    """
+    texto = (grd_cur or '').strip()
+    grado = ''
+    i = 0
+    while i < len(texto) and texto[i].isdigit():
+        grado += texto[i]
+        i += 1
+    if not grado:
+        return None, None
+    seccion = ''.join(ch for ch in texto[i:] if ch.isdigit())
+    return int(grado), (int(seccion) if seccion else None)
+
+
 class Institucion(models.Model):
     id_inst = models.AutoField(primary_key=True, db_column='id_inst')
     nom_inst = models.CharField(max_length=100, db_column='nom_inst')
@@ -16,27 +37,138 @@ class Institucion(models.Model):
     img_inst = models.ImageField(upload_to='instituciones/', null=True, blank=True, db_column='img_inst')
     # allow duplicate assignment of same subject in same timeslot (institution-wide toggle)
     allow_duplicate_subject_slots = models.BooleanField(default=False, db_column='allow_dup_sub_slots')
+    # texto normalizado para la búsqueda (ver school.search); el nombre va primero
+    search_doc = models.TextField(blank=True, default='', db_column='search_doc')
+    # coordenadas de dire_inst (ver comando geocodificar_direcciones) para la búsqueda por cercanía
+    lat_inst = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lat_inst')
+    lon_inst = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, db_column='lon_inst')
 
     class Meta:
         db_table = 'institucion'
+        indexes = [
+            # recuadro lat/lon cuando el catálogo en memoria está desactivado
+            models.Index(fields=['lat_inst', 'lon_inst'], name='institucion_latlon_idx'),
+        ]
 
     def __str__(self):
         return self.nom_inst
 
+    def actualizar_search_doc(self):
+        partes = [self.nom_inst, self.mun_inst, self.dep_inst, self.dire_inst, self.cod_dane_inst, self.tel_inst, self.ema_inst]
+        self.search_doc = normalizar_texto(' '.join(p for p in partes if p))
+        return self.search_doc
+
+    def save(self, *args, **kwargs):
+        self.actualizar_search_doc()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'search_doc'}
+        super().save(*args, **kwargs)
+
 
 class Curso(models.Model):
     id_cur = models.AutoField(primary_key=True, db_column='id_cur')
     grd_cur = models.CharField(max_length=10, db_column='grd_cur')
     num_alum_cur = models.IntegerField(default=0, db_column='num_alum_cur')
     cup_disp_cur = models.IntegerField(default=0, db_column='cup_disp_cur')
+    # capacidad: tope de cup_disp_cur al devolver cupos (ver school.seats.release_seat)
+    cap_cur = models.IntegerField(null=True, blank=True, db_column='cap_cur')
     id_inst = models.ForeignKey(Institucion, db_column='id_inst', on_delete=models.CASCADE)
+    # grado y sección derivados de grd_cur en save() ('6-02' -> 6, 2)
+    num_grd_cur = models.IntegerField(null=True, blank=True, db_column='num_grd_cur')
+    num_sec_cur = models.IntegerField(null=True, blank=True, db_column='num_sec_cur')
 
     class Meta:
         db_table = 'curso'
+        indexes = [
+            # "cursos con cupo del grado N en la institución" en una sola búsqueda por índice
+            models.Index(fields=['id_inst', 'num_grd_cur', 'cup_disp_cur'], name='curso_inst_grado_cupo_idx'),
+        ]
 
     def __str__(self):
         return self.grd_cur
 
+    def save(self, *args, **kwargs):
+        self.num_grd_cur, self.num_sec_cur = partes_de_curso(self.grd_cur)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'grd_cur' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'num_grd_cur', 'num_sec_cur'}
+        if update_fields is None or 'cup_disp_cur' in update_fields:
+            # al fijar los cupos libres (formulario del curso) la capacidad es eso más lo ya ocupado
+            tomados = 0 if self._state.adding else Matricula.objects.filter(id_cur=self.pk, cupo_tomado=True).count()
+            self.cap_cur = max(self.cup_disp_cur, 0) + tomados
+            if update_fields is not None:
+                kwargs['update_fields'] = set(kwargs['update_fields']) | {'cap_cur'}
+        super().save(*args, **kwargs)
+
+
+class DisponibilidadCupos(models.Model):
+    """Resumen de cupos por institución y grado.
+
+    Se recalcula (ver `school.disponibilidad`) en la misma transacción que
+    cualquier cambio de `Curso` o `Matricula`, para que la búsqueda, las
+    sugerencias y la admisión lean una fila en vez de recorrer los cursos.
+    """
+    id_disp = models.AutoField(primary_key=True, db_column='id_disp')
+    id_inst = models.ForeignKey(Institucion, db_column='id_inst', on_delete=models.CASCADE, related_name='disponibilidad')
+    grado = models.IntegerField(db_column='grado')
+    cupos_total = models.IntegerField(default=0, db_column='cupos_total')
+    cupos_libres = models.IntegerField(default=0, db_column='cupos_libres')
+    secciones = models.IntegerField(default=0, db_column='secciones')
+    secciones_con_cupo = models.IntegerField(default=0, db_column='secciones_con_cupo')
+    updated_at = models.DateTimeField(auto_now=True, db_column='updated_at')
+
+    class Meta:
+        db_table = 'disponibilidad_cupos'
+        constraints = [
+            models.UniqueConstraint(fields=['id_inst', 'grado'], name='disponibilidad_inst_grado_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_inst_id}/{self.grado}: {self.cupos_libres} libres"
+
+
+class VersionCatalogo(models.Model):
+    """Sello de versión del catálogo de instituciones y cupos.
+
+    Se incrementa al confirmar un cambio de instituciones o de los grados que
+    ofrecen, no de sus cupos (ver `school.catalog`); entra en el ETag de la
+    búsqueda y sirve para saber cuándo el catálogo en memoria quedó viejo.
+    """
+    nombre = models.CharField(max_length=30, primary_key=True, db_column='nombre')
+    version = models.BigIntegerField(default=0, db_column='version')
+    updated_at = models.DateTimeField(db_column='updated_at')
+
+    class Meta:
+        db_table = 'version_catalogo'
+
+    def __str__(self):
+        return f"{self.nombre} v{self.version}"
+
+
+class CambioCupo(models.Model):
+    """Registro de cambios de disponibilidad por institución y grado.
+
+    `school.disponibilidad` agrega una fila cada vez que cambian los cupos de
+    un grado; los paneles abiertos la consultan por rango de id (ver
+    `school.cambios`). Sin llave
+    foránea: las filas pueden sobrevivir a la institución y se purgan por
+    antigüedad.
+    """
+    id_cam = models.BigAutoField(primary_key=True, db_column='id_cam')
+    id_inst = models.IntegerField(db_column='id_inst')
+    grado = models.IntegerField(db_column='grado')
+    cupos_total = models.IntegerField(default=0, db_column='cupos_total')
+    cupos_libres = models.IntegerField(default=0, db_column='cupos_libres')
+    secciones_con_cupo = models.IntegerField(default=0, db_column='secciones_con_cupo')
+    created_at = models.DateTimeField(default=timezone.now, db_column='created_at', db_index=True)
+
+    class Meta:
+        db_table = 'cambio_cupo'
+
+    def __str__(self):
+        return f"{self.id_inst}/{self.grado}: {self.cupos_libres} libres"
+
 
 class Matricula(models.Model):
     id_mat = models.AutoField(primary_key=True, db_column='id_mat')
@@ -48,6 +180,8 @@ class Matricula(models.Model):
     id_cur = models.ForeignKey(Curso, db_column='id_cur', on_delete=models.CASCADE, null=True, blank=True)
     grado_solicitado = models.IntegerField(null=True, blank=True, db_column='grado_solicitado')
     id_est = models.ForeignKey('people.Estudiante', db_column='id_est', on_delete=models.CASCADE)
+    # la matrícula descontó un cupo de id_cur (school.seats); solo esas lo devuelven al anularse
+    cupo_tomado = models.BooleanField(default=False, db_column='cupo_tomado')
 
     class Meta:
         db_table = 'matricula'
@@ -78,12 +212,50 @@ class Documento(models.Model):
         return f"Documento {self.id_doc}"
 
 
+# Documentos obligatorios para solicitar matrícula (visa_extr_doc es opcional)
+DOCUMENTOS_REQUERIDOS = [
+    'reg_civil_doc', 'doc_idn_acu', 'doc_idn_alum', 'cnt_vac_doc',
+    'adres_doc', 'fot_alum_doc', 'cer_med_disca_doc', 'cer_esc_doc',
+]
+
+
+class ChecklistDocumento(models.Model):
+    """Estado de cada documento obligatorio de un estudiante (una fila por tipo).
+
+    Se mantiene desde `school.documentos.sincronizar_documentos` al guardar un
+    `Documento` o la foto del estudiante; el resumen queda además en
+    `Estudiante.doc_comp_est` / `Estudiante.doc_falt_est`.
+    """
+    TIPO_CHOICES = [(t, t) for t in DOCUMENTOS_REQUERIDOS]
+    ESTADO_CHOICES = [
+        ('faltante', 'Faltante'),
+        ('entregado', 'Entregado'),
+    ]
+
+    id_chk = models.AutoField(primary_key=True, db_column='id_chk')
+    id_est = models.ForeignKey('people.Estudiante', db_column='id_est', on_delete=models.CASCADE, related_name='checklist_documentos')
+    tipo = models.CharField(max_length=30, choices=TIPO_CHOICES, db_column='tipo')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='faltante', db_column='estado')
+    id_doc = models.ForeignKey(Documento, db_column='id_doc', on_delete=models.SET_NULL, null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_column='updated_at')
+
+    class Meta:
+        db_table = 'checklist_documento'
+        constraints = [
+            models.UniqueConstraint(fields=['id_est', 'tipo'], name='checklist_doc_est_tipo_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.id_est_id} - {self.tipo}: {self.estado}"
+
+
 class MatriculaRequest(models.Model):
     STATUS_CHOICES = [
         ('pending', 'Pendiente'),
         ('accepted', 'Aceptada'),
         ('rejected', 'Rechazada'),
         ('needs_docs', 'Faltan documentos'),
+        ('waitlisted', 'En lista de espera'),
     ]
 
     id_req = models.AutoField(primary_key=True, db_column='id_req')
@@ -99,11 +271,85 @@ class MatriculaRequest(models.Model):
 
     class Meta:
         db_table = 'matricula_request'
+        indexes = [
+            # matricula_expire busca la próxima expiración pendiente con este índice
+            models.Index(fields=['estado', 'expires_at'], name='matricula_req_expira_idx'),
+        ]
+        constraints = [
+            # una sola solicitud activa (pendiente o en lista de espera) por estudiante e institución
+            models.UniqueConstraint(
+                fields=['id_est', 'id_inst'],
+                condition=models.Q(estado__in=['pending', 'waitlisted']),
+                name='matricula_req_activa_uniq',
+            ),
+        ]
 
     def __str__(self):
         return f"Solicitud {self.id_req} - {self.id_inst} - {self.id_est}"
 
 
+class ListaEspera(models.Model):
+    """Lista de espera por institución y grado para solicitudes sin cupo.
+
+    `posicion` es un turno estable (no se renumera): el puesto actual se obtiene
+    contando las entradas en espera con turno menor, lo que resuelve el índice
+    (id_inst, grado, estado, posicion) sin recorrer la tabla.
+    """
+    ESTADO_CHOICES = [
+        ('waiting', 'En espera'),
+        ('promoted', 'Promovida'),
+        ('closed', 'Cerrada'),
+    ]
+
+    id_esp = models.AutoField(primary_key=True, db_column='id_esp')
+    id_req = models.OneToOneField(MatriculaRequest, db_column='id_req', on_delete=models.CASCADE, related_name='lista_espera')
+    id_inst = models.ForeignKey(Institucion, db_column='id_inst', on_delete=models.CASCADE)
+    grado = models.IntegerField(db_column='grado')
+    posicion = models.IntegerField(db_column='posicion')
+    estado = models.CharField(max_length=20, choices=ESTADO_CHOICES, default='waiting', db_column='estado')
+    created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
+
+    class Meta:
+        db_table = 'lista_espera'
+        constraints = [
+            models.UniqueConstraint(fields=['id_inst', 'grado', 'posicion'], name='lista_espera_turno_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['id_inst', 'grado', 'estado', 'posicion'], name='lista_espera_cola_idx'),
+        ]
+
+    def __str__(self):
+        return f"Espera {self.id_inst_id}/{self.grado} #{self.posicion} - solicitud {self.id_req_id}"
+
+
+class ClaveIdempotencia(models.Model):
+    """Respuesta guardada de una petición POST con cabecera `Idempotency-Key`.
+
+    La fila se inserta antes de ejecutar la vista (sin respuesta) y se completa
+    al terminar; un reintento con la misma clave recibe la respuesta original.
+    Ver `school.idempotency.idempotent`.
+    """
+    id_cla = models.AutoField(primary_key=True, db_column='id_cla')
+    clave = models.CharField(max_length=64, db_column='clave')
+    ambito = models.CharField(max_length=64, db_column='ambito')
+    ruta = models.CharField(max_length=200, db_column='ruta')
+    estado_http = models.PositiveSmallIntegerField(null=True, blank=True, db_column='estado_http')
+    respuesta = models.JSONField(null=True, blank=True, db_column='respuesta')
+    created_at = models.DateTimeField(auto_now_add=True, db_column='created_at')
+
+    class Meta:
+        db_table = 'clave_idempotencia'
+        constraints = [
+            models.UniqueConstraint(fields=['ambito', 'ruta', 'clave'], name='clave_idempotencia_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['created_at'], name='clave_idempotencia_fecha_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ruta} [{self.clave}]"
+
+
 class Notificacion(models.Model):
     """Notificaciones internas para administrativos e interfaces.
 
@@ -0,0 +1,117 @@
+"""Búsqueda de instituciones por relevancia.
+
+El índice cubre nombre, municipio, departamento, dirección, código DANE,
+teléfono y correo:
+
+* Postgres: índice GIN sobre `to_tsvector('simple', search_doc)` y, si la
+  extensión pg_trgm está disponible, otro trigram para tolerar errores de
+  digitación. `search_doc` es el texto ya normalizado (sin tildes, en
+  minúsculas) que `Institucion.save()` mantiene al día.
+* SQLite: tabla FTS5 `institucion_fts` sobre las columnas de `institucion`,
+  sincronizada con triggers.
+
+Ambos se crean en la migración 0018. Si no existen (SQLite sin FTS5, tabla
+reconstruida por una migración posterior) se busca con LIKE sobre
+`search_doc`, sin ranking.
+"""
+import re
+
+from django.db import connection
+
+from utils.texto import normalizar_texto
+
+from .models import Institucion
+
+_estado_indice = {}
+
+
+def tokens_busqueda(q):
+    """Palabras normalizadas de la consulta: 'Colegio  San José' -> ['colegio', 'san', 'jose']."""
+    return re.findall(r'\w+', normalizar_texto(q))
+
+
+def _pg_trgm_disponible():
+    if 'pg_trgm' not in _estado_indice:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _estado_indice['pg_trgm'] = cursor.fetchone() is not None
+    return _estado_indice['pg_trgm']
+
+
+def _sqlite_fts_disponible():
+    if 'fts5' not in _estado_indice:
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT count(*) FROM sqlite_master WHERE name IN "
+                "('institucion_fts', 'institucion_fts_ai', 'institucion_fts_ad', 'institucion_fts_au')"
+            )
+            _estado_indice['fts5'] = cursor.fetchone()[0] == 4
+    return _estado_indice['fts5']
+
+
+_CON_CURSOS = 'EXISTS (SELECT 1 FROM disponibilidad_cupos d WHERE d.id_inst = i.id_inst)'
+
+
+def _buscar_postgres(q, tokens, limit, solo_con_cursos):
+    tsquery = ' & '.join(f'{t}:*' for t in tokens)
+    texto = ' '.join(tokens)
+    # el nombre va al inicio de search_doc: coincidir desde el principio pesa más
+    rank = "ts_rank(to_tsvector('simple', i.search_doc), to_tsquery('simple', %s)) + (i.search_doc LIKE %s)::int"
+    rank_params = [tsquery, texto + '%']
+    where = "to_tsvector('simple', i.search_doc) @@ to_tsquery('simple', %s)"
+    where_params = [tsquery]
+    if _pg_trgm_disponible():
+        rank += ' + word_similarity(%s, i.search_doc)'
+        rank_params.append(texto)
+        where = f'({where} OR %s <%% i.search_doc)'
+        where_params.append(texto)
+    if solo_con_cursos:
+        where += ' AND ' + _CON_CURSOS
+    sql = (
+        f'SELECT i.id_inst FROM institucion i WHERE {where} '
+        f'ORDER BY {rank} DESC, i.nom_inst LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, where_params + rank_params + [limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _buscar_sqlite(q, tokens, limit, solo_con_cursos):
+    match = ' '.join(f'"{t}"*' for t in tokens)
+    where = 'institucion_fts MATCH %s'
+    if solo_con_cursos:
+        where += ' AND ' + _CON_CURSOS
+    # pesos bm25 en el orden de las columnas: nombre, municipio, departamento, dirección, DANE, teléfono, correo
+    sql = (
+        'SELECT i.id_inst FROM institucion_fts JOIN institucion i ON i.id_inst = institucion_fts.rowid '
+        f'WHERE {where} ORDER BY bm25(institucion_fts, 10.0, 4.0, 3.0, 2.0, 2.0, 1.0, 1.0), i.nom_inst LIMIT %s'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [match, limit])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def _buscar_like(q, tokens, limit, solo_con_cursos):
+    qs = Institucion.objects.all()
+    for t in tokens:
+        qs = qs.filter(search_doc__contains=t)
+    if solo_con_cursos:
+        qs = qs.filter(disponibilidad__isnull=False).distinct()
+    return list(qs.order_by('nom_inst').values_list('pk', flat=True)[:limit])
+
+
+def buscar_instituciones(q, limit=30, solo_con_cursos=True):
+    """Ids de las instituciones que coinciden con `q`, de más a menos relevante.
+
+    Cada palabra de la consulta debe aparecer (como prefijo) en alguno de los
+    campos indexados. Con `solo_con_cursos` se omiten las instituciones que no
+    tienen cursos.
+    """
+    tokens = tokens_busqueda(q)
+    if not tokens:
+        return []
+    if connection.vendor == 'postgresql':
+        return _buscar_postgres(q, tokens, limit, solo_con_cursos)
+    if connection.vendor == 'sqlite' and _sqlite_fts_disponible():
+        return _buscar_sqlite(q, tokens, limit, solo_con_cursos)
+    return _buscar_like(q, tokens, limit, solo_con_cursos)
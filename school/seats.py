@@ -0,0 +1,166 @@
+"""Reserva de cupos en cursos.
+
+Toda la aceptación de solicitudes de matrícula pasa por aquí para que el
+descuento de `Curso.cup_disp_cur` ocurra en la base de datos (UPDATE
+condicional) y no en Python, dentro de la misma transacción que crea la
+`Matricula`. Así dos administrativos aceptando a la vez no pueden sobrevender
+cupos, y como solo se bloquea la fila del curso que se toma (y la de la
+solicitud), el resto de cursos de la institución sigue disponible.
+"""
+import random
+
+from django.db import connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Curso, Matricula, MatriculaRequest
+
+
+class SeatReservationError(Exception):
+    """Error base de la reserva de cupos."""
+
+
+class NoSeatAvailable(SeatReservationError):
+    """No quedan cupos en ningún curso candidato."""
+
+
+class RequestNotAcceptable(SeatReservationError):
+    """La solicitud ya no está pendiente ni en lista de espera (aceptada, rechazada o expirada)."""
+
+
+class RequestAlreadyAccepted(RequestNotAcceptable):
+    """La solicitud ya fue aceptada (p. ej. por otro administrativo)."""
+
+
+# estados desde los que una solicitud puede aceptarse
+ACCEPTABLE_STATES = ('pending', 'waitlisted')
+# est_mat de una matrícula anulada: devuelve su cupo (ver school.signals)
+MATRICULA_CANCELADA = 'cancelado'
+
+
+def _try_take_seat(curso_id):
+    """Descuenta un cupo del curso solo si aún tiene cupos. Devuelve True si lo tomó."""
+    return Curso.objects.filter(pk=curso_id, cup_disp_cur__gt=0).update(
+        cup_disp_cur=F('cup_disp_cur') - 1
+    ) == 1
+
+
+def _candidate_ids(req, any_grade_fallback=False):
+    """Cursos candidatos para la solicitud, en el orden en que se intentarán.
+
+    Primero el curso pedido explícitamente (flujo antiguo), luego los cursos
+    del grado solicitado en orden aleatorio y, opcionalmente, cualquier curso
+    de la institución con cupo.
+    """
+    ordered = []
+    if req.id_cur_id:
+        ordered.append(req.id_cur_id)
+    base = Curso.objects.filter(id_inst=req.id_inst_id, cup_disp_cur__gt=0)
+    if req.grado_solicitado:
+        grade_ids = list(base.filter(num_grd_cur=int(req.grado_solicitado)).values_list('pk', flat=True))
+        random.shuffle(grade_ids)
+        ordered.extend(grade_ids)
+    if any_grade_fallback:
+        other_ids = list(base.values_list('pk', flat=True))
+        random.shuffle(other_ids)
+        ordered.extend(other_ids)
+    seen = set()
+    return [pk for pk in ordered if not (pk in seen or seen.add(pk))]
+
+
+def claim_seat(req, any_grade_fallback=False):
+    """Toma un cupo para la solicitud y devuelve el `Curso`, o None si no hay.
+
+    Debe llamarse dentro de una transacción: si ésta se revierte el cupo vuelve
+    a quedar libre.
+    """
+    for curso_id in _candidate_ids(req, any_grade_fallback=any_grade_fallback):
+        if _try_take_seat(curso_id):
+            return Curso.objects.select_related('id_inst').get(pk=curso_id)
+    return None
+
+
+def release_seat(curso_id):
+    """Devuelve un cupo al curso sin pasar de su capacidad (`cap_cur`). Devuelve True si lo devolvió."""
+    if not curso_id:
+        return False
+    return Curso.objects.filter(
+        Q(cap_cur__isnull=True) | Q(cup_disp_cur__lt=F('cap_cur')), pk=curso_id,
+    ).update(cup_disp_cur=F('cup_disp_cur') + 1) == 1
+
+
+def release_enrollment_seat(matricula_id, curso_id):
+    """Devuelve el cupo que tomó la matrícula, una sola vez: desmarca `cupo_tomado` con un UPDATE condicional.
+
+    Devuelve False si la matrícula no tenía cupo tomado (creada sin curso o a
+    mano, o ya devuelto).
+    """
+    with transaction.atomic():
+        if Matricula.objects.filter(pk=matricula_id, cupo_tomado=True).update(cupo_tomado=False) != 1:
+            return False
+        release_seat(curso_id)
+    return True
+
+
+def take_enrollment_seat(matricula_id, curso_id):
+    """Toma un cupo de `curso_id` para una matrícula existente (p. ej. al cambiarla de curso)."""
+    with transaction.atomic():
+        if not _try_take_seat(curso_id):
+            return False
+        Matricula.objects.filter(pk=matricula_id).update(cupo_tomado=True)
+    return True
+
+
+def accept_request(req_id, comment='', any_grade_fallback=False, allow_unassigned=False):
+    """Acepta una solicitud de matrícula reservando cupo de forma atómica.
+
+    En una sola transacción: bloquea la solicitud, descuenta el cupo con un
+    UPDATE condicional, crea la `Matricula` y marca la solicitud como aceptada.
+
+    :param any_grade_fallback: si no hay cupo en el grado solicitado, probar
+        cualquier curso de la institución.
+    :param allow_unassigned: si no hay cupo, aceptar igualmente y crear la
+        matrícula sin curso (comportamiento del panel de administración).
+    :returns: tupla (matricula, curso) donde curso puede ser None.
+    :raises RequestAlreadyAccepted: si la solicitud ya estaba aceptada.
+    :raises RequestNotAcceptable: si estaba rechazada o expirada.
+    :raises NoSeatAvailable: si no hay cupo y `allow_unassigned` es False.
+    """
+    with transaction.atomic():
+        if connection.vendor == 'sqlite':
+            # SQLite ignora select_for_update: una transacción que lee y luego escribe falla con
+            # "database is locked" (sin esperar `timeout`) si otra escribió entretanto. Escribir
+            # primero la propia solicitud, sin cambiarla, toma el bloqueo como un BEGIN IMMEDIATE
+            # solo para esta transacción.
+            MatriculaRequest.objects.filter(pk=req_id).update(estado=F('estado'))
+        req = (
+            MatriculaRequest.objects
+            .select_for_update(of=('self',))
+            .select_related('id_inst', 'id_est')
+            .get(pk=req_id)
+        )
+        if req.estado == 'accepted':
+            raise RequestAlreadyAccepted(f'La solicitud {req_id} ya fue aceptada')
+        if req.estado not in ACCEPTABLE_STATES:
+            raise RequestNotAcceptable(f'La solicitud {req_id} está en estado {req.estado}')
+
+        curso = claim_seat(req, any_grade_fallback=any_grade_fallback)
+        if curso is None and not allow_unassigned:
+            raise NoSeatAvailable(f'No hay cupos disponibles para la solicitud {req_id}')
+
+        mat = Matricula.objects.create(
+            fch_reg_mat=timezone.now().date(),
+            id_est=req.id_est,
+            id_cur=curso,
+            grado_solicitado=req.grado_solicitado,
+            est_mat='activo',
+            obs_mat=comment or '',
+            cupo_tomado=curso is not None,
+        )
+        if curso is not None:
+            req.id_cur = curso
+        req.estado = 'accepted'
+        if comment:
+            req.obs = (req.obs or '') + '\n' + comment
+        req.save(update_fields=['id_cur', 'estado', 'obs'])
+    return mat, curso
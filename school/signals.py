@@ -0,0 +1,160 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from people.models import Estudiante
+
+from .catalog import marcar_cambio_catalogo
+from .disponibilidad import refrescar_cursos, refrescar_disponibilidad
+from .documentos import sincronizar_documentos
+from .matricula_actual import refrescar_matricula_actual
+from .models import Curso, Documento, Institucion, Matricula, MatriculaRequest, ListaEspera
+from .seats import MATRICULA_CANCELADA, release_enrollment_seat, release_seat, take_enrollment_seat
+from .waitlist import schedule_promotion
+
+
+@receiver(post_save, sender=Institucion)
+@receiver(post_delete, sender=Institucion)
+def institucion_cambiada(sender, instance, **kwargs):
+    """Nombre, dirección o imagen cambian lo que devuelve la búsqueda."""
+    marcar_cambio_catalogo()
+
+
+@receiver(pre_save, sender=Curso)
+def curso_pre_save(sender, instance, **kwargs):
+    """Recordar institución y grado anteriores para recalcular también su disponibilidad."""
+    instance._disponibilidad_anterior = None
+    if not instance._state.adding and instance.pk:
+        instance._disponibilidad_anterior = (
+            Curso.objects.filter(pk=instance.pk).values_list('id_inst_id', 'num_grd_cur').first()
+        )
+
+
+@receiver(post_save, sender=Curso)
+def curso_post_save(sender, instance, created, **kwargs):
+    """Un curso nuevo o editado puede tener cupos: atender la lista de espera de su grado."""
+    if not created:
+        # si el curso cambió de institución, el puntero de sus estudiantes también
+        Estudiante.objects.filter(id_cur_act=instance.pk).exclude(id_inst_act=instance.id_inst_id).update(id_inst_act=instance.id_inst_id)
+    anterior = getattr(instance, '_disponibilidad_anterior', None)
+    if anterior and anterior != (instance.id_inst_id, instance.num_grd_cur):
+        refrescar_disponibilidad(anterior[0], [anterior[1]])
+    refrescar_disponibilidad(instance.id_inst_id, [instance.num_grd_cur])
+    if instance.cup_disp_cur > 0:
+        schedule_promotion(instance.id_inst_id, instance.num_grd_cur)
+
+
+@receiver(post_delete, sender=Curso)
+def curso_post_delete(sender, instance, **kwargs):
+    refrescar_disponibilidad(instance.id_inst_id, [instance.num_grd_cur])
+
+
+@receiver(pre_save, sender=Matricula)
+def matricula_pre_save(sender, instance, **kwargs):
+    instance._anterior = None
+    if not instance._state.adding and instance.pk:
+        instance._anterior = (
+            Matricula.objects.filter(pk=instance.pk).values('id_cur_id', 'est_mat', 'cupo_tomado').first()
+        )
+        if instance._anterior is not None:
+            # `cupo_tomado` solo lo cambia school.seats: un save() con la instancia vieja no lo pisa
+            instance.cupo_tomado = instance._anterior['cupo_tomado']
+
+
+def _promover(curso_id):
+    curso = Curso.objects.filter(pk=curso_id).values('id_inst_id', 'num_grd_cur').first()
+    if curso:
+        refrescar_disponibilidad(curso['id_inst_id'], [curso['num_grd_cur']])
+        schedule_promotion(curso['id_inst_id'], curso['num_grd_cur'])
+
+
+@receiver(post_save, sender=Matricula)
+def matricula_post_save(sender, instance, **kwargs):
+    """Mantener la matrícula vigente del estudiante (y del anterior si cambió de estudiante).
+
+    Si la matrícula que ocupaba un cupo se anula (`est_mat` = cancelado) o
+    cambia de curso, el cupo vuelve a su curso; al cambiar de curso toma uno
+    del nuevo si lo hay.
+    """
+    anterior = getattr(instance, '_anterior', None) or {}
+    curso_anterior = anterior.get('id_cur_id')
+    est_ids = [instance.id_est_id]
+    est_ids.extend(
+        Estudiante.objects.filter(id_mat_act=instance.pk).exclude(pk=instance.id_est_id).values_list('pk', flat=True)
+    )
+    refrescar_matricula_actual(est_ids)
+
+    liberado = None
+    if anterior.get('cupo_tomado'):
+        anulada = instance.est_mat == MATRICULA_CANCELADA and anterior.get('est_mat') != MATRICULA_CANCELADA
+        if anulada or instance.id_cur_id != curso_anterior:
+            if release_enrollment_seat(instance.pk, curso_anterior):
+                instance.cupo_tomado = False
+                liberado = curso_anterior
+            if not anulada and instance.id_cur_id and instance.est_mat != MATRICULA_CANCELADA:
+                instance.cupo_tomado = take_enrollment_seat(instance.pk, instance.id_cur_id)
+    refrescar_cursos({instance.id_cur_id, curso_anterior})
+    if liberado:
+        _promover(liberado)
+
+
+@receiver(pre_delete, sender=Matricula)
+def matricula_pre_delete(sender, instance, **kwargs):
+    # leído de la BD (la instancia puede estar vieja); si el borrado se revierte, el UPDATE también
+    instance._devolver_cupo = bool(instance.id_cur_id) and (
+        Matricula.objects.filter(pk=instance.pk, cupo_tomado=True).update(cupo_tomado=False) == 1
+    )
+
+
+@receiver(post_delete, sender=Matricula)
+def matricula_post_delete(sender, instance, **kwargs):
+    """Al borrar una matrícula que ocupaba cupo se libera y se atiende la lista de espera.
+
+    Las que no tomaron cupo (creadas sin curso o a mano) no devuelven nada.
+    """
+    refrescar_matricula_actual([instance.id_est_id])
+    if not getattr(instance, '_devolver_cupo', False):
+        if instance.id_cur_id:
+            refrescar_cursos({instance.id_cur_id})
+        return
+    release_seat(instance.id_cur_id)
+    _promover(instance.id_cur_id)
+
+
+@receiver(post_save, sender=MatriculaRequest)
+def matricula_request_post_save(sender, instance, created, **kwargs):
+    """Si una solicitud en espera se resuelve por otra vía, sale de la fila."""
+    if created or instance.estado == 'waitlisted':
+        return
+    ListaEspera.objects.filter(id_req_id=instance.pk, estado='waiting').update(estado='closed')
+
+
+def _estudiante_de_documento(doc):
+    if doc.id_est_id:
+        return doc.id_est_id
+    if doc.id_mat_id:
+        return Matricula.objects.filter(pk=doc.id_mat_id).values_list('id_est_id', flat=True).first()
+    return None
+
+
+@receiver(post_save, sender=Documento)
+def documento_post_save(sender, instance, **kwargs):
+    """Mantener el checklist de documentos del estudiante al subir o editar documentos."""
+    est_id = _estudiante_de_documento(instance)
+    if est_id:
+        sincronizar_documentos(est_id)
+
+
+@receiver(post_delete, sender=Documento)
+def documento_post_delete(sender, instance, **kwargs):
+    # tras el commit: si el borrado viene en cascada desde el estudiante, ya no hay nada que sincronizar
+    est_id = instance.id_est_id
+    if est_id:
+        transaction.on_commit(lambda: sincronizar_documentos(est_id))
+
+
+@receiver(post_save, sender=Estudiante)
+def estudiante_post_save(sender, instance, created, update_fields=None, **kwargs):
+    """La foto de perfil cubre `fot_alum_doc`; un estudiante nuevo arranca con su checklist."""
+    if created or update_fields is None or 'foto_perfil' in update_fields:
+        sincronizar_documentos(instance.pk)
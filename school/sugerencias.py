@@ -0,0 +1,94 @@
+"""Bolsa precalculada de instituciones sugeridas para el panel del acudiente.
+
+Solo entran las instituciones con cupos libres, agrupadas por grado con cupo
+y por celda de `TAMANO_CELDA` grados de latitud/longitud. Una muestra elige
+entre un número fijo de grupos (las 9 celdas alrededor del acudiente, los
+grados que necesitan sus estudiantes y la bolsa completa), según su peso, y
+dentro de cada uno al azar, así que no depende de cuántas instituciones haya.
+"""
+import math
+import random
+
+from .cercania import distancia_km
+
+TAMANO_CELDA = 0.25  # grados, unos 28 km
+# peso relativo de cada grupo: cerca y con el grado > cerca > con el grado > cualquiera
+PESOS = {'cerca_grado': 8, 'cerca': 4, 'grado': 2, 'todas': 1}
+
+
+def celda(lat, lon):
+    return (math.floor(lat / TAMANO_CELDA), math.floor(lon / TAMANO_CELDA))
+
+
+class PoolSugerencias:
+    """Grupos inmutables de claves con cupo: todas, por grado, por celda y por (celda, grado)."""
+
+    __slots__ = ('todas', 'por_grado', 'por_celda', 'por_celda_grado', 'ubicacion')
+
+    def __init__(self, instituciones):
+        todas = []
+        por_grado = {}
+        por_celda = {}
+        por_celda_grado = {}
+        ubicacion = {}
+        for inst in instituciones:
+            grados = [g.grado for g in inst.grados if g.cupos_libres > 0]
+            if not grados:
+                continue
+            todas.append(inst)
+            for g in grados:
+                por_grado.setdefault(g, []).append(inst)
+            if inst.lat is None or inst.lon is None:
+                continue
+            c = celda(inst.lat, inst.lon)
+            ubicacion[inst.id_inst] = (inst.lat, inst.lon)
+            por_celda.setdefault(c, []).append(inst)
+            for g in grados:
+                por_celda_grado.setdefault((c, g), []).append(inst)
+        self.todas = tuple(todas)
+        self.por_grado = {k: tuple(v) for k, v in por_grado.items()}
+        self.por_celda = {k: tuple(v) for k, v in por_celda.items()}
+        self.por_celda_grado = {k: tuple(v) for k, v in por_celda_grado.items()}
+        self.ubicacion = ubicacion
+
+    def _grupos(self, lat, lon, grados):
+        grupos = []
+        if lat is not None and lon is not None:
+            ci, cj = celda(lat, lon)
+            vecinas = [(ci + di, cj + dj) for di in (-1, 0, 1) for dj in (-1, 0, 1)]
+            for c in vecinas:
+                for g in grados:
+                    grupos.append((PESOS['cerca_grado'], self.por_celda_grado.get((c, g), ())))
+                grupos.append((PESOS['cerca'], self.por_celda.get(c, ())))
+        for g in grados:
+            grupos.append((PESOS['grado'], self.por_grado.get(g, ())))
+        grupos.append((PESOS['todas'], self.todas))
+        return [(peso, grupo) for peso, grupo in grupos if grupo]
+
+    def muestra(self, n=6, lat=None, lon=None, grados=()):
+        """Hasta `n` instituciones distintas, sorteadas con preferencia por cercanía y grado.
+
+        El grupo se sortea solo por su peso (un grupo grande no gana por ser
+        grande: la bolsa completa pesaría tanto como los preferidos) y dentro
+        de él la institución, uniformemente; con ubicación se ordenan de la
+        más cercana a la más lejana.
+        """
+        grados = tuple(grados)[:5]
+        grupos = self._grupos(lat, lon, grados)
+        if not grupos:
+            return []
+        n = min(n, len(self.todas))
+        pesos = [peso for peso, _ in grupos]
+        elegidas = {}
+        # intentos acotados: los grupos se solapan y puede salir una repetida
+        for _ in range(8 * n):
+            if len(elegidas) >= n:
+                break
+            _, grupo = random.choices(grupos, weights=pesos)[0]
+            inst = random.choice(grupo)
+            elegidas.setdefault(inst.id_inst, inst)
+        resultado = list(elegidas.values())
+        if lat is not None and lon is not None:
+            lejos = float('inf')
+            resultado.sort(key=lambda i: distancia_km(lat, lon, *self.ubicacion[i.id_inst]) if i.id_inst in self.ubicacion else lejos)
+        return resultado
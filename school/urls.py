@@ -5,6 +5,10 @@ app_name = 'school'
 
 urlpatterns = [
     path('search/', views.institutions_search, name='institutions_search'),
+    path('autocomplete/', views.institutions_autocomplete, name='institutions_autocomplete'),
     path('request/create/', views.matricula_request_create, name='matricula_request_create'),
+    path('request/<int:req_id>/position/', views.matricula_request_position, name='matricula_request_position'),
     path('course/schedule/<int:course_id>/', views.course_schedule, name='course_schedule'),
+    path('institution/<int:inst_id>/availability/', views.institution_availability, name='institution_availability'),
+    path('availability/changes/', views.availability_changes, name='availability_changes'),
 ]
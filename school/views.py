@@ -1,56 +1,224 @@
 from django.http import JsonResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotAllowed
-from django.views.decorators.http import require_GET, require_POST
+from django.views.decorators.http import condition, require_GET, require_POST
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from .models import Institucion, Curso, MatriculaRequest, Documento, Matricula, Notificacion, Horario
+from .models import Institucion, Curso, MatriculaRequest, Notificacion, Horario
+from . import cambios, catalog, waitlist
+from .disponibilidad import cupos_libres, disponibilidad_por_institucion
+from .documentos import documentos_faltantes
+from .facetas import FACETAS
 from django.core.mail import send_mail
 from people.models import Estudiante, Acudiente
 from accounts.models import Registro
-from django.db.models import Q
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from .idempotency import idempotent
 import datetime
+import hashlib
+
+
+def _search_autenticado(request):
+    return request.user.is_authenticated or bool(request.session.get('registro_id'))
+
+
+def _search_version(request):
+    if not hasattr(request, '_version_catalogo'):
+        request._version_catalogo = catalog.version_para_cache()
+    return request._version_catalogo
+
+
+def _search_cacheable(request):
+    # sin sesión la vista responde 401 en lugar de un 304; la búsqueda por cercanía sin
+    # lat/lon usa la ubicación guardada del acudiente, que no forma parte de la versión
+    if not _search_autenticado(request):
+        return False
+    if request.GET.get('mode') == 'near' and not (request.GET.get('lat') and request.GET.get('lon')):
+        return False
+    return True
+
+
+def _search_etag(request):
+    if not _search_cacheable(request):
+        return None
+    version, _ = _search_version(request)
+    clave = f"{version}|{request.GET.urlencode()}"
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()[:20]
+
+
+def _search_last_modified(request):
+    if not _search_cacheable(request):
+        return None
+    return _search_version(request)[1]
+
+
+def _pagina_etag(request):
+    """ETag de la página de resultados: versión del catálogo más los cupos que muestra.
+
+    Los cupos se leen al responder, así que un cambio de cupos solo invalida
+    las páginas donde aparece esa institución.
+    """
+    if not _search_cacheable(request):
+        return None
+    try:
+        pagina = _search_pagina(request)
+    except Exception:
+        # la vista vuelve a intentarlo y responde el error
+        return None
+    if pagina is None:
+        return None
+    insts, _, facetas, cursos_map = pagina
+    version, _ = _search_version(request)
+    cupos = [(inst.id_inst, inst.grados) for inst in insts]
+    clave = f"{version}|{request.GET.urlencode()}|{cupos}|{facetas}|{cursos_map}"
+    return hashlib.sha1(clave.encode('utf-8')).hexdigest()[:20]
+
+
+def _float_param(request, nombre, defecto=None):
+    try:
+        return float(request.GET[nombre])
+    except (KeyError, TypeError, ValueError):
+        return defecto
+
+
+def _filtros_faceta(request):
+    """{faceta: [valores]} de los parámetros dep, mun, tip y grado (repetibles)."""
+    filtros = {}
+    for faceta in FACETAS:
+        valores = [v.strip() for v in request.GET.getlist(faceta) if v.strip()]
+        if faceta == 'grado':
+            valores = [int(v) for v in valores if v.isdigit()]
+        if valores:
+            filtros[faceta] = valores
+    return filtros
+
+
+def _ubicacion_acudiente(request):
+    reg_id = request.session.get('registro_id')
+    if not reg_id:
+        return None, None
+    fila = Acudiente.objects.filter(id_usu_id=reg_id).values_list('lat_acu', 'lon_acu').first()
+    if not fila or fila[0] is None or fila[1] is None:
+        return None, None
+    return float(fila[0]), float(fila[1])
+
+
+def _search_pagina(request):
+    """(instituciones, distancias, facetas, cursos) de la búsqueda, calculados una vez por petición.
+
+    None si `mode=near` no tiene ubicación válida. Lo usan el ETag y la vista.
+    """
+    if not hasattr(request, '_search_pagina'):
+        request._search_pagina = _buscar_pagina(request)
+    return request._search_pagina
+
+
+def _buscar_pagina(request):
+    distancias = None
+    facetas = None
+    if request.GET.get('mode') == 'near':
+        lat = _float_param(request, 'lat')
+        lon = _float_param(request, 'lon')
+        if lat is None or lon is None:
+            lat, lon = _ubicacion_acudiente(request)
+        if lat is None or lon is None or not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            return None
+        grado = _float_param(request, 'grado')
+        radio = min(_float_param(request, 'radio', 25.0), 500.0)
+        k = int(min(max(_float_param(request, 'k', 10), 1), 50))
+        # KD-tree del catálogo en memoria (ver school.cercania)
+        pares = catalog.cercanas(lat, lon, k=k, radio_km=radio, grado=int(grado) if grado else None)
+        insts = [inst for _, inst in pares]
+        distancias = {inst.id_inst: km for km, inst in pares}
+    else:
+        q = request.GET.get('q', '').strip()
+        filtros = _filtros_faceta(request)
+        if filtros or request.GET.get('facets') == '1':
+            insts, facetas = catalog.buscar_facetado(q, filtros, limit=30)
+        elif not q:
+            insts = []
+        else:
+            # ids del índice de texto completo, filas de la foto en memoria del
+            # catálogo si está activa (ver school.catalog y school.search)
+            insts = catalog.buscar(q, limit=30)
+
+    cursos_map = None
+    if request.GET.get('expand') == 'cursos':
+        cursos_map = {}
+        for cur in (
+            Curso.objects.filter(id_inst__in=[inst.id_inst for inst in insts])
+            .order_by('num_grd_cur', 'num_sec_cur', 'pk')
+            .values('id_cur', 'grd_cur', 'cup_disp_cur', 'id_inst_id', 'num_grd_cur')
+        ):
+            clave = (cur.pop('id_inst_id'), cur.pop('num_grd_cur'))
+            cursos_map.setdefault(clave, []).append(cur)
+    return insts, distancias, facetas, cursos_map
 
 
 @require_GET
+@condition(etag_func=_pagina_etag)
 def institutions_search(request):
+    """Búsqueda de instituciones para el typeahead del panel del acudiente.
+
+    Cada institución trae su resumen de cupos por grado; con `expand=cursos`
+    cada grado incluye además sus cursos.
+
+    Con `mode=near` devuelve las `k` instituciones más cercanas a `lat`/`lon`
+    (o a la ubicación guardada del acudiente) que tengan cupo en `grado`
+    (opcional) dentro de `radio` km, cada una con `distancia_km`. Con el
+    catálogo en memoria activo solo consulta los cupos vigentes de las
+    elegidas (y los cursos con `expand=cursos`); sin él, un número fijo de
+    consultas sin importar cuántos resultados haya.
+
+    Fuera de `mode=near` se puede filtrar por `dep`, `mun`, `tip` y `grado`
+    (grados con cupo), cada uno repetible, con o sin `q`; con `facets=1` la
+    respuesta trae también `facets`: {faceta: [[valor, instituciones], ...]}
+    calculado desde las facetas de la foto del catálogo (ver school.facetas).
+
+    La respuesta lleva un ETag de la versión del catálogo y de los cupos de
+    la página (ver `_pagina_etag`), así que el navegador revalida con
+    If-None-Match y recibe 304 si nada de lo que muestra cambió.
+    """
     try:
         # Evitar redirecciones a login (que devuelven HTML). Para peticiones AJAX
         # comprobamos la autenticación manualmente y devolvemos JSON 401 cuando
         # no haya credenciales, de modo que el frontend pueda manejarlo.
-        if not request.user.is_authenticated and not request.session.get('registro_id'):
+        if not _search_autenticado(request):
             return JsonResponse({'results': [], 'error': 'No autenticado'}, status=401)
 
-        q = request.GET.get('q', '').strip()
-        if not q:
-            return JsonResponse({'results': []})
-
-        qs = Institucion.objects.filter(
-            Q(nom_inst__icontains=q) |
-            Q(tel_inst__icontains=q) |
-            Q(ema_inst__icontains=q) |
-            Q(dire_inst__icontains=q)
-        ).filter(curso__isnull=False).distinct()[:30]
+        pagina = _search_pagina(request)
+        if pagina is None:
+            return JsonResponse({'results': [], 'error': 'Ubicación no disponible'}, status=400)
+        insts, distancias, facetas, cursos_map = pagina
+        con_facetas = request.GET.get('mode') != 'near' and request.GET.get('facets') == '1'
 
         results = []
-        for inst in qs:
-            cursos = []
-            for cur in inst.curso_set.all():
-                cursos.append({
-                    'id_cur': cur.id_cur,
-                    'grd_cur': cur.grd_cur,
-                    'cup_disp_cur': cur.cup_disp_cur,
-                })
+        for inst in insts:
+            grados = []
+            for g in inst.grados:
+                grado = g._asdict()
+                if cursos_map is not None:
+                    grado['cursos'] = cursos_map.get((inst.id_inst, g.grado), [])
+                grados.append(grado)
             results.append({
                 'id_inst': inst.id_inst,
                 'nom_inst': inst.nom_inst,
                 'dire_inst': inst.dire_inst,
                 'tel_inst': inst.tel_inst,
                 'ema_inst': inst.ema_inst,
-                'img': inst.img_inst.url if inst.img_inst else None,
-                'cursos': cursos,
+                'img': inst.img,
+                'grados': grados,
             })
-
-        return JsonResponse({'results': results})
+            if distancias is not None:
+                results[-1]['distancia_km'] = round(distancias[inst.id_inst], 1)
+
+        data = {'results': results}
+        if con_facetas:
+            data['facets'] = facetas
+        response = JsonResponse(data)
+        # privada (depende de la sesión) y siempre revalidada contra el ETag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
     except Exception as e:
         try:
             import logging
@@ -60,6 +228,25 @@ def institutions_search(request):
         return JsonResponse({'results': [], 'error': 'Error interno', 'detail': str(e)}, status=500)
 
 
+@require_GET
+@condition(etag_func=_search_etag, last_modified_func=_search_last_modified)
+def institutions_autocomplete(request):
+    """Sugerencias de nombre de institución mientras el acudiente escribe.
+
+    Respuesta: {results: [{id_inst, nom_inst}]} con hasta `n` (máx. 20)
+    nombres que coinciden por prefijo. Sale del índice de prefijos del
+    catálogo en memoria; la búsqueda completa se pide solo al confirmar.
+    """
+    if not _search_autenticado(request):
+        return JsonResponse({'results': [], 'error': 'No autenticado'}, status=401)
+    q = request.GET.get('q', '').strip()
+    n = int(min(max(_float_param(request, 'n', 8), 1), 20))
+    results = [{'id_inst': pk, 'nom_inst': nombre} for pk, nombre in catalog.autocompletar(q, n=n)] if q else []
+    response = JsonResponse({'results': results})
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 @require_GET
 def course_schedule(request, course_id):
     """Devuelve el horario (JSON) para un curso específico.
@@ -125,6 +312,7 @@ def course_schedule(request, course_id):
 
 
 @require_POST
+@idempotent
 def matricula_request_create(request):
     # envolver toda la lógica en try/except para devolver siempre JSON legible al frontend
     try:
@@ -160,7 +348,7 @@ def matricula_request_create(request):
             acudiente = Acudiente.objects.filter(id_usu=request.user).first()
 
         # Si todavía no hay acudiente, esperaremos a cargar el estudiante y usaremos su acudiente (si coincide con la sesión)
-        est = get_object_or_404(Estudiante, pk=est_id)
+        est = get_object_or_404(Estudiante.objects.select_related('id_inst_act'), pk=est_id)
         if not acudiente:
             if hasattr(est, 'id_acu') and est.id_acu:
                 # si tenemos un registro en sesión, asegurarnos de que coincide
@@ -187,13 +375,9 @@ def matricula_request_create(request):
                 return JsonResponse({'status': 'error', 'error': 'Curso no pertenece a la institución'}, status=400)
 
         # comprobar si el estudiante ya tiene una matrícula registrada
-        existing_mat = Matricula.objects.filter(id_est=est).order_by('-fch_reg_mat').first()
-        if existing_mat:
-            existing_inst = None
-            try:
-                existing_inst = getattr(existing_mat.id_cur, 'id_inst', None)
-            except Exception:
-                existing_inst = None
+        # (matrícula vigente mantenida en el propio estudiante, ver school.matricula_actual)
+        if est.id_mat_act_id:
+            existing_inst = est.id_inst_act
             # Si ya está en la misma institución, no crear nueva solicitud; rechazar explícitamente
             if existing_inst and existing_inst == inst:
                 req = MatriculaRequest.objects.create(
@@ -224,53 +408,13 @@ def matricula_request_create(request):
                     'message': f'El estudiante ya está matriculado en {nombre_inst}. Solicite un traslado.'
                 }, status=200)
 
-        # Validación de documentos: combinar todos los Documento vinculados al estudiante
-        # (por id_est y por la última matrícula) y verificar que entre todos están los campos requeridos.
-        required_doc_fields = [
-            'reg_civil_doc', 'doc_idn_acu', 'doc_idn_alum', 'cnt_vac_doc',
-            'adres_doc', 'fot_alum_doc', 'cer_med_disca_doc', 'cer_esc_doc'
-        ]
-
-        # recolectar documentos relacionados
-        try:
-            docs_qs = Documento.objects.filter(id_est=est)
-            last_mat = Matricula.objects.filter(id_est=est).order_by('-fch_reg_mat').first()
-            if last_mat:
-                docs_qs = docs_qs | Documento.objects.filter(id_mat=last_mat)
-            docs = list(docs_qs)
-        except Exception:
-            docs = []
-
-        missing = []
-        for f in required_doc_fields:
-            has = False
-            # si alguno de los documentos tiene el campo, lo consideramos presente
-            for d in docs:
-                val = getattr(d, f, None)
-                if val:
-                    has = True
-                    break
-            # fallback: la foto del estudiante puede cubrir fot_alum_doc
-            if f == 'fot_alum_doc' and est.foto_perfil:
-                has = True
-            # fallback adicional: aceptar la dirección escrita en el acudiente o en documento.adres_doc
-            if f == 'adres_doc' and not has:
-                try:
-                    # si el acudiente tiene dir_acu configurada, la aceptamos como dirección
-                    if getattr(est, 'id_acu', None) and getattr(est.id_acu, 'dir_acu', None):
-                        has = True
-                except Exception:
-                    pass
-            if not has:
-                missing.append(f)
+        # Validación de documentos: resumen materializado en el estudiante (ver school.documentos);
+        # la dirección escrita del acudiente también cubre adres_doc
+        missing = documentos_faltantes(est, getattr(acudiente, 'dir_acu', None))
 
         if missing:
             return JsonResponse({'status': 'error', 'error': 'Faltan documentos del estudiante', 'missing': missing}, status=400)
 
-        # si se envió curso explícito, comprobar cupo ahora
-        if db_cur and db_cur.cup_disp_cur <= 0:
-            return JsonResponse({'status': 'error', 'error': 'No hay cupos disponibles en el curso seleccionado'}, status=400)
-
         # crear solicitud: guardamos el grado solicitado (si fue enviado)
         expires = timezone.now() + datetime.timedelta(hours=24)
         grado_int = None
@@ -280,23 +424,41 @@ def matricula_request_create(request):
         except Exception:
             grado_int = None
 
-        # evitar solicitudes duplicadas pendientes para el mismo estudiante e institución
+        # sin cupo en el curso elegido o en el grado solicitado: la solicitud va a la lista de espera
+        # en vez de rechazarse, para que la familia no tenga que reintentar
+        grado_espera = grado_int if grado_int else (db_cur.num_grd_cur if db_cur else None)
+        full = False
+        libres = cupos_libres(inst.id_inst, grado_espera) if grado_espera else None
+        if db_cur:
+            full = db_cur.cup_disp_cur <= 0 and not libres
+        elif grado_int:
+            # None: la institución no ofrece el grado; no hay fila a la que esperar
+            full = libres == 0
+
+        # la restricción matricula_req_activa_uniq impide una segunda solicitud activa
+        # (pendiente o en lista de espera) para el mismo estudiante e institución
         try:
-            exists = MatriculaRequest.objects.filter(id_est=est, id_inst=inst, estado='pending').exists()
-        except Exception:
-            exists = False
-        if exists:
+            with transaction.atomic():
+                req = MatriculaRequest.objects.create(
+                    id_acu=acudiente,
+                    id_est=est,
+                    id_inst=inst,
+                    id_cur=db_cur,
+                    grado_solicitado=grado_int,
+                    estado='pending',
+                    expires_at=expires,
+                )
+        except IntegrityError:
             return JsonResponse({'status': 'error', 'error': 'Ya existe una solicitud pendiente para esta institución'}, status=400)
 
-        req = MatriculaRequest.objects.create(
-            id_acu=acudiente,
-            id_est=est,
-            id_inst=inst,
-            id_cur=db_cur,
-            grado_solicitado=grado_int,
-            estado='pending',
-            expires_at=expires,
-        )
+        if full and grado_espera:
+            waitlist.enqueue(req, grado=grado_espera)
+            return JsonResponse({
+                'status': 'waitlisted',
+                'request_id': req.id_req,
+                'position': waitlist.position(req.id_req),
+                'message': 'No hay cupos disponibles por ahora. La solicitud quedó en lista de espera y se asignará automáticamente cuando se libere un cupo.',
+            })
 
         # enviar confirmación al acudiente de que su solicitud fue recibida
         try:
@@ -367,3 +529,75 @@ def matricula_request_create(request):
         except Exception:
             pass
         return JsonResponse({'status': 'error', 'error': 'Error interno al procesar la solicitud', 'detail': str(e)}, status=500)
+
+
+@require_GET
+def matricula_request_position(request, req_id):
+    """Estado y puesto en la lista de espera de una solicitud del acudiente autenticado.
+
+    Pensado para consultarse desde el panel en lugar de volver a enviar la solicitud.
+    """
+    reg_id = request.session.get('registro_id')
+    if not reg_id:
+        return JsonResponse({'status': 'error', 'error': 'No autenticado'}, status=401)
+    req = (
+        MatriculaRequest.objects
+        .filter(pk=req_id, id_acu__id_usu_id=reg_id)
+        .values('id_req', 'estado')
+        .first()
+    )
+    if not req:
+        return JsonResponse({'status': 'error', 'error': 'Solicitud no encontrada'}, status=404)
+    data = {'request_id': req['id_req'], 'estado': req['estado'], 'position': None}
+    if req['estado'] == 'waitlisted':
+        data['position'] = waitlist.position(req['id_req'])
+    return JsonResponse(data)
+
+
+@require_GET
+def institution_availability(request, inst_id):
+    """Cupos por grado de una institución (resumen de `DisponibilidadCupos`).
+
+    Respuesta: {inst_id, grados: [{grado, cupos_total, cupos_libres, secciones, secciones_con_cupo}]}
+    """
+    if not request.user.is_authenticated and not request.session.get('registro_id'):
+        return JsonResponse({'status': 'error', 'error': 'No autenticado'}, status=401)
+    if not Institucion.objects.filter(pk=inst_id).exists():
+        return JsonResponse({'status': 'error', 'error': 'Institución no encontrada'}, status=404)
+    grados = disponibilidad_por_institucion([inst_id]).get(inst_id, [])
+    return JsonResponse({'inst_id': inst_id, 'grados': grados})
+
+
+@require_GET
+def availability_changes(request):
+    """Cambios de cupos de las instituciones en pantalla, sin esperar.
+
+    `?inst=1,2,3` (hasta 60) y `desde` (el `ultimo` de la respuesta anterior).
+    Responde {cambios, ultimo, sondeo}: cada cambio trae {id_inst, grado,
+    cupos_total, cupos_libres, secciones_con_cupo} con los valores nuevos del
+    grado, y el panel vuelve a preguntar con `desde=ultimo` tras `sondeo`
+    segundos. Sin `desde` solo da el punto de partida. Una consulta por rango
+    de id (ver school.cambios): la petición no retiene el hilo del worker.
+    """
+    if not _search_autenticado(request):
+        return JsonResponse({'status': 'error', 'error': 'No autenticado'}, status=401)
+    inst_ids = {int(v) for v in request.GET.get('inst', '').split(',') if v.strip().isdigit()}
+    if not inst_ids or len(inst_ids) > 60:
+        return JsonResponse({'status': 'error', 'error': 'Indica entre 1 y 60 instituciones'}, status=400)
+    desde = request.GET.get('desde', '')
+    # el tope se lee antes: un cambio que se confirme entretanto queda para el siguiente sondeo
+    ultimo = cambios.ultimo_id()
+    lista = []
+    if desde.isdigit() and int(desde) < ultimo:
+        lista = cambios.cambios_desde(int(desde), inst_ids, hasta=ultimo)
+        if len(lista) == cambios.MAX_CAMBIOS:
+            # quedan más: el siguiente sondeo sigue desde el último entregado
+            ultimo = lista[-1]['id_cam']
+    cambios.purgar()
+    response = JsonResponse({
+        'cambios': [{k: v for k, v in c.items() if k != 'id_cam'} for c in lista],
+        'ultimo': ultimo,
+        'sondeo': settings.CAMBIOS_SONDEO_SEGUNDOS,
+    })
+    response['Cache-Control'] = 'no-store'
+    return response
@@ -0,0 +1,159 @@
+"""Lista de espera de matrícula por institución y grado.
+
+Cuando no hay cupo la solicitud queda en estado 'waitlisted' con un turno
+estable en `ListaEspera`. Cuando aparecen cupos (se edita o crea un curso, se
+anula una matrícula) `promote` atiende a los primeros de la fila en un solo
+paso usando la misma asignación que la admisión por lotes.
+"""
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+
+from .models import Curso, ListaEspera, MatriculaRequest
+
+PROMOTED_OBS = 'Aceptada desde la lista de espera'
+
+
+def grado_de_solicitud(req):
+    """Grado al que aplica la solicitud: el solicitado o el del curso pedido."""
+    if req.grado_solicitado:
+        return int(req.grado_solicitado)
+    if req.id_cur_id:
+        return req.id_cur.num_grd_cur
+    return None
+
+
+def _next_turn(inst_id, grado):
+    last = (
+        ListaEspera.objects
+        .filter(id_inst_id=inst_id, grado=grado)
+        .aggregate(m=Max('posicion'))['m']
+    )
+    return (last or 0) + 1
+
+
+def enqueue(req, grado=None, attempts=5):
+    """Pone la solicitud en la lista de espera y devuelve la entrada.
+
+    El turno es max+1 dentro de (institución, grado); si dos procesos toman el
+    mismo turno a la vez la restricción única lo detecta y se reintenta.
+    """
+    grado = grado if grado is not None else grado_de_solicitud(req)
+    if grado is None:
+        raise ValueError('La solicitud no indica grado; no puede ir a lista de espera')
+    existing = ListaEspera.objects.filter(id_req=req).first()
+    if existing is not None:
+        return existing
+    for attempt in range(attempts):
+        try:
+            with transaction.atomic():
+                entry = ListaEspera.objects.create(
+                    id_req=req,
+                    id_inst_id=req.id_inst_id,
+                    grado=grado,
+                    posicion=_next_turn(req.id_inst_id, grado),
+                )
+                if req.estado != 'waitlisted':
+                    req.estado = 'waitlisted'
+                    MatriculaRequest.objects.filter(pk=req.pk).update(estado='waitlisted')
+                return entry
+        except IntegrityError:
+            if attempt == attempts - 1:
+                raise
+    return None
+
+
+def enqueue_many(reqs):
+    """Versión en bloque de `enqueue` para la admisión por lotes."""
+    reqs = [r for r in reqs if r.estado != 'waitlisted']
+    if not reqs:
+        return []
+    groups = {}
+    for req in reqs:
+        grado = grado_de_solicitud(req)
+        if grado is None:
+            # sin grado no hay fila a la que unirse: queda pendiente para revisión manual
+            continue
+        groups.setdefault((req.id_inst_id, grado), []).append(req)
+
+    entries = []
+    for (inst_id, grado), group in groups.items():
+        turn = _next_turn(inst_id, grado)
+        for req in group:
+            entries.append(ListaEspera(id_req=req, id_inst_id=inst_id, grado=grado, posicion=turn))
+            turn += 1
+    ListaEspera.objects.bulk_create(entries, batch_size=500)
+    MatriculaRequest.objects.filter(pk__in=[e.id_req_id for e in entries]).update(estado='waitlisted')
+    for e in entries:
+        e.id_req.estado = 'waitlisted'
+    return entries
+
+
+def position(req_id):
+    """Puesto actual en la fila (1 = siguiente en ser atendido) o None si no está esperando.
+
+    Dos consultas por índice: la entrada y el conteo de turnos anteriores.
+    """
+    entry = (
+        ListaEspera.objects
+        .filter(id_req_id=req_id)
+        .values('id_inst_id', 'grado', 'posicion', 'estado')
+        .first()
+    )
+    if not entry or entry['estado'] != 'waiting':
+        return None
+    ahead = ListaEspera.objects.filter(
+        id_inst_id=entry['id_inst_id'],
+        grado=entry['grado'],
+        estado='waiting',
+        posicion__lt=entry['posicion'],
+    ).count()
+    return ahead + 1
+
+
+def has_waiting(inst_id, grado):
+    return ListaEspera.objects.filter(id_inst_id=inst_id, grado=grado, estado='waiting').exists()
+
+
+def promote(inst_id, grado):
+    """Atiende la lista de espera de (institución, grado) con los cupos libres actuales.
+
+    Bloquea los cursos del grado, toma tantas entradas como cupos haya (en
+    orden de turno) y escribe todo en bloque. Devuelve el número de promovidos.
+    """
+    from .admission import apply_assignments, assign_seats
+
+    with transaction.atomic():
+        cursos = list(
+            Curso.objects.select_for_update()
+            .filter(id_inst_id=inst_id, num_grd_cur=grado, cup_disp_cur__gt=0)
+            .order_by('pk')
+        )
+        free = sum(c.cup_disp_cur for c in cursos)
+        if free <= 0:
+            return 0
+        entries = list(
+            ListaEspera.objects
+            .select_for_update(of=('self',))
+            .filter(id_inst_id=inst_id, grado=grado, estado='waiting')
+            .select_related('id_req', 'id_req__id_acu')
+            .order_by('posicion')[:free]
+        )
+        if not entries:
+            return 0
+        reqs = [e.id_req for e in entries]
+        original_free = {c.pk: c.cup_disp_cur for c in cursos}
+        assigned = [(req, curso) for req, curso in assign_seats(reqs, cursos) if curso is not None]
+        summary = {'accepted': 0, 'waitlisted': 0, 'rejected': 0, 'by_course': {}}
+        apply_assignments(assigned, cursos, original_free, summary, obs=PROMOTED_OBS)
+        promoted_ids = [req.pk for req, _ in assigned]
+        ListaEspera.objects.filter(id_req_id__in=promoted_ids).update(estado='promoted')
+    return summary['accepted']
+
+
+def schedule_promotion(inst_id, grado):
+    """Programa `promote` para cuando se confirme la transacción actual (si hay fila)."""
+    if inst_id is None or grado is None:
+        return
+    if not has_waiting(inst_id, grado):
+        return
+    transaction.on_commit(lambda: promote(inst_id, grado))
@@ -0,0 +1,334 @@
+"""Gazetteer local de Colombia: departamentos y municipios (códigos DANE/DIVIPOLA) y
+un normalizador de direcciones urbanas ("Cra 43a no 1 - 50" -> "Carrera 43A # 1-50").
+
+Es lo que usa `utils.geocodificadores.Offline` cuando Nominatim no está
+disponible: no consulta la red. Las coordenadas de un municipio son las de su
+cabecera, así que un resultado local ubica la dirección en el municipio, no en
+la cuadra.
+
+El núcleo incluido trae los 33 departamentos, sus capitales y los municipios
+más poblados. Para el DIVIPOLA completo, descarga el listado del DANE como CSV
+con columnas `cod_mun,nombre,lat,lon` y apunta
+`GEOCODIFICACION_DIVIPOLA_CSV` a ese archivo.
+"""
+import bisect
+import csv
+import logging
+import math
+import re
+import threading
+
+from django.conf import settings
+
+from .texto import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+# código -> nombre
+DEPARTAMENTOS = {
+    '05': 'Antioquia', '08': 'Atlántico', '11': 'Bogotá D.C.', '13': 'Bolívar', '15': 'Boyacá',
+    '17': 'Caldas', '18': 'Caquetá', '19': 'Cauca', '20': 'Cesar', '23': 'Córdoba',
+    '25': 'Cundinamarca', '27': 'Chocó', '41': 'Huila', '44': 'La Guajira', '47': 'Magdalena',
+    '50': 'Meta', '52': 'Nariño', '54': 'Norte de Santander', '63': 'Quindío', '66': 'Risaralda',
+    '68': 'Santander', '70': 'Sucre', '73': 'Tolima', '76': 'Valle del Cauca', '81': 'Arauca',
+    '85': 'Casanare', '86': 'Putumayo', '88': 'San Andrés y Providencia', '91': 'Amazonas',
+    '94': 'Guainía', '95': 'Guaviare', '97': 'Vaupés', '99': 'Vichada',
+}
+
+# (código DIVIPOLA, nombre, latitud, longitud de la cabecera); las capitales primero
+MUNICIPIOS = (
+    ('11001', 'Bogotá', 4.6110, -74.0818),
+    ('05001', 'Medellín', 6.2442, -75.5812),
+    ('76001', 'Cali', 3.4516, -76.5320),
+    ('08001', 'Barranquilla', 10.9639, -74.7964),
+    ('13001', 'Cartagena de Indias', 10.3910, -75.4794),
+    ('54001', 'Cúcuta', 7.8939, -72.5078),
+    ('68001', 'Bucaramanga', 7.1193, -73.1227),
+    ('73001', 'Ibagué', 4.4389, -75.2322),
+    ('66001', 'Pereira', 4.8133, -75.6961),
+    ('47001', 'Santa Marta', 11.2408, -74.1990),
+    ('50001', 'Villavicencio', 4.1420, -73.6266),
+    ('17001', 'Manizales', 5.0703, -75.5138),
+    ('52001', 'Pasto', 1.2136, -77.2811),
+    ('23001', 'Montería', 8.7479, -75.8814),
+    ('20001', 'Valledupar', 10.4631, -73.2532),
+    ('41001', 'Neiva', 2.9273, -75.2819),
+    ('63001', 'Armenia', 4.5339, -75.6811),
+    ('19001', 'Popayán', 2.4448, -76.6147),
+    ('70001', 'Sincelejo', 9.3047, -75.3978),
+    ('15001', 'Tunja', 5.5353, -73.3678),
+    ('44001', 'Riohacha', 11.5444, -72.9072),
+    ('18001', 'Florencia', 1.6144, -75.6062),
+    ('27001', 'Quibdó', 5.6947, -76.6611),
+    ('85001', 'Yopal', 5.3378, -72.3959),
+    ('81001', 'Arauca', 7.0847, -70.7591),
+    ('86001', 'Mocoa', 1.1528, -76.6466),
+    ('88001', 'San Andrés', 12.5847, -81.7006),
+    ('91001', 'Leticia', -4.2153, -69.9406),
+    ('94001', 'Inírida', 3.8653, -67.9239),
+    ('95001', 'San José del Guaviare', 2.5729, -72.6459),
+    ('97001', 'Mitú', 1.2536, -70.2346),
+    ('99001', 'Puerto Carreño', 6.1890, -67.4859),
+    # área metropolitana del Valle de Aburrá y resto de Antioquia
+    ('05088', 'Bello', 6.3373, -75.5580),
+    ('05360', 'Itagüí', 6.1719, -75.6114),
+    ('05266', 'Envigado', 6.1759, -75.5917),
+    ('05631', 'Sabaneta', 6.1515, -75.6166),
+    ('05380', 'La Estrella', 6.1576, -75.6431),
+    ('05129', 'Caldas', 6.0911, -75.6357),
+    ('05212', 'Copacabana', 6.3463, -75.5089),
+    ('05308', 'Girardota', 6.3775, -75.4458),
+    ('05079', 'Barbosa', 6.4380, -75.3331),
+    ('05615', 'Rionegro', 6.1551, -75.3737),
+    ('05045', 'Apartadó', 7.8829, -76.6259),
+    ('05837', 'Turbo', 8.0926, -76.7282),
+    ('05154', 'Caucasia', 7.9865, -75.1934),
+    # Cundinamarca
+    ('25754', 'Soacha', 4.5794, -74.2168),
+    ('25175', 'Chía', 4.8617, -74.0325),
+    ('25899', 'Zipaquirá', 5.0221, -74.0048),
+    ('25269', 'Facatativá', 4.8137, -74.3545),
+    ('25290', 'Fusagasugá', 4.3365, -74.3638),
+    ('25307', 'Girardot', 4.3032, -74.8030),
+    # Atlántico, Bolívar, Boyacá, Caldas, Cauca, Córdoba, Huila, La Guajira, Magdalena
+    ('08758', 'Soledad', 10.9184, -74.7646),
+    ('08433', 'Malambo', 10.8597, -74.7739),
+    ('13430', 'Magangué', 9.2412, -74.7547),
+    ('15238', 'Duitama', 5.8269, -73.0334),
+    ('15759', 'Sogamoso', 5.7143, -72.9339),
+    ('17380', 'La Dorada', 5.4536, -74.6634),
+    ('19698', 'Santander de Quilichao', 3.0091, -76.4849),
+    ('23417', 'Lorica', 9.2366, -75.8135),
+    ('41551', 'Pitalito', 1.8537, -76.0515),
+    ('44430', 'Maicao', 11.3784, -72.2395),
+    ('47189', 'Ciénaga', 11.0070, -74.2476),
+    # Nariño, Norte de Santander, Risaralda, Santander, Tolima
+    ('52835', 'Tumaco', 1.7986, -78.8156),
+    ('52356', 'Ipiales', 0.8303, -77.6442),
+    ('54498', 'Ocaña', 8.2378, -73.3560),
+    ('66170', 'Dosquebradas', 4.8394, -75.6672),
+    ('68276', 'Floridablanca', 7.0622, -73.0864),
+    ('68307', 'Girón', 7.0708, -73.1690),
+    ('68547', 'Piedecuesta', 6.9872, -73.0500),
+    ('68081', 'Barrancabermeja', 7.0653, -73.8547),
+    ('73268', 'Espinal', 4.1492, -74.8843),
+    # Valle del Cauca
+    ('76109', 'Buenaventura', 3.8801, -77.0312),
+    ('76520', 'Palmira', 3.5394, -76.3036),
+    ('76834', 'Tuluá', 4.0847, -76.1954),
+    ('76147', 'Cartago', 4.7464, -75.9117),
+    ('76111', 'Guadalajara de Buga', 3.9009, -76.2978),
+    ('76364', 'Jamundí', 3.2610, -76.5350),
+    ('76892', 'Yumbo', 3.5823, -76.4914),
+)
+
+# nombres con que también se escribe un municipio -> código
+ALIAS = {
+    'bogota dc': '11001', 'santafe de bogota': '11001', 'santa fe de bogota': '11001',
+    'cartagena': '13001', 'san jose de cucuta': '54001', 'san juan de pasto': '52001',
+    'buga': '76111', 'san andres de tumaco': '52835', 'el espinal': '73268',
+}
+
+# Cundinamarca: su capital es Bogotá, que es distrito aparte
+CAPITALES = {'25': '11001'}
+
+RADIO_INVERSA_KM = 25.0
+MAX_PALABRAS_NOMBRE = 4
+
+
+def _clave(texto):
+    """'Bogotá D.C.' -> 'bogota dc': sin tildes, puntos ni signos."""
+    return ' '.join(re.findall(r'[a-z0-9]+', normalizar_texto(texto).replace('.', '')))
+
+
+class _Indice:
+    """Municipios por código y por nombre normalizado, construido una vez por proceso."""
+
+    def __init__(self, municipios):
+        self.por_codigo = {}
+        self.por_nombre = {}
+        for cod, nombre, lat, lon in municipios:
+            if cod in self.por_codigo:
+                continue
+            self.por_codigo[cod] = (cod, nombre, lat, lon)
+            self.por_nombre.setdefault(_clave(nombre), []).append(cod)
+        for alias, cod in ALIAS.items():
+            if cod in self.por_codigo:
+                self.por_nombre.setdefault(alias, []).append(cod)
+        self.departamentos = {_clave(n): c for c, n in DEPARTAMENTOS.items()}
+        self.nombres = sorted(self.por_nombre)
+
+
+_indice = None
+_lock_indice = threading.Lock()
+
+
+def _cargar_csv(ruta):
+    filas = []
+    with open(ruta, newline='', encoding='utf-8') as f:
+        for fila in csv.DictReader(f):
+            try:
+                filas.append((fila['cod_mun'].zfill(5), fila['nombre'].strip(), float(fila['lat']), float(fila['lon'])))
+            except (KeyError, TypeError, ValueError):
+                continue
+    return filas
+
+
+def indice():
+    global _indice
+    if _indice is None:
+        with _lock_indice:
+            if _indice is None:
+                municipios = list(MUNICIPIOS)
+                ruta = getattr(settings, 'GEOCODIFICACION_DIVIPOLA_CSV', '')
+                if ruta:
+                    try:
+                        # el CSV va primero: sus coordenadas prevalecen sobre las del núcleo
+                        municipios = _cargar_csv(ruta) + municipios
+                    except OSError:
+                        logger.exception('No se pudo leer el DIVIPOLA en %s', ruta)
+                _indice = _Indice(municipios)
+    return _indice
+
+
+def etiqueta(cod):
+    """'Medellín, Antioquia, Colombia' para el código de municipio."""
+    _, nombre, _, _ = indice().por_codigo[cod]
+    partes = [nombre] if cod == '11001' else [nombre, DEPARTAMENTOS.get(cod[:2], '')]
+    return ', '.join(p for p in partes + ['Colombia'] if p)
+
+
+def municipio(cod):
+    """(código, nombre, lat, lon) o None."""
+    return indice().por_codigo.get(cod)
+
+
+def buscar_municipios(texto):
+    """Códigos de los municipios nombrados en `texto` (los nombres más largos primero).
+
+    Si también se nombra un departamento, solo quedan los municipios de ese
+    departamento ("Caldas, Antioquia" no es la capital del departamento de Caldas).
+    """
+    idx = indice()
+    palabras = _clave(texto).split()
+    encontrados = []
+    departamentos = set()
+    i = 0
+    while i < len(palabras):
+        for largo in range(min(MAX_PALABRAS_NOMBRE, len(palabras) - i), 0, -1):
+            frase = ' '.join(palabras[i:i + largo])
+            if frase in idx.por_nombre:
+                encontrados.extend(c for c in idx.por_nombre[frase] if c not in encontrados)
+            if frase in idx.departamentos:
+                departamentos.add(idx.departamentos[frase])
+            if frase in idx.por_nombre or frase in idx.departamentos:
+                i += largo
+                break
+        else:
+            i += 1
+    if departamentos:
+        del_departamento = [c for c in encontrados if c[:2] in departamentos]
+        if del_departamento:
+            return del_departamento
+        if not encontrados or all(idx.por_codigo[c][1] in DEPARTAMENTOS.values() for c in encontrados):
+            # solo se nombró el departamento: su capital
+            return [c for c in (_capital(d) for d in sorted(departamentos)) if c]
+    return encontrados
+
+
+def _capital(cod_dep):
+    if cod_dep in CAPITALES:
+        return CAPITALES[cod_dep]
+    for cod, *_ in MUNICIPIOS:
+        if cod[:2] == cod_dep:
+            return cod
+    return None
+
+
+def municipios_con_prefijo(prefijo, limite=5):
+    """Municipios cuyo nombre empieza por `prefijo` (autocompletado sin red)."""
+    idx = indice()
+    prefijo = _clave(prefijo)
+    if len(prefijo) < 3:
+        return []
+    codigos = []
+    i = bisect.bisect_left(idx.nombres, prefijo)
+    while i < len(idx.nombres) and idx.nombres[i].startswith(prefijo) and len(codigos) < limite:
+        codigos.extend(c for c in idx.por_nombre[idx.nombres[i]] if c not in codigos)
+        i += 1
+    return codigos[:limite]
+
+
+def _distancia_km(lat1, lon1, lat2, lon2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp, dl = p2 - p1, math.radians(lon2 - lon1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(a))
+
+
+def municipio_cercano(lat, lon, radio_km=RADIO_INVERSA_KM):
+    """Código del municipio cuya cabecera está más cerca de (lat, lon), dentro de `radio_km`."""
+    mejor, mejor_d = None, radio_km
+    for cod, _, mlat, mlon in indice().por_codigo.values():
+        d = _distancia_km(lat, lon, mlat, mlon)
+        if d <= mejor_d:
+            mejor, mejor_d = cod, d
+    return mejor
+
+
+def municipios_en_caja(oeste, norte, este, sur):
+    """Códigos de los municipios cuya cabecera cae dentro del viewbox, del centro hacia afuera."""
+    clat, clon = (norte + sur) / 2, (oeste + este) / 2
+    dentro = [
+        (_distancia_km(clat, clon, lat, lon), cod)
+        for cod, _, lat, lon in indice().por_codigo.values()
+        if sur <= lat <= norte and oeste <= lon <= este
+    ]
+    return [cod for _, cod in sorted(dentro)]
+
+
+# -- direcciones urbanas --------------------------------------------------------
+
+TIPOS_VIA = {
+    'calle': 'Calle', 'cl': 'Calle', 'cll': 'Calle', 'clle': 'Calle', 'call': 'Calle',
+    'carrera': 'Carrera', 'cra': 'Carrera', 'cr': 'Carrera', 'kr': 'Carrera', 'kra': 'Carrera', 'crr': 'Carrera', 'k': 'Carrera',
+    'avenida': 'Avenida', 'av': 'Avenida', 'avda': 'Avenida',
+    'ac': 'Avenida Calle', 'ak': 'Avenida Carrera',
+    'diagonal': 'Diagonal', 'dg': 'Diagonal', 'diag': 'Diagonal',
+    'transversal': 'Transversal', 'tv': 'Transversal', 'tr': 'Transversal', 'trans': 'Transversal', 'transv': 'Transversal',
+    'circular': 'Circular', 'cq': 'Circular', 'circ': 'Circular',
+    'autopista': 'Autopista', 'autop': 'Autopista',
+}
+
+_VIA = re.compile(
+    r'(?<![a-z0-9])(?P<tipo>[a-z]+)\.?\s*'
+    r'(?P<num>\d{1,3})\s*(?P<letra>[a-z](?![a-z]))?\s*(?P<bis>bis(?![a-z]))?\s*(?P<letra2>[a-z](?![a-z]))?\s*'
+    r'(?P<sufijo>sur|este|norte|oeste)?\s*'
+    r'(?:#|n[o°º]\.?|nro\.?|numero|num\.?)?\s*'
+    r'(?P<cruce>\d{1,3})\s*(?P<letra_c>[a-z](?![a-z]))?\s*(?:-|\s)\s*(?P<placa>\d{1,3})'
+    r'(?:\s*(?P<sufijo2>sur|este|norte|oeste)(?![a-z]))?'
+)
+
+
+def normalizar_via(texto):
+    """'cra 43a no 1 - 50 sur' -> 'Carrera 43A # 1-50 Sur'; None si no parece una dirección urbana."""
+    base = normalizar_texto(texto)
+    for m in _VIA.finditer(base):
+        tipo = TIPOS_VIA.get(m.group('tipo'))
+        if not tipo:
+            continue
+        via = m.group('num') + (m.group('letra') or '').upper()
+        if m.group('bis'):
+            via += ' Bis'
+            if m.group('letra2'):
+                via += ' ' + m.group('letra2').upper()
+        elif m.group('letra2'):
+            via += m.group('letra2').upper()
+        if m.group('sufijo'):
+            via += ' ' + m.group('sufijo').capitalize()
+        placa = f"{m.group('cruce')}{(m.group('letra_c') or '').upper()}-{m.group('placa')}"
+        resultado = f'{tipo} {via} # {placa}'
+        if m.group('sufijo2'):
+            resultado += ' ' + m.group('sufijo2').capitalize()
+        return resultado
+    return None
@@ -1,44 +1,232 @@
-try:
-    import requests
-except Exception:
-    requests = None
+import logging
+import math
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
+from django.conf import settings
+from django.db import close_old_connections
 
-NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+from . import geocache, geocodificadores
+from .limitador import FONDO, INTERACTIVA
 
+logger = logging.getLogger(__name__)
 
-def _user_agent():
-    # Cumplir política de Nominatim: proveer User-Agent identificable
-    return "matrischol/1.0 (admin@matrischol.local)"
+# Se pide siempre el mismo límite y se recorta después: una entrada de la caché sirve para cualquier `limit`
+LIMITE_BUSQUEDA = 10
+# Tamaño de la tesela (grados, unos 22 m) con que se agrupan las consultas inversas
+TESELA_INVERSA = 0.0002
 
 
-def validate_and_normalize_address(address: str, country: str = "CO", timeout: float = 4.0):
-    """Valida una dirección usando Nominatim (OSM) y devuelve datos normalizados.
+def normalizar_consulta(texto):
+    """Minúsculas y espacios simples: la forma con que se consulta y se guarda en caché."""
+    return ' '.join((texto or '').lower().split())
+
+
+def viewbox_alrededor(lat, lon, delta=0.15):
+    """Viewbox de Nominatim (izq,arriba,der,abajo) de ±`delta` grados alrededor del punto.
+
+    El centro se redondea a 0.01° (~1 km) para que posiciones cercanas compartan caché.
+    """
+    lat = round(lat, 2)
+    lon = round(lon, 2)
+    return f"{lon - delta:.2f},{lat + delta:.2f},{lon + delta:.2f},{lat - delta:.2f}"
+
+
+def _local(metodo, *args):
+    try:
+        return getattr(geocodificadores.respaldo(), metodo)(*args)
+    except Exception:
+        logger.exception('Falló el geocodificador local')
+        return None
+
+
+def buscar(q, country="CO", limit=5, viewbox=None, timeout=4.5, prioridad=INTERACTIVA, respaldo=True, plazo=None):
+    """Resultados de geocodificar `q` (lista, quizá vacía), con la forma de Nominatim.
+
+    Las del geocodificador principal (`settings.GEOCODIFICADOR`) pasan por la
+    caché. Si falla (red, circuito abierto, sin turno en el limitador, `plazo`
+    vencido) responde el gazetteer local, salvo con `respaldo=False`; en ese
+    caso, o si también falla, devuelve None.
+    """
+    q = normalizar_consulta(q)
+    if not q:
+        return []
+    country = (country or '').strip().lower()
+    principal = geocodificadores.obtener()
+    if not principal.remoto:
+        try:
+            return principal.buscar(q, country, limit, viewbox, plazo=plazo)
+        except Exception:
+            logger.exception('Falló el geocodificador %s', principal.nombre)
+            return None
+    datos = geocache.obtener(
+        'buscar', (q, country, viewbox or ''),
+        lambda: principal.buscar(q, country, LIMITE_BUSQUEDA, viewbox, timeout, prioridad, plazo),
+    )
+    if datos is not None:
+        return datos[:limit]
+    return _local('buscar', q, country, limit, viewbox) if respaldo else None
+
+
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def _pool_busquedas():
+    """Hilos del proceso para las búsquedas en paralelo; acotados para no saturar el limitador."""
+    global _pool
+    if _pool is None:
+        with _lock_pool:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(
+                    max_workers=getattr(settings, 'GEOCODIFICACION_HILOS', 4),
+                    thread_name_prefix='geo-buscar',
+                )
+    return _pool
+
+
+def _buscar_en_hilo(q, country, limit, viewbox, plazo):
+    if time.time() >= plazo:
+        # esperó en la cola del pool hasta después del plazo: ya nadie la espera
+        return None
+    try:
+        return buscar(q, country=country, limit=limit, viewbox=viewbox, respaldo=False, plazo=plazo)
+    finally:
+        # los hilos del pool no pasan por el ciclo de una petición
+        close_old_connections()
+
+
+def buscar_varias(consultas, limit=5, viewbox=None, plazo=0.8, basta=None, fin=None, en_orden=False):
+    """Lanza `buscar` para cada (q, country) de `consultas`, sin esperar más de `plazo` s.
+
+    Devuelve una lista alineada con `consultas`: los resultados de cada una, o
+    None si falló o no terminó a tiempo (sin respaldo local). Si `basta` recibe
+    esa lista (con None en las que siguen pendientes) y devuelve True, no se
+    espera al resto. `fin` (epoch) sustituye a `plazo` cuando quien llama ya
+    gastó parte de su plazo en otra consulta.
+
+    Por defecto se lanzan todas a la vez; con `en_orden` cada una empieza
+    cuando la anterior terminó sin que `basta` se cumpliera, así el turno del
+    limitador (un pedido por segundo) es para la de mayor prioridad y las que
+    están en caché responden igual de rápido. Las que no alcanzaron a empezar
+    se cancelan; las que ya consultan a Nominatim terminan solas en el plazo y
+    su respuesta queda en caché para la próxima tecla.
+    """
+    fin = fin if fin is not None else time.time() + plazo
+    pool = _pool_busquedas()
+    resultados = [None] * len(consultas)
+    if en_orden:
+        for i, (q, country) in enumerate(consultas):
+            restante = fin - time.time()
+            if restante <= 0:
+                break
+            futuro = pool.submit(_buscar_en_hilo, q, country, limit, viewbox, fin)
+            hechos, _ = wait([futuro], timeout=restante)
+            if not hechos:
+                break
+            try:
+                resultados[i] = futuro.result()
+            except Exception:
+                logger.exception('Falló una búsqueda en orden')
+            if basta and basta(resultados):
+                break
+        return resultados
+    futuros = [pool.submit(_buscar_en_hilo, q, country, limit, viewbox, fin) for q, country in consultas]
+    pendientes = set(futuros)
+    while pendientes:
+        hechos, pendientes = wait(pendientes, timeout=max(0.0, fin - time.time()), return_when=FIRST_COMPLETED)
+        if not hechos:
+            break
+        for f in hechos:
+            try:
+                resultados[futuros.index(f)] = f.result()
+            except Exception:
+                logger.exception('Falló una búsqueda en paralelo')
+        if basta and basta(resultados):
+            break
+    for f in pendientes:
+        f.cancel()
+    return resultados
+
+
+def clave_lugar(hit):
+    """Identificador de un resultado para descartar repetidos: place_id, o el objeto OSM, o el nombre."""
+    if hit.get('place_id') is not None:
+        return ('place', str(hit['place_id']))
+    if hit.get('osm_id') is not None:
+        return ('osm', hit.get('osm_type'), str(hit['osm_id']))
+    return ('nombre', hit.get('display_name'))
+
+
+def combinar(listas, limit):
+    """Une listas de resultados en orden, sin repetidos (ver `clave_lugar`), hasta `limit`."""
+    vistos = set()
+    unidos = []
+    for lista in listas:
+        for hit in lista or []:
+            clave = clave_lugar(hit)
+            if clave in vistos:
+                continue
+            vistos.add(clave)
+            unidos.append(hit)
+            if len(unidos) >= limit:
+                return unidos
+    return unidos
+
+
+def inversa(lat, lon, timeout=4.5, prioridad=INTERACTIVA, respaldo=True):
+    """Resultado (dict) de geocodificar al revés la tesela que contiene (lat, lon).
+
+    Se consulta el centro de la tesela, así que la respuesta guardada vale para
+    cualquier punto dentro de ella. Si el principal falla responde el gazetteer
+    local (municipio más cercano), salvo con `respaldo=False`: entonces None.
+    """
+    principal = geocodificadores.obtener()
+    if not principal.remoto:
+        try:
+            return principal.inversa(lat, lon)
+        except Exception:
+            logger.exception('Falló el geocodificador %s', principal.nombre)
+            return None
+    i = math.floor(lat / TESELA_INVERSA)
+    j = math.floor(lon / TESELA_INVERSA)
+    centro = (round((i + 0.5) * TESELA_INVERSA, 6), round((j + 0.5) * TESELA_INVERSA, 6))
+    datos = geocache.obtener(
+        'inversa', (TESELA_INVERSA, i, j),
+        lambda: principal.inversa(*centro, timeout, prioridad),
+        es_vacio=lambda d: not d.get('display_name'),
+    )
+    if datos is not None:
+        return datos
+    return _local('inversa', lat, lon) if respaldo else None
+
+
+def validate_and_normalize_address(address: str, country: str = "CO", timeout: float = 4.0, prioridad: str = FONDO,
+                                   respaldo: bool = True):
+    """Valida una dirección con el geocodificador configurado y devuelve datos normalizados.
 
     Retorna dict:
-    { ok: bool, normalized: str|None, lat: float|None, lon: float|None, raw: dict|None }
+    { ok: bool, normalized: str|None, lat: float|None, lon: float|None, raw: dict|None, error: bool }
+
+    `error` indica que no se pudo consultar (red, límites de uso): la dirección
+    no se sabe inválida y puede reintentarse más tarde.
 
-    Nota: Este método consulta un servicio externo con límites de uso.
-    Úsalo con moderación y preferiblemente junto a autocompletado en el frontend.
+    Nota: Nominatim es un servicio externo con límites de uso; las respuestas
+    se guardan en caché (ver `utils.geocache`), así que validar de nuevo la
+    misma dirección no vuelve a consultarlo. Por defecto cede el turno a las
+    consultas interactivas (ver `utils.limitador`). Si Nominatim no responde,
+    el resultado sale del gazetteer local (`raw['fuente'] == 'offline'`, con
+    las coordenadas del municipio); quien guarde coordenadas y prefiera
+    esperar a Nominatim pasa `respaldo=False`.
     """
     if not address or not address.strip():
-        return {"ok": False, "normalized": None, "lat": None, "lon": None, "raw": None}
-    # Si la dependencia no está disponible, hacer fallback suave para no bloquear el servidor/formulario
-    if requests is None:
-        return {"ok": True, "normalized": address.strip(), "lat": None, "lon": None, "raw": {"warning": "requests_missing"}}
-    params = {
-        "q": address,
-        "format": "jsonv2",
-        "addressdetails": 1,
-        "limit": 1,
-        "countrycodes": (country or "").lower(),
-    }
+        return {"ok": False, "normalized": None, "lat": None, "lon": None, "raw": None, "error": False}
     try:
-        r = requests.get(NOMINATIM_URL, params=params, headers={"User-Agent": _user_agent()}, timeout=timeout)
-        r.raise_for_status()
-        data = r.json()
+        data = buscar(address, country=country, limit=1, timeout=timeout, prioridad=prioridad, respaldo=respaldo)
         if not data:
-            return {"ok": False, "normalized": None, "lat": None, "lon": None, "raw": None}
+            # None: fallo de red o límites; []: no se encontró la dirección
+            return {"ok": False, "normalized": None, "lat": None, "lon": None, "raw": None, "error": data is None}
         hit = data[0]
         # Heurística simple de calidad: existencia de lat/lon y importance >= 0.2
         lat = float(hit.get("lat")) if hit.get("lat") else None
@@ -46,7 +234,6 @@ def validate_and_normalize_address(address: str, country: str = "CO", timeout: f
         importance = float(hit.get("importance", 0) or 0)
         display = hit.get("display_name")
         ok = bool(lat is not None and lon is not None and importance >= 0.2)
-        return {"ok": ok, "normalized": display, "lat": lat, "lon": lon, "raw": hit}
+        return {"ok": ok, "normalized": display, "lat": lat, "lon": lon, "raw": hit, "error": False}
     except Exception:
-        # Ante fallo de red o límites, no bloquear por defecto
-        return {"ok": False, "normalized": None, "lat": None, "lon": None, "raw": None}
+        return {"ok": False, "normalized": None, "lat": None, "lon": None, "raw": None, "error": True}
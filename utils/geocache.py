@@ -0,0 +1,174 @@
+"""Caché de geocodificación: memoria del proceso delante de la tabla `cache_geocodificacion`.
+
+Cada respuesta de Nominatim se guarda bajo una clave (tipo de consulta y sus
+partes ya normalizadas, ver `utils.geo`):
+
+* un LRU por proceso responde las claves repetidas sin tocar la BD;
+* la tabla comparte las respuestas entre procesos y sobrevive a los reinicios;
+* las respuestas vacías también se guardan (caché negativa) con un TTL más
+  corto; los errores de red y los límites de uso no se guardan;
+* si varios hilos piden la misma clave a la vez, solo uno consulta y los demás
+  esperan su resultado.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import CacheGeocodificacion
+
+logger = logging.getLogger(__name__)
+
+TAMANO_LRU = 4096
+# máximo que un hilo espera la consulta que ya hace otro hilo con la misma clave
+ESPERA_MAX = 20.0
+# escrituras de este proceso entre purgas de filas vencidas
+PURGA_CADA = 500
+
+_NADA = object()
+
+
+class _LRU:
+    """Diccionario acotado (clave -> (valor, expira como epoch)) con expulsión LRU."""
+
+    def __init__(self, tamano):
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self._tamano = tamano
+
+    def obtener(self, clave):
+        with self._lock:
+            item = self._datos.get(clave)
+            if item is None:
+                return _NADA
+            if item[1] <= time.time():
+                del self._datos[clave]
+                return _NADA
+            self._datos.move_to_end(clave)
+            return item[0]
+
+    def guardar(self, clave, valor, expira):
+        with self._lock:
+            self._datos[clave] = (valor, expira)
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self._tamano:
+                self._datos.popitem(last=False)
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+
+
+class _Vuelo:
+    """Consulta en curso de una clave; los demás hilos esperan su `evento`."""
+
+    __slots__ = ('evento', 'valor')
+
+    def __init__(self):
+        self.evento = threading.Event()
+        self.valor = None
+
+
+_lru = _LRU(TAMANO_LRU)
+_vuelos = {}
+_lock_vuelos = threading.Lock()
+_escrituras = 0
+
+
+def _ttl(vacio):
+    if vacio:
+        return timedelta(hours=getattr(settings, 'GEOCODIFICACION_CACHE_VACIO_HORAS', 24))
+    return timedelta(days=getattr(settings, 'GEOCODIFICACION_CACHE_DIAS', 30))
+
+
+def _clave(tipo, partes):
+    consulta = '|'.join(str(p) for p in partes)
+    return hashlib.sha256(f'{tipo}|{consulta}'.encode('utf-8')).hexdigest(), consulta
+
+
+def _leer_bd(clave):
+    try:
+        # punto de guardado: un fallo aquí (p. ej. tabla sin migrar) no debe romper la transacción de quien llama
+        with transaction.atomic():
+            fila = (
+                CacheGeocodificacion.objects.filter(clave=clave, expira_en__gt=timezone.now())
+                .values_list('resultado', 'expira_en').first()
+            )
+    except Exception:
+        logger.exception('No se pudo leer cache_geocodificacion')
+        return _NADA
+    if fila is None:
+        return _NADA
+    resultado, expira_en = fila
+    _lru.guardar(clave, resultado, expira_en.timestamp())
+    return resultado
+
+
+def _guardar_bd(clave, tipo, consulta, valor, vacio):
+    global _escrituras
+    expira_en = timezone.now() + _ttl(vacio)
+    _lru.guardar(clave, valor, expira_en.timestamp())
+    try:
+        with transaction.atomic():
+            CacheGeocodificacion.objects.bulk_create(
+                [CacheGeocodificacion(clave=clave, tipo=tipo, consulta=consulta[:300], resultado=valor, vacio=vacio, expira_en=expira_en)],
+                update_conflicts=True, unique_fields=['clave'],
+                update_fields=['resultado', 'vacio', 'expira_en'],
+            )
+        _escrituras += 1
+        if _escrituras % PURGA_CADA == 0:
+            with transaction.atomic():
+                CacheGeocodificacion.objects.filter(expira_en__lte=timezone.now()).delete()
+    except Exception:
+        logger.exception('No se pudo guardar en cache_geocodificacion')
+
+
+def obtener(tipo, partes, consultar, es_vacio=None):
+    """Valor en caché para (`tipo`, `partes`) o el que devuelva `consultar()`.
+
+    `consultar` debe lanzar una excepción si la consulta falla: en ese caso no
+    se guarda nada y se devuelve None. `es_vacio(valor)` decide si el valor
+    es una respuesta sin resultado (por defecto, `not valor`).
+    """
+    clave, consulta = _clave(tipo, partes)
+    valor = _lru.obtener(clave)
+    if valor is not _NADA:
+        return valor
+
+    with _lock_vuelos:
+        vuelo = _vuelos.get(clave)
+        lider = vuelo is None
+        if lider:
+            vuelo = _vuelos[clave] = _Vuelo()
+    if not lider:
+        vuelo.evento.wait(ESPERA_MAX)
+        return vuelo.valor
+
+    try:
+        valor = _leer_bd(clave)
+        if valor is _NADA:
+            try:
+                valor = consultar()
+            except Exception as exc:
+                logger.warning('Geocodificación fallida (%s %s): %s', tipo, consulta, exc)
+                valor = None
+            else:
+                vacio = es_vacio(valor) if es_vacio else not valor
+                _guardar_bd(clave, tipo, consulta, valor, vacio)
+        vuelo.valor = valor
+        return valor
+    finally:
+        with _lock_vuelos:
+            _vuelos.pop(clave, None)
+        vuelo.evento.set()
+
+
+def limpiar_memoria():
+    """Vacía el LRU de este proceso (la tabla no se toca)."""
+    _lru.limpiar()
@@ -0,0 +1,292 @@
+"""Geocodificadores intercambiables y el cortacircuitos que pasa al gazetteer local.
+
+Todos implementan `Geocodificador` y devuelven resultados con la forma de
+Nominatim (`display_name`, `lat`, `lon`, `importance`, `place_id`...), así que
+`utils.geo` y las vistas no necesitan saber de dónde vienen:
+
+* `Nominatim`: el servicio de OSM, con la sesión HTTP compartida del proceso,
+  el limitador de `utils.limitador` y un `Circuito`;
+* `Offline`: el gazetteer local (`utils.gazetteer`), sin red; ubica la
+  dirección en la cabecera del municipio;
+* `Falso`: respuestas deterministas y sin red para pruebas y desarrollo.
+
+`settings.GEOCODIFICADOR` elige el principal ('nominatim' por defecto). Si el
+principal es remoto y falla (o su circuito está abierto), `utils.geo` responde
+con `Offline`.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+
+try:
+    import requests
+except Exception:
+    requests = None
+
+from . import gazetteer, limitador
+from .limitador import ESPERAS, INTERACTIVA
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+NOMINATIM_REVERSE_URL = "https://nominatim.openstreetmap.org/reverse"
+
+
+class CircuitoAbierto(Exception):
+    """El servicio falló varias veces seguidas: no se le consulta por un tiempo."""
+
+
+class Circuito:
+    """Cortacircuitos por proceso.
+
+    Tras `fallos_max` fallos seguidos se abre durante `enfriamiento` segundos
+    (las llamadas fallan al instante); después deja pasar una sola llamada de
+    prueba: si sale bien se cierra, si falla vuelve a abrirse.
+    """
+
+    def __init__(self, fallos_max=5, enfriamiento=30.0):
+        self.fallos_max = fallos_max
+        self.enfriamiento = enfriamiento
+        self._lock = threading.Lock()
+        self._fallos = 0
+        self._abierto_hasta = 0.0
+        self._en_prueba = False
+
+    @property
+    def abierto(self):
+        with self._lock:
+            return self._fallos >= self.fallos_max and (self._en_prueba or time.monotonic() < self._abierto_hasta)
+
+    def permitir(self):
+        with self._lock:
+            if self._fallos < self.fallos_max:
+                return True
+            if self._en_prueba or time.monotonic() < self._abierto_hasta:
+                return False
+            self._en_prueba = True
+            return True
+
+    def exito(self):
+        with self._lock:
+            self._fallos = 0
+            self._en_prueba = False
+
+    def fallo(self):
+        with self._lock:
+            self._fallos += 1
+            self._en_prueba = False
+            if self._fallos >= self.fallos_max:
+                self._abierto_hasta = time.monotonic() + self.enfriamiento
+
+    def cancelar(self):
+        """La llamada permitida no llegó a hacerse (p. ej. sin turno en el limitador)."""
+        with self._lock:
+            self._en_prueba = False
+
+
+class Geocodificador:
+    nombre = ''
+    # sus respuestas se guardan en caché (utils.geocache) y, si falla, se responde con Offline
+    remoto = False
+    # `plazo` (epoch, opcional): instante en que la respuesta ya no sirve; los remotos no esperan más allá
+
+    def buscar(self, q, country='co', limit=5, viewbox=None, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        """Resultados para la consulta ya normalizada (lista, vacía si no hay); lanza una excepción si falla."""
+        raise NotImplementedError
+
+    def inversa(self, lat, lon, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        """Resultado para el punto (dict, vacío si no hay); lanza una excepción si falla."""
+        raise NotImplementedError
+
+
+class Nominatim(Geocodificador):
+    nombre = 'nominatim'
+    remoto = True
+
+    def __init__(self):
+        self.circuito = Circuito(
+            getattr(settings, 'GEOCODIFICACION_CIRCUITO_FALLOS', 5),
+            getattr(settings, 'GEOCODIFICACION_CIRCUITO_SEGUNDOS', 30.0),
+        )
+        self._sesion = None
+        self._lock_sesion = threading.Lock()
+
+    def _sesion_http(self):
+        """Sesión compartida por los hilos del proceso: reutiliza las conexiones TLS a Nominatim."""
+        if self._sesion is None:
+            with self._lock_sesion:
+                if self._sesion is None:
+                    sesion = requests.Session()
+                    # Cumplir política de Nominatim: proveer User-Agent identificable
+                    sesion.headers["User-Agent"] = "matrischol/1.0 (admin@matrischol.local)"
+                    # una conexión por hilo que consulta a la vez; sin reintentos: el limitador decide
+                    sesion.mount("https://", requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=8, max_retries=0))
+                    self._sesion = sesion
+        return self._sesion
+
+    def _consultar(self, url, params, timeout, prioridad, plazo=None):
+        if requests is None:
+            raise CircuitoAbierto('requests no está instalado')
+        espera_max = None
+        if plazo is not None:
+            espera_max = min(ESPERAS[prioridad], plazo - time.time())
+            if espera_max <= 0:
+                raise limitador.CuotaAgotada(self.nombre)
+        if not self.circuito.permitir():
+            raise CircuitoAbierto(self.nombre)
+        try:
+            # solo las consultas que no están en caché gastan turno del limitador
+            limitador.esperar_turno('nominatim', getattr(settings, 'NOMINATIM_POR_SEGUNDO', 1.0), prioridad, espera_max)
+        except limitador.CuotaAgotada:
+            self.circuito.cancelar()
+            raise
+        recortado = False
+        if plazo is not None and plazo - time.time() < timeout:
+            timeout = max(0.05, plazo - time.time())
+            recortado = True
+        try:
+            r = self._sesion_http().get(url, params=params, timeout=timeout)
+            if 400 <= r.status_code < 500 and r.status_code != 429:
+                # consulta rechazada: reintentarla daría lo mismo, cuenta como sin resultado
+                self.circuito.exito()
+                return None
+            r.raise_for_status()
+            datos = r.json()
+        except requests.Timeout:
+            if recortado:
+                # se agotó el plazo de quien llama, no el de Nominatim: no cuenta como fallo
+                self.circuito.cancelar()
+            else:
+                self.circuito.fallo()
+            raise
+        except Exception:
+            self.circuito.fallo()
+            raise
+        self.circuito.exito()
+        return datos
+
+    def buscar(self, q, country='co', limit=5, viewbox=None, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        params = {
+            "q": q,
+            "format": "jsonv2",
+            "addressdetails": 1,
+            "limit": limit,
+            "accept-language": "es",
+        }
+        if country:
+            params["countrycodes"] = country
+        if viewbox:
+            params["viewbox"] = viewbox
+            params["bounded"] = 1
+        return self._consultar(NOMINATIM_URL, params, timeout, prioridad, plazo) or []
+
+    def inversa(self, lat, lon, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        params = {
+            "lat": lat,
+            "lon": lon,
+            "format": "jsonv2",
+            "zoom": 20,  # mayor detalle para reverse
+            "accept-language": "es",
+        }
+        return self._consultar(NOMINATIM_REVERSE_URL, params, timeout, prioridad, plazo) or {}
+
+
+def _resultado_local(cod, via, fuente, importancia, desplazamiento=(0.0, 0.0)):
+    _, nombre, lat, lon = gazetteer.municipio(cod)
+    lat += desplazamiento[0]
+    lon += desplazamiento[1]
+    lugar = gazetteer.etiqueta(cod)
+    return {
+        "place_id": f"{fuente}:{cod}:{via}" if via else f"{fuente}:{cod}",
+        "display_name": f"{via}, {lugar}" if via else lugar,
+        "lat": f"{lat:.6f}",
+        "lon": f"{lon:.6f}",
+        "importance": importancia,
+        "type": "calle" if via else "municipio",
+        "address": {
+            "road": via or None,
+            "city": nombre,
+            "state": gazetteer.DEPARTAMENTOS.get(cod[:2]),
+            "country": "Colombia",
+            "country_code": "co",
+        },
+        "fuente": fuente,
+    }
+
+
+class Offline(Geocodificador):
+    """Gazetteer local: la vía normalizada más la cabecera del municipio nombrado (o del viewbox)."""
+
+    nombre = 'offline'
+
+    def buscar(self, q, country='co', limit=5, viewbox=None, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        if country and country != 'co':
+            return []
+        via = gazetteer.normalizar_via(q)
+        codigos = gazetteer.buscar_municipios(q)
+        if not codigos and viewbox:
+            try:
+                codigos = gazetteer.municipios_en_caja(*(float(v) for v in viewbox.split(',')))[:1]
+            except ValueError:
+                codigos = []
+        if not codigos and not via:
+            # el usuario aún escribe el municipio
+            codigos = gazetteer.municipios_con_prefijo(q, limit)
+        # vía + municipio pasa la validación de utils.geo (importance >= 0.2), igual que un municipio solo
+        return [_resultado_local(cod, via, self.nombre, 0.35 if via else 0.25) for cod in codigos[:limit]]
+
+    def inversa(self, lat, lon, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        cod = gazetteer.municipio_cercano(lat, lon)
+        return _resultado_local(cod, None, self.nombre, 0.25) if cod else {}
+
+
+class Falso(Geocodificador):
+    """Sin red y determinista, para desarrollo y `simular_matricula`: toda consulta tiene resultado salvo las que dicen 'noexiste'.
+
+    Cada dirección cae a menos de ~2 km de la cabecera de su municipio (Bogotá
+    si no nombra ninguno), siempre en el mismo punto. `llamadas` registra las consultas.
+    """
+
+    nombre = 'falso'
+
+    def __init__(self):
+        self.llamadas = []
+
+    @staticmethod
+    def _desplazamiento(texto):
+        h = hashlib.sha256(texto.encode('utf-8')).digest()
+        return ((h[0] - 128) / 128 * 0.02, (h[1] - 128) / 128 * 0.02)
+
+    def buscar(self, q, country='co', limit=5, viewbox=None, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        self.llamadas.append(('buscar', q))
+        if 'noexiste' in q:
+            return []
+        via = gazetteer.normalizar_via(q) or q.strip().title()
+        cod = (gazetteer.buscar_municipios(q) or ['11001'])[0]
+        return [_resultado_local(cod, via, self.nombre, 0.6, self._desplazamiento(q))]
+
+    def inversa(self, lat, lon, timeout=4.5, prioridad=INTERACTIVA, plazo=None):
+        self.llamadas.append(('inversa', lat, lon))
+        cod = gazetteer.municipio_cercano(lat, lon) or '11001'
+        return _resultado_local(cod, f"Calle {abs(int(lat * 1000)) % 100} # {abs(int(lon * 1000)) % 100}-10", self.nombre, 0.6)
+
+
+_CLASES = {'nominatim': Nominatim, 'offline': Offline, 'falso': Falso}
+_instancias = {}
+_lock_instancias = threading.Lock()
+
+
+def obtener(nombre=None):
+    """Instancia (una por proceso) del geocodificador `nombre` o del de `settings.GEOCODIFICADOR`."""
+    nombre = nombre or getattr(settings, 'GEOCODIFICADOR', 'nominatim')
+    geo = _instancias.get(nombre)
+    if geo is None:
+        with _lock_instancias:
+            geo = _instancias.get(nombre)
+            if geo is None:
+                geo = _instancias[nombre] = _CLASES[nombre]()
+    return geo
+
+
+def respaldo():
+    return obtener('offline')
@@ -0,0 +1,134 @@
+"""Limitador de consultas a servicios externos compartido por todos los procesos.
+
+Nominatim admite como máximo una consulta por segundo de toda la aplicación,
+no de cada proceso. Cada servicio tiene una fila en `cuota_servicio` con el
+instante en que queda libre su próximo turno (un token bucket sin ráfaga):
+reservar un turno es un único UPDATE condicional que adelanta ese instante
+un intervalo, así que dos procesos nunca reciben el mismo turno.
+
+Prioridades:
+
+* `interactiva` (autocompletado, dirección por GPS): reserva turnos hasta
+  `ESPERAS['interactiva']` segundos en el futuro; si la cola es más larga la
+  consulta se descarta, porque para entonces el usuario ya escribió otra cosa.
+* `fondo` (validación de formularios, comandos): solo toma un turno cuando
+  no hay cola, así que nunca adelanta a una interactiva; reintenta hasta su
+  espera máxima.
+
+Quien consulta dentro de su propia transacción reserva el turno desde un hilo
+aparte, con su propia conexión: el UPDATE se confirma enseguida y no deja la
+fila bloqueada a los demás procesos hasta que termine la transacción. Con
+SQLite no se puede: la otra conexión no confirma mientras la transacción de
+quien llama tenga la base leída, así que se usa el limitador del proceso (y
+se avisa en el log).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
+from accounts.models import CuotaServicio
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVA = 'interactiva'
+FONDO = 'fondo'
+# segundos que una consulta puede esperar su turno según la prioridad
+ESPERAS = {INTERACTIVA: 2.0, FONDO: 10.0}
+
+
+class CuotaAgotada(Exception):
+    """No hubo turno libre dentro de la espera permitida para la prioridad."""
+
+
+_filas = set()
+# respaldo por proceso si la tabla no está disponible: nombre -> siguiente turno libre
+_local = {}
+_lock_local = threading.Lock()
+# un hilo (y una conexión) para reservar fuera de la transacción de quien llama
+_pool = None
+_lock_pool = threading.Lock()
+
+
+def _reservar_bd(nombre, intervalo, limite):
+    """Instante (epoch) del turno reservado, o None si el próximo libre está a más de `limite` s."""
+    if nombre not in _filas:
+        CuotaServicio.objects.get_or_create(nombre=nombre)
+        _filas.add(nombre)
+    ahora = time.time()
+    with transaction.atomic():
+        n = CuotaServicio.objects.filter(nombre=nombre, siguiente__lte=ahora + limite).update(
+            siguiente=Greatest(F('siguiente'), Value(ahora)) + intervalo,
+        )
+        if not n:
+            return None
+        # la fila sigue bloqueada por el UPDATE: el valor leído es el nuestro
+        siguiente = CuotaServicio.objects.filter(nombre=nombre).values_list('siguiente', flat=True).get()
+    return siguiente - intervalo
+
+
+def _reservar_local(nombre, intervalo, limite):
+    ahora = time.time()
+    with _lock_local:
+        siguiente = _local.get(nombre, 0.0)
+        if siguiente > ahora + limite:
+            return None
+        turno = max(siguiente, ahora)
+        _local[nombre] = turno + intervalo
+        return turno
+
+
+def _pool_reservas():
+    global _pool
+    if _pool is None:
+        with _lock_pool:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='limitador')
+    return _pool
+
+
+def _reservar_en_hilo(nombre, intervalo, limite):
+    try:
+        return _reservar_bd(nombre, intervalo, limite)
+    finally:
+        # el hilo del pool no pasa por el ciclo de una petición
+        close_old_connections()
+
+
+def _reservar(nombre, intervalo, limite):
+    try:
+        if connection.in_atomic_block:
+            # dentro de una transacción de quien llama, el UPDATE dejaría la fila
+            # bloqueada (y a los demás procesos esperando) hasta que esta termine
+            if connection.vendor == 'sqlite':
+                logger.warning('Limitador %s dentro de una transacción con SQLite, se usa el del proceso', nombre)
+                return _reservar_local(nombre, intervalo, limite)
+            return _pool_reservas().submit(_reservar_en_hilo, nombre, intervalo, limite).result()
+        return _reservar_bd(nombre, intervalo, limite)
+    except Exception as exc:
+        logger.warning('Limitador %s sin BD, se usa el del proceso: %s', nombre, exc)
+        return _reservar_local(nombre, intervalo, limite)
+
+
+def esperar_turno(nombre, por_segundo, prioridad=INTERACTIVA, espera_max=None):
+    """Bloquea hasta el turno de una consulta a `nombre`; lanza CuotaAgotada si no llega a tiempo."""
+    intervalo = 1.0 / por_segundo
+    if espera_max is None:
+        espera_max = ESPERAS[prioridad]
+    fin = time.time() + espera_max
+    while True:
+        ahora = time.time()
+        # las de fondo solo entran con la cola vacía
+        limite = max(0.0, fin - ahora) if prioridad == INTERACTIVA else 0.0
+        turno = _reservar(nombre, intervalo, limite)
+        if turno is not None:
+            if turno > ahora:
+                time.sleep(turno - ahora)
+            return
+        if prioridad == INTERACTIVA or ahora >= fin:
+            raise CuotaAgotada(nombre)
+        time.sleep(min(intervalo, fin - ahora))
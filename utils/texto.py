@@ -0,0 +1,9 @@
+"""Normalización de texto compartida por las búsquedas y el gazetteer."""
+import unicodedata
+
+
+def normalizar_texto(texto):
+    """Minúsculas, sin tildes y con espacios simples: 'Bogotá  D.C.' -> 'bogota d.c.'."""
+    texto = unicodedata.normalize('NFKD', texto or '')
+    texto = ''.join(ch for ch in texto if not unicodedata.combining(ch))
+    return ' '.join(texto.lower().split())